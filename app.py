@@ -1,70 +1,265 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory, url_for, make_response
+from flask import Flask, Blueprint, current_app, request, jsonify, render_template, send_from_directory, send_file, url_for, make_response, g, Response
+import io
 import os
+import re
 import sys
 import tempfile
 import uuid
 import json
 import shutil
 import datetime
-import pypandoc
+import glob
+import time
+import logging
+import threading
 from werkzeug.utils import secure_filename
 
-# Import the functionality from the provided scripts
-from pdf_ocr_processor import process_pdf
+# Import the functionality from the provided scripts. The OCR, imaging and
+# export backends (pdf_ocr_processor, word_highlighter, pypandoc) pull in
+# fitz, cv2, numpy and the Tesseract wrapper, so they are imported on
+# first use instead of here.
 from ocr_results_searcher import search_words_in_pages, normalize_text
-from progress_tracker import init_socketio, start_progress_tracking, update_progress, complete_progress, get_progress
-from word_highlighter import highlight_page_on_demand
-
-app = Flask(__name__, static_folder='static', template_folder='templates')
+from hebrew_tokenizer import reduce_search_words
+from search_words_registry import SearchWordRegistry
+from memory_budget import MemoryBudget, DEFAULT_JOB_BUDGET_MB
+from ocr_logging import setup_loggers, log_context, DEFAULT_MAX_BYTES, DEFAULT_BACKUP_COUNT
+from progress_tracker import init_socketio, start_progress_tracking, update_progress, complete_progress, get_progress, list_progress
+from results_store import load_results, load_metadata, resolve_results_path, ResultsCache, set_journal_mode
+from task_queue import TaskQueue, DEFAULT_TASK_PAGES
+import fulltext_index
+import page_bitsets
+import chunked_upload
+import notes_export
+import export_jobs
+import highlight_prewarm
+import metrics
+import profiling
+import offload
+import reocr
 
 # Configure storage folders (only results and temporary images)
-RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
-IMAGES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp_images')
-NOTES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'notes')
-DOCX_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'docx_files')
-
-app.config['RESULTS_FOLDER'] = RESULTS_FOLDER
-app.config['IMAGES_FOLDER'] = IMAGES_FOLDER
-app.config['NOTES_FOLDER'] = NOTES_FOLDER
-app.config['DOCX_FOLDER'] = DOCX_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
-app.config['SERVER_NAME'] = '127.0.0.1:5000'  # Use your actual host:port
-app.config['APPLICATION_ROOT'] = '/'
-app.config['PREFERRED_URL_SCHEME'] = 'http'  # Use 'https' if you're using SSL
-
-# Initialize SocketIO
-socketio = init_socketio(app)
-
-# Ensure folders exist
-os.makedirs(RESULTS_FOLDER, exist_ok=True)
-os.makedirs(IMAGES_FOLDER, exist_ok=True)
-os.makedirs(NOTES_FOLDER, exist_ok=True)
-os.makedirs(DOCX_FOLDER, exist_ok=True)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FOLDER = os.path.join(BASE_DIR, 'results')
+IMAGES_FOLDER = os.path.join(BASE_DIR, 'temp_images')
+NOTES_FOLDER = os.path.join(BASE_DIR, 'notes')
+DOCX_FOLDER = os.path.join(BASE_DIR, 'docx_files')
+PROFILES_FOLDER = os.path.join(BASE_DIR, 'profiles')
+UPLOADS_FOLDER = os.path.join(BASE_DIR, 'uploads')
 
-def load_search_words():
-    """Load search words with fallback to template if user file doesn't exist."""
-    user_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search_words.json')
-    template_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search_words.template.json')
+# Logger of the app's jobs and routes; named explicitly, as __name__ is '__main__' when run as a script
+logger = logging.getLogger('app')
+
+# Routes of the application, registered on the app by create_app
+bp = Blueprint('main', __name__)
+
+# SocketIO instance of the last app created by create_app
+socketio = None
+
+# Pool pre-warming highlighted page images, created by create_app
+highlight_prewarmer = None
+
+# Shared OCR task queue, created by create_app when OCR_BACKEND is 'queue'
+task_queue = None
+
+# Seconds between checks of a queued job's progress
+QUEUE_PROGRESS_INTERVAL = 1.0
+
+# Result ids whose pages are being re-OCRed, one re-OCR per result at a time
+reocr_running = set()
+reocr_lock = threading.Lock()
+
+def create_app(config=None):
+    """
+    Create and configure the Flask application.
     
-    # Try to load user-specific file first
-    if os.path.exists(user_file_path):
-        try:
-            with open(user_file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading user search words: {str(e)}")
+    Args:
+        config: Optional dictionary of config values overriding the defaults
     
-    # Fall back to template file
-    try:
-        with open(template_file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading template search words: {str(e)}")
-        # Return a basic default if both files fail
-        return [
-            {"word": "גב", "representative_group": ["גב"]},
-            {"word": "יד", "representative_group": ["יד"]}
-        ]
+    Returns:
+        The configured Flask app
+    """
+    global socketio, highlight_prewarmer, task_queue
+    
+    app = Flask(__name__, static_folder='static', template_folder='templates')
+    
+    app.config['RESULTS_FOLDER'] = RESULTS_FOLDER
+    app.config['IMAGES_FOLDER'] = IMAGES_FOLDER
+    app.config['NOTES_FOLDER'] = NOTES_FOLDER
+    app.config['DOCX_FOLDER'] = DOCX_FOLDER
+    app.config['PROFILES_FOLDER'] = PROFILES_FOLDER
+    app.config['UPLOADS_FOLDER'] = UPLOADS_FOLDER  # Partial chunked uploads
+    app.config['NOTES_EXPORT_BACKEND'] = os.environ.get('MCA_NOTES_EXPORT_BACKEND', 'native')  # 'native' or 'pandoc'
+    app.config['NOTES_REFERENCE_DOCX'] = notes_export.DEFAULT_REFERENCE_DOCX  # Styles of the exported notes
+    app.config['PROFILING_ENABLED'] = profiling.profiling_enabled_by_env()  # Profile every job and profiled route
+    app.config['FULLTEXT_INDEX_PATH'] = None  # Defaults to fulltext_index.sqlite in RESULTS_FOLDER
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max request size; larger PDFs use chunked uploads
+    app.config['SERVER_NAME'] = '127.0.0.1:5000'  # Use your actual host:port
+    app.config['APPLICATION_ROOT'] = '/'
+    app.config['PREFERRED_URL_SCHEME'] = 'http'  # Use 'https' if you're using SSL
+    app.config['LOG_FILE'] = 'ocr_process.log'  # OCR processing log, set up when the app is created
+    app.config['LOG_LEVELS'] = os.environ.get('MCA_LOG_LEVELS')  # Per module, e.g. 'pdf_ocr_processor=DEBUG,engineio=INFO'
+    app.config['LOG_FORMAT'] = os.environ.get('MCA_LOG_FORMAT', 'text')  # 'text' or 'json' (one object per line)
+    app.config['LOG_MAX_BYTES'] = int(os.environ.get('MCA_LOG_MAX_BYTES', DEFAULT_MAX_BYTES))  # Log file rotation size
+    app.config['LOG_BACKUP_COUNT'] = int(os.environ.get('MCA_LOG_BACKUP_COUNT', DEFAULT_BACKUP_COUNT))  # Rotated files kept
+    app.config['OCR_PAGES_IN_FLIGHT'] = int(os.environ.get('MCA_OCR_PAGES_IN_FLIGHT', 2))  # Pages rendered ahead of OCR per job
+    app.config['OCR_MEMORY_BUDGET_MB'] = float(os.environ.get('MCA_OCR_MEMORY_BUDGET_MB', DEFAULT_JOB_BUDGET_MB))  # Per job, for rendered pages
+    app.config['OCR_HIGHLIGHT_FIRST_PASS'] = os.environ.get('MCA_OCR_HIGHLIGHT_FIRST_PASS', '1') != '0'  # OCR highlighted areas first
+    app.config['BLANK_PAGE_DETECTION'] = os.environ.get('MCA_BLANK_PAGE_DETECTION', '1') != '0'  # Skip OCR of blank pages
+    app.config['BLANK_PAGE_THRESHOLDS'] = {  # Overrides of blank_pages.DEFAULT_BLANK_THRESHOLDS
+        key: cast(os.environ[env_name]) for key, env_name, cast in (
+            ('max_ink_ratio', 'MCA_BLANK_MAX_INK_RATIO', float),
+            ('max_components', 'MCA_BLANK_MAX_COMPONENTS', int),
+            ('max_body_components', 'MCA_BLANK_MAX_BODY_COMPONENTS', int)
+        ) if env_name in os.environ
+    }
+    app.config['ASYNC_MODE'] = 'threading'  # 'eventlet' when served by serve.py
+    app.config['OCR_BACKEND'] = os.environ.get('MCA_OCR_BACKEND')  # 'threads' or 'queue' (worker.py processes), by ASYNC_MODE by default
+    app.config['OCR_QUEUE_FOLDER'] = os.environ.get('MCA_OCR_QUEUE_FOLDER')  # Defaults to ocr_queue in RESULTS_FOLDER
+    app.config['OCR_TASK_PAGES'] = int(os.environ.get('MCA_OCR_TASK_PAGES', DEFAULT_TASK_PAGES))  # Pages per queued task
+    app.config['HIGHLIGHT_PREWARM_WORKERS'] = int(os.environ.get('MCA_HIGHLIGHT_PREWARM_WORKERS', 1))  # 0 disables pre-warming
+    app.config['HIGHLIGHT_PREWARM_MAX_PAGES'] = 50  # Matching pages pre-warmed per search, nearest first
+    app.config['KEEP_SOURCE_PDFS'] = os.environ.get('MCA_KEEP_SOURCE_PDFS', '1') != '0'  # Keep PDFs for re-OCR of pages
+    app.config['SOURCE_PDFS_FOLDER'] = os.environ.get('MCA_SOURCE_PDFS_FOLDER')  # Defaults to source_pdfs in RESULTS_FOLDER
+    
+    if config:
+        app.config.update(config)
+    if not app.config['FULLTEXT_INDEX_PATH']:
+        app.config['FULLTEXT_INDEX_PATH'] = os.path.join(app.config['RESULTS_FOLDER'],
+                                                         fulltext_index.DEFAULT_INDEX_FILENAME)
+    if not app.config['SOURCE_PDFS_FOLDER']:
+        app.config['SOURCE_PDFS_FOLDER'] = os.path.join(app.config['RESULTS_FOLDER'], 'source_pdfs')
+    if not app.config['OCR_QUEUE_FOLDER']:
+        app.config['OCR_QUEUE_FOLDER'] = os.path.join(app.config['RESULTS_FOLDER'], 'ocr_queue')
+    if not app.config['OCR_BACKEND']:
+        app.config['OCR_BACKEND'] = 'queue' if app.config['ASYNC_MODE'] == 'eventlet' else 'threads'
+    if app.config['ASYNC_MODE'] == 'eventlet' and app.config['OCR_BACKEND'] != 'queue':
+        # OCR threads would be greenlets, and each page would freeze every request and socket
+        raise ValueError("The eventlet server needs OCR_BACKEND 'queue' (OCR in worker.py processes)")
+    
+    setup_loggers(app.config['LOG_FILE'], levels=app.config['LOG_LEVELS'],
+                  json_format=app.config['LOG_FORMAT'] == 'json', max_bytes=app.config['LOG_MAX_BYTES'],
+                  backup_count=app.config['LOG_BACKUP_COUNT'])
+    
+    # Initialize SocketIO
+    socketio = init_socketio(app, app.config['ASYNC_MODE'])
+    
+    # Highlighted images of matching pages are created in the background, paused during OCR
+    if highlight_prewarmer:
+        highlight_prewarmer.shutdown()
+    highlight_prewarmer = highlight_prewarm.HighlightPrewarmer(
+        app.config['HIGHLIGHT_PREWARM_WORKERS'], ocr_active=ocr_jobs_running,
+        on_page=lambda result: HIGHLIGHT_PREWARM_PAGES.inc(result=result)
+    )
+    
+    # Ensure folders exist
+    for folder_key in ('RESULTS_FOLDER', 'IMAGES_FOLDER', 'NOTES_FOLDER', 'DOCX_FOLDER', 'UPLOADS_FOLDER'):
+        os.makedirs(app.config[folder_key], exist_ok=True)
+    
+    # Jobs are queued on the shared storage for worker.py processes, on this or other machines
+    task_queue = TaskQueue(app.config['OCR_QUEUE_FOLDER']) if app.config['OCR_BACKEND'] == 'queue' else None
+    if task_queue is not None:
+        # The workers write the results stores on that storage too, where WAL does not work across machines
+        set_journal_mode('DELETE')
+    
+    app.register_blueprint(bp)
+    return app
+
+# Recently searched results, so repeated searches on a case skip loading it
+results_cache = ResultsCache()
+
+# Search word groups with their compiled matchers, reloaded when search_words.json changes
+search_word_registry = SearchWordRegistry(os.path.join(BASE_DIR, 'search_words.json'),
+                                          os.path.join(BASE_DIR, 'search_words.template.json'))
+
+# Operational metrics, served in Prometheus text format on /metrics
+REQUEST_LATENCY = metrics.histogram('mca_http_request_duration_seconds', 'HTTP request latency by route',
+                                    ('route', 'method', 'status'))
+JOBS = metrics.gauge('mca_jobs', 'OCR jobs by state (queued: opening the PDF, active: processing pages)',
+                     ('state',))
+PAGES_PROCESSED = metrics.counter('mca_pages_processed_total', 'Pages processed by OCR jobs')
+PAGES_PER_SECOND = metrics.gauge('mca_pages_per_second', 'Current OCR throughput summed over active jobs')
+STAGE_LATENCY = metrics.histogram('mca_ocr_stage_duration_seconds', 'Per-page OCR pipeline stage durations',
+                                  ('stage',))
+CACHE_REQUESTS = metrics.counter('mca_cache_requests_total', 'Cache lookups by cache and result',
+                                 ('cache', 'result'))
+HIGHLIGHT_PREWARM_PAGES = metrics.counter('mca_highlight_prewarm_pages_total',
+                                          'Pages queued for highlight pre-warming by result', ('result',))
+BLANK_PAGES_SKIPPED = metrics.counter('mca_blank_pages_skipped_total', 'Blank pages whose OCR was skipped')
+CACHE_HIT_RATIO = metrics.gauge('mca_cache_hit_ratio', 'Share of cache lookups that were hits', ('cache',))
+DISK_USAGE = metrics.gauge('mca_disk_usage_bytes', 'Disk space used by the app folders', ('folder',))
+
+# Caches reported on /metrics
+CACHE_NAMES = ('results', 'highlight')
+
+def count_jobs():
+    """Count tracked OCR jobs that are queued (initializing) or active (processing)."""
+    sessions = list_progress()
+    return {
+        ('queued',): sum(1 for session in sessions if session.get('status') == 'initializing'),
+        ('active',): sum(1 for session in sessions if session.get('status') == 'processing')
+    }
+
+def ocr_jobs_running():
+    """Whether any OCR job is opening its PDF or processing pages."""
+    return any(session.get('status') in ('initializing', 'processing') for session in list_progress())
+
+def current_pages_per_second():
+    """Sum the measured throughput of the jobs that are processing pages."""
+    return sum(session.get('pages_per_second') or 0 for session in list_progress()
+               if session.get('status') == 'processing')
+
+def cache_hit_ratios():
+    """Hit ratio of each cache since the app started (0 before any lookup)."""
+    ratios = {}
+    for cache in CACHE_NAMES:
+        hits = CACHE_REQUESTS.value(cache=cache, result='hit')
+        total = hits + CACHE_REQUESTS.value(cache=cache, result='miss')
+        ratios[(cache,)] = hits / total if total else 0
+    return ratios
+
+def disk_usage():
+    """Bytes used by the temporary images, results and DOCX folders."""
+    return {
+        ('temp_images',): metrics.folder_size(current_app.config['IMAGES_FOLDER']),
+        ('results',): metrics.folder_size(current_app.config['RESULTS_FOLDER']),
+        ('docx_files',): metrics.folder_size(current_app.config['DOCX_FOLDER'])
+    }
+
+JOBS.set_function(count_jobs)
+PAGES_PER_SECOND.set_function(current_pages_per_second)
+CACHE_HIT_RATIO.set_function(cache_hit_ratios)
+DISK_USAGE.set_function(disk_usage)
+
+def record_page_timing(timing):
+    """Count a finished page and add its stage timings to the stage histograms."""
+    PAGES_PROCESSED.inc()
+    for stage, seconds in timing.items():
+        if stage != 'total':
+            STAGE_LATENCY.observe(seconds, stage=stage)
+
+@bp.before_app_request
+def start_request_timer():
+    """Remember when the request started, for the latency histogram."""
+    g.request_start = time.perf_counter()
+
+@bp.after_app_request
+def record_request_latency(response):
+    """Observe the request latency under its route pattern (not the concrete URL)."""
+    start = g.get('request_start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_LATENCY.observe(time.perf_counter() - start, route=route,
+                                method=request.method, status=str(response.status_code))
+    return response
+
+@bp.route('/metrics')
+def serve_metrics():
+    """Serve the operational metrics in Prometheus text format."""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+def load_search_words():
+    """Get the search word groups (each with its id), reloaded when search_words.json changes."""
+    return search_word_registry.groups()
 
 def ensure_user_search_words_file():
     """Create user search words file from template if it doesn't exist."""
@@ -85,13 +280,339 @@ def ensure_user_search_words_file():
         except Exception as e:
             print(f"Error creating user search words file: {str(e)}")
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Render the main page."""
     search_words = load_search_words()
     return render_template('index.html', search_words=search_words)
 
-@app.route('/upload-pdf', methods=['POST'])
+def parse_page_range(start_page, end_page):
+    """Turn optional start/end page fields into a list of page numbers (None for all pages)."""
+    if not start_page:
+        return None
+    if end_page and end_page >= start_page:
+        return list(range(start_page, end_page + 1))
+    return [start_page]
+
+def start_processing_job(pdf_path, filename, page_numbers=None):
+    """
+    Start OCR processing of an uploaded PDF in a background thread.
+    
+    Shared by the single-request upload and the chunked upload. The job owns
+    pdf_path from here on: when processing ends it is kept for re-OCR of the
+    result's pages (KEEP_SOURCE_PDFS) or deleted.
+    
+    Args:
+        pdf_path: Path of the uploaded PDF on disk
+        filename: Sanitized original filename
+        page_numbers: Optional list of page numbers to process
+    
+    Returns:
+        Flask response with the job's result id, or an error response
+    """
+    # Generate a unique ID for this processing session
+    unique_id = str(uuid.uuid4())
+    base_filename = os.path.splitext(filename)[0]
+    
+    try:
+        # Create a document-specific image directory
+        document_images_folder = os.path.join(current_app.config['IMAGES_FOLDER'], unique_id)
+        os.makedirs(document_images_folder, exist_ok=True)
+        
+        # Process the PDF and save results to the SQLite results store
+        output_path = os.path.join(current_app.config['RESULTS_FOLDER'], f"{unique_id}_{base_filename}_ocr_results.sqlite")
+        
+        # Open the PDF once: the page count comes from the same handle the job renders from
+        document = None
+        try:
+            from pdf_document import PdfDocument
+            document = PdfDocument(pdf_path)
+            total_pages = document.page_count
+            
+            # Initialize progress tracking for this session
+            if page_numbers:
+                total_pages_to_process = len(page_numbers)
+            else:
+                total_pages_to_process = total_pages
+            
+            start_progress_tracking(unique_id, total_pages_to_process)
+            
+            # Return initial response immediately so client can connect for progress updates
+            initial_response = {
+                'success': True,
+                'message': 'PDF processing started',
+                'result_id': unique_id,
+                'original_filename': filename,
+                'total_pages': total_pages_to_process,
+                'status': 'processing'
+            }
+            
+            # With the worker queue, the job is processed by worker.py processes instead of a thread here
+            if current_app.config['OCR_BACKEND'] == 'queue':
+                enqueue_processing_job(document, pdf_path, filename, unique_id, output_path,
+                                       page_numbers or list(range(1, total_pages + 1)), document_images_folder)
+                return jsonify(initial_response)
+            
+            # Profile the job when asked to (config flag, X-Profile header or profile form field);
+            # the profiler is reserved now, so the profile id is only returned if the job gets it
+            profile_job = profiling.profiling_requested() and profiling.reserve_profiler(unique_id)
+            if profile_job:
+                initial_response['profile_id'] = unique_id
+            
+            # The thread needs the app itself to push its own app context
+            app = current_app._get_current_object()
+            
+            # Create a copy of variables needed for the thread for thread safety
+            thread_pdf_path = pdf_path
+            thread_output_path = output_path
+            thread_page_numbers = page_numbers
+            thread_unique_id = unique_id
+            thread_document_images_folder = document_images_folder
+            thread_document = document
+            
+            # Start processing in a separate thread with better context handling
+            import threading
+            
+            def process_pdf_thread(pdf_path, output_path, page_numbers, unique_id, document_images_folder, document):
+                # Create a new app context for this thread; its log records are tagged with the job id
+                with app.app_context(), log_context(job_id=unique_id):
+                    # Until profile_call takes over the reservation, the profiler is given back on errors
+                    profiler_reserved = profile_job
+                    try:
+                        # Define progress callback
+                        def progress_callback(current_page, total_pages, status, message=None, error=None, timing=None):
+                            update_progress(unique_id, current_page, status, message, error, timing)
+                            if timing:
+                                record_page_timing(timing)
+                        
+                        # The highlighted text is searchable across cases while the full pages are read
+                        def highlights_callback(output_path, pages):
+                            try:
+                                fulltext_index.index_results_file(current_app.config['FULLTEXT_INDEX_PATH'],
+                                                                  output_path, force=True)
+                            except Exception as e:
+                                logger.error("Error adding highlighted text to the full-text index: %s", e)
+                        
+                        # Create a subdirectory for clean images
+                        clean_images_dir = os.path.join(document_images_folder, "clean_images")
+                        os.makedirs(clean_images_dir, exist_ok=True)
+                        
+                        # Process the PDF with progress updates
+                        from pdf_ocr_processor import process_pdf
+                        process_args = (pdf_path, output_path, page_numbers)
+                        process_kwargs = {
+                            'dpi': 300,
+                            'image_output_dir': document_images_folder,
+                            'progress_callback': progress_callback,
+                            'document': document,
+                            'pages_in_flight': current_app.config['OCR_PAGES_IN_FLIGHT'],
+                            'memory_budget': MemoryBudget.from_megabytes(current_app.config['OCR_MEMORY_BUDGET_MB']),
+                            'highlight_first_pass': current_app.config['OCR_HIGHLIGHT_FIRST_PASS'],
+                            'highlights_callback': highlights_callback,
+                            'detect_blank_pages': current_app.config['BLANK_PAGE_DETECTION'],
+                            'blank_thresholds': current_app.config['BLANK_PAGE_THRESHOLDS']
+                        }
+                        if profile_job:
+                            # The profile is named after the job id
+                            profiler_reserved = False
+                            success, _ = profiling.profile_call(current_app.config['PROFILES_FOLDER'], unique_id,
+                                                                process_pdf, *process_args, reserved=True,
+                                                                **process_kwargs)
+                        else:
+                            success = process_pdf(*process_args, **process_kwargs)
+                        
+                        # Mark processing as complete
+                        complete_progress(unique_id, success=success)
+                        
+                        # A failed job's store is discarded, so is its highlighted text in the full-text index
+                        if not success:
+                            try:
+                                fulltext_index.remove_document(current_app.config['FULLTEXT_INDEX_PATH'],
+                                                               fulltext_index.document_id_for(output_path))
+                            except Exception as e:
+                                logger.error("Error removing results from the full-text index: %s", e)
+                        
+                        # If successful, update the stored pages with image URLs
+                        if success:
+                            try:
+                                from worker import add_image_urls
+                                add_image_urls(output_path, unique_id)
+                            except Exception as e:
+                                logger.error("Error updating the results with image URLs: %s", e)
+                                # Still mark as complete since OCR processing succeeded
+                                update_progress(unique_id, total_pages, 'completed', 
+                                            message="Processing complete, but error with image links.")
+                            
+                            index_finished_job(output_path)
+                        
+                        # Keep the PDF of a finished job for re-OCR of its pages, delete it otherwise
+                        document.close()
+                        if success and current_app.config['KEEP_SOURCE_PDFS']:
+                            reocr.keep_source_pdf(pdf_path, current_app.config['SOURCE_PDFS_FOLDER'], unique_id)
+                        elif os.path.exists(pdf_path):
+                            os.unlink(pdf_path)
+                            
+                    except Exception as e:
+                        if profiler_reserved:
+                            profiling.release_profiler()
+                        
+                        # Update progress with error
+                        error_msg = str(e)
+                        logger.exception("Job failed: %s", error_msg)
+                        update_progress(unique_id, 0, 'error', error=error_msg)
+                        
+                        # Ensure temporary file is cleaned up
+                        document.close()
+                        if os.path.exists(pdf_path):
+                            os.unlink(pdf_path)
+            
+            # Start processing thread with all needed parameters
+            processing_thread = threading.Thread(
+                target=process_pdf_thread,
+                args=(thread_pdf_path, thread_output_path, thread_page_numbers, 
+                      thread_unique_id, thread_document_images_folder, thread_document)
+            )
+            processing_thread.daemon = True  # Make thread exit when main thread exits
+            try:
+                processing_thread.start()
+            except Exception:
+                if profile_job:
+                    profiling.release_profiler()
+                raise
+            
+            return jsonify(initial_response)
+            
+        except Exception as e:
+            # Clean up temporary file in case of error
+            if document is not None:
+                document.close()
+            if os.path.exists(pdf_path):
+                os.unlink(pdf_path)
+            return jsonify({'error': f'Failed to initialize PDF processing: {str(e)}'}), 500
+            
+    except Exception as e:
+        # Ensure temporary file is cleaned up in case of error
+        if os.path.exists(pdf_path):
+            os.unlink(pdf_path)
+        return jsonify({'error': f'Error processing PDF: {str(e)}'}), 500
+
+def index_finished_job(output_path):
+    """
+    Make a finished job's results searchable across cases and precompute its word group bitsets.
+    
+    Args:
+        output_path: Path of the job's results store
+    """
+    try:
+        BLANK_PAGES_SKIPPED.inc(load_metadata(output_path).get('blank_pages_skipped', 0))
+    except Exception as e:
+        logger.warning("Error reading the job's blank page count: %s", e)
+    
+    # Make the new case searchable across all cases (replacing its highlighted text)
+    try:
+        offload.run_blocking(fulltext_index.index_results_file, current_app.config['FULLTEXT_INDEX_PATH'],
+                             output_path, force=True)
+    except Exception as e:
+        logger.error("Error adding results to the full-text index: %s", e)
+    
+    # Evaluate every configured word group once, so filter toggles are bitwise operations
+    try:
+        group_matchers = search_word_registry.group_matchers()
+        offload.run_blocking(lambda: page_bitsets.update_stored_bitsets(output_path, load_results(output_path),
+                                                                        group_matchers))
+    except Exception as e:
+        logger.error("Error precomputing word group bitsets: %s", e)
+
+def enqueue_processing_job(document, pdf_path, filename, unique_id, output_path, page_numbers,
+                           document_images_folder):
+    """
+    Queue a job for the OCR workers (OCR_BACKEND 'queue') and follow its progress.
+    
+    The PDF is moved into the queue folder on the shared storage (or the
+    source PDF folder when it is kept for re-OCR); worker.py processes the
+    job's page ranges and merges them into output_path.
+    
+    Args:
+        document: The PdfDocument that counted the pages (closed here)
+        pdf_path: Path of the uploaded PDF
+        filename: Sanitized original filename
+        unique_id: Result id of the job
+        output_path: Path of the results store to write
+        page_numbers: Pages to process, in order
+        document_images_folder: Folder for the job's page images
+    """
+    document.close()
+    if current_app.config['KEEP_SOURCE_PDFS']:
+        # Outside the queue's pdfs folder, the PDF outlives the job
+        queued_pdf_path = reocr.keep_source_pdf(pdf_path, current_app.config['SOURCE_PDFS_FOLDER'], unique_id)
+    else:
+        queued_pdf_path = task_queue.pdf_path_for(unique_id)
+        shutil.move(pdf_path, queued_pdf_path)
+    
+    options = {
+        'dpi': 300,
+        'pages_in_flight': current_app.config['OCR_PAGES_IN_FLIGHT'],
+        'memory_budget_mb': current_app.config['OCR_MEMORY_BUDGET_MB'],
+        'highlight_first_pass': current_app.config['OCR_HIGHLIGHT_FIRST_PASS'],
+        'detect_blank_pages': current_app.config['BLANK_PAGE_DETECTION'],
+        'blank_thresholds': current_app.config['BLANK_PAGE_THRESHOLDS']
+    }
+    task_queue.enqueue_job(unique_id, filename, queued_pdf_path, output_path, page_numbers,
+                           images_folder=document_images_folder, options=options,
+                           task_pages=current_app.config['OCR_TASK_PAGES'])
+    update_progress(unique_id, 0, 'initializing', message='Waiting for an OCR worker...')
+    follow_queued_job(unique_id, unique_id, on_completed=lambda: index_finished_job(output_path))
+
+def follow_queued_job(job_id, log_job_id, on_completed, on_failed=None):
+    """
+    Report the progress of a queued job under its id from a background thread until it ends.
+    
+    Args:
+        job_id: Id of the job in the queue, also its progress session id
+        log_job_id: Job id its log records are tagged with (the result id)
+        on_completed: Function called in the app context once the workers are done,
+                      before the job is reported as complete; it may return the completion message
+        on_failed: Optional function called in the app context if the job failed
+    """
+    app = current_app._get_current_object()
+    
+    def follow():
+        with app.app_context(), log_context(job_id=log_job_id):
+            reported = None
+            while True:
+                progress = task_queue.job_progress(job_id)
+                if progress is None or progress['status'] == 'error':
+                    error = progress['error'] if progress else 'Job not found in the queue'
+                    update_progress(job_id, progress['pages_done'] if progress else 0, 'error', error=error)
+                    complete_progress(job_id, success=False)
+                    if on_failed:
+                        on_failed()
+                    return
+                if progress['status'] == 'completed':
+                    try:
+                        message = on_completed()
+                    except Exception as e:
+                        logger.error("Error finishing queued job: %s", e)
+                        update_progress(job_id, progress['pages_done'], 'error', error=str(e))
+                        complete_progress(job_id, success=False)
+                        return
+                    update_progress(job_id, progress['pages_done'], 'completed',
+                                    message=message or 'PDF processing completed successfully.')
+                    complete_progress(job_id, success=True)
+                    return
+                
+                state = (progress['status'], progress['pages_done'])
+                if state != reported and progress['status'] != 'queued':
+                    message = ('Merging the results...' if progress['status'] == 'finalizing' else
+                               f"Processing page {progress['pages_done'] + 1} of {progress['total_pages']} "
+                               f"({progress['tasks'].get('leased', 0)} workers)...")
+                    update_progress(job_id, progress['pages_done'], 'processing', message=message)
+                    reported = state
+                time.sleep(QUEUE_PROGRESS_INTERVAL)
+    
+    threading.Thread(target=follow, name=f"queued-job-{job_id}", daemon=True).start()
+
+@bp.route('/upload-pdf', methods=['POST'])
 def upload_pdf():
     """Handle PDF upload and processing."""
     if 'pdfFile' not in request.files:
@@ -103,10 +624,7 @@ def upload_pdf():
         return jsonify({'error': 'No file selected'}), 400
     
     if file and file.filename.lower().endswith('.pdf'):
-        # Generate a unique ID for this processing session
-        unique_id = str(uuid.uuid4())
         filename = secure_filename(file.filename)
-        base_filename = os.path.splitext(filename)[0]
         
         # Clean up previous image directories to save space
         cleanup_old_images()
@@ -117,150 +635,80 @@ def upload_pdf():
             file.save(temp_pdf.name)
             pdf_path = temp_pdf.name
         
-        try:
-            # Create a document-specific image directory
-            document_images_folder = os.path.join(app.config['IMAGES_FOLDER'], unique_id)
-            os.makedirs(document_images_folder, exist_ok=True)
-            
-            # Process the PDF and save results
-            output_path = os.path.join(app.config['RESULTS_FOLDER'], f"{unique_id}_{base_filename}_ocr_results.json")
-            
-            # Get page range if specified
-            start_page = request.form.get('startPage', type=int)
-            end_page = request.form.get('endPage', type=int)
-            
-            page_numbers = None
-            if start_page:
-                if end_page and end_page >= start_page:
-                    page_numbers = list(range(start_page, end_page + 1))
-                else:
-                    page_numbers = [start_page]
-            
-            # Get total page count to initialize progress tracking
-            try:
-                from PyPDF2 import PdfReader
-                pdf_reader = PdfReader(pdf_path)
-                total_pages = len(pdf_reader.pages)
-                
-                # Initialize progress tracking for this session
-                if page_numbers:
-                    total_pages_to_process = len(page_numbers)
-                else:
-                    total_pages_to_process = total_pages
-                
-                start_progress_tracking(unique_id, total_pages_to_process)
-                
-                # Return initial response immediately so client can connect for progress updates
-                initial_response = {
-                    'success': True,
-                    'message': 'PDF processing started',
-                    'result_id': unique_id,
-                    'original_filename': filename,
-                    'total_pages': total_pages_to_process,
-                    'status': 'processing'
-                }
-                
-                # Create a copy of variables needed for the thread for thread safety
-                thread_pdf_path = pdf_path
-                thread_output_path = output_path
-                thread_page_numbers = page_numbers
-                thread_unique_id = unique_id
-                thread_document_images_folder = document_images_folder
-                
-                # Start processing in a separate thread with better context handling
-                import threading
-                
-                def process_pdf_thread(pdf_path, output_path, page_numbers, unique_id, document_images_folder):
-                    # Create a new app context for this thread
-                    with app.app_context():
-                        try:
-                            # Define progress callback
-                            def progress_callback(current_page, total_pages, status, message=None, error=None):
-                                update_progress(unique_id, current_page, status, message, error)
-                            
-                            # Create a subdirectory for clean images
-                            clean_images_dir = os.path.join(document_images_folder, "clean_images")
-                            os.makedirs(clean_images_dir, exist_ok=True)
-                            
-                            # Process the PDF with progress updates
-                            success = process_pdf(
-                                pdf_path, 
-                                output_path, 
-                                page_numbers, 
-                                dpi=300, 
-                                image_output_dir=document_images_folder,
-                                progress_callback=progress_callback
-                            )
-                            
-                            # Mark processing as complete
-                            complete_progress(unique_id, success=success)
-                            
-                            # If successful, update the JSON file with image URLs
-                            if success:
-                                try:
-                                    with open(output_path, 'r', encoding='utf-8') as f:
-                                        results = json.load(f)
-                                    
-                                    # Add image URLs for each page - use direct URL construction instead of url_for
-                                    for page in results['pages']:
-                                        if 'image_path' in page:
-                                            page_num = page['page_number']
-                                            # Build the URL for the regular image
-                                            page['image_url'] = f'/page-images/{unique_id}/{page_num}'
-                                            
-                                            # For pages with highlights, add URL for the clean version too
-                                            if page.get('has_annotations', False) and 'clean_image_path' in page:
-                                                page['clean_image_url'] = f'/clean-page-images/{unique_id}/{page_num}'
-                                    
-                                    # Save updated results
-                                    with open(output_path, 'w', encoding='utf-8') as f:
-                                        json.dump(results, f, ensure_ascii=False, indent=2)
-                                except Exception as e:
-                                    print(f"Error updating JSON with image URLs: {str(e)}")
-                                    # Still mark as complete since OCR processing succeeded
-                                    update_progress(unique_id, total_pages, 'completed', 
-                                                message="Processing complete, but error with image links.")
-                            
-                            # Delete the temporary PDF file after processing
-                            if os.path.exists(pdf_path):
-                                os.unlink(pdf_path)
-                                
-                        except Exception as e:
-                            # Update progress with error
-                            error_msg = str(e)
-                            print(f"Thread error: {error_msg}")
-                            update_progress(unique_id, 0, 'error', error=error_msg)
-                            
-                            # Ensure temporary file is cleaned up
-                            if os.path.exists(pdf_path):
-                                os.unlink(pdf_path)
-                
-                # Start processing thread with all needed parameters
-                processing_thread = threading.Thread(
-                    target=process_pdf_thread,
-                    args=(thread_pdf_path, thread_output_path, thread_page_numbers, 
-                          thread_unique_id, thread_document_images_folder)
-                )
-                processing_thread.daemon = True  # Make thread exit when main thread exits
-                processing_thread.start()
-                
-                return jsonify(initial_response)
-                
-            except Exception as e:
-                # Clean up temporary file in case of error
-                if os.path.exists(pdf_path):
-                    os.unlink(pdf_path)
-                return jsonify({'error': f'Failed to initialize PDF processing: {str(e)}'}), 500
-                
-        except Exception as e:
-            # Ensure temporary file is cleaned up in case of error
-            if os.path.exists(pdf_path):
-                os.unlink(pdf_path)
-            return jsonify({'error': f'Error processing PDF: {str(e)}'}), 500
+        # Get page range if specified
+        page_numbers = parse_page_range(request.form.get('startPage', type=int),
+                                        request.form.get('endPage', type=int))
+        
+        return start_processing_job(pdf_path, filename, page_numbers)
     
     return jsonify({'error': 'Invalid file type. Please upload a PDF file.'}), 400
 
-@app.route('/progress/<session_id>')
+@bp.app_errorhandler(chunked_upload.UploadError)
+def handle_upload_error(error):
+    """Report chunked upload errors with their status and the bytes the server has."""
+    response = {'error': str(error)}
+    if error.received_bytes is not None:
+        response['received_bytes'] = error.received_bytes
+    return jsonify(response), error.status
+
+@bp.route('/uploads', methods=['POST'])
+def init_chunked_upload():
+    """
+    Start (or resume) a chunked upload.
+    
+    Expects JSON with filename, size, optional sha256 and the optional
+    startPage/endPage of the job. Returns the upload id, chunk size and the
+    number of bytes already received (non-zero when resuming).
+    """
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not filename.lower().endswith('.pdf'):
+        return jsonify({'error': 'Invalid file type. Please upload a PDF file.'}), 400
+    
+    try:
+        total_size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Missing or invalid file size'}), 400
+    
+    uploads_folder = current_app.config['UPLOADS_FOLDER']
+    chunked_upload.cleanup_stale_uploads(uploads_folder)
+    
+    try:
+        options = {key: int(data[key]) if data.get(key) else None for key in ('startPage', 'endPage')}
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid page range'}), 400
+    state = chunked_upload.create_upload(uploads_folder, filename, total_size, data.get('sha256'), options)
+    return jsonify(state)
+
+@bp.route('/uploads/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    """Get an upload's state; received_bytes is where the client resumes."""
+    return jsonify(chunked_upload.load_upload(current_app.config['UPLOADS_FOLDER'], upload_id))
+
+@bp.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Receive one chunk (raw request body) at the byte offset given in ?offset=, streamed to disk."""
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'Missing chunk offset'}), 400
+    
+    received_bytes = chunked_upload.write_chunk(current_app.config['UPLOADS_FOLDER'], upload_id,
+                                                offset, request.stream)
+    return jsonify({'upload_id': upload_id, 'received_bytes': received_bytes})
+
+@bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(upload_id):
+    """Verify the assembled upload (size and SHA-256) and start processing it."""
+    pdf_path, state = chunked_upload.complete_upload(current_app.config['UPLOADS_FOLDER'], upload_id)
+    
+    # Clean up previous image directories to save space
+    cleanup_old_images()
+    
+    options = state.get('options', {})
+    page_numbers = parse_page_range(options.get('startPage'), options.get('endPage'))
+    return start_processing_job(pdf_path, state['filename'], page_numbers)
+
+@bp.route('/progress/<session_id>')
 def get_processing_progress(session_id):
     """Get current processing progress for a session."""
     progress_data = get_progress(session_id)
@@ -269,11 +717,159 @@ def get_processing_progress(session_id):
     else:
         return jsonify({'error': 'Session not found'}), 404
 
-@app.route('/page-images/<unique_id>/<int:page_number>')
+@bp.route('/reocr/<result_id>', methods=['POST'])
+def reocr_result_pages(result_id):
+    """
+    Run OCR again on some pages of a processed PDF and merge them into its results.
+    
+    Expects JSON with 'pages' ('3,7-9' or a list of page numbers) and
+    optionally 'dpi' and 'ocrProfile' (see pdf_ocr_processor.OCR_PROFILES).
+    Progress is reported under the returned session id; the stored results
+    change only once all pages are read.
+    """
+    result_path = find_result_path(result_id)
+    if not result_path:
+        return jsonify({'error': 'Result not found'}), 404
+    pdf_path = reocr.source_pdf_path(current_app.config['SOURCE_PDFS_FOLDER'], result_id)
+    if not os.path.exists(pdf_path):
+        return jsonify({'error': 'The PDF of this result was not kept; upload it again to re-OCR pages'}), 409
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        page_numbers, dpi, ocr_profile = reocr.validate_request(result_path, data.get('pages'), data.get('dpi', 300),
+                                                                data.get('ocrProfile', 'default'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with reocr_lock:
+        if result_id in reocr_running:
+            return jsonify({'error': 'Pages of this result are already being re-OCRed'}), 409
+        reocr_running.add(result_id)
+    
+    session_id = f"{result_id}-reocr-{uuid.uuid4().hex[:8]}"
+    start_progress_tracking(session_id, len(page_numbers))
+    # Pre-warmed highlights of the old pages would be deleted by the merge anyway
+    highlight_prewarmer.cancel(result_id)
+    try:
+        start_reocr_job(session_id, result_id, result_path, pdf_path, page_numbers, dpi, ocr_profile)
+    except Exception as e:
+        with reocr_lock:
+            reocr_running.discard(result_id)
+        complete_progress(session_id, success=False)
+        return jsonify({'error': f'Failed to start re-OCR: {str(e)}'}), 500
+    
+    return jsonify({
+        'success': True,
+        'message': 'Re-OCR started',
+        'result_id': result_id,
+        'session_id': session_id,
+        'pages': page_numbers,
+        'dpi': dpi,
+        'ocr_profile': ocr_profile,
+        'status': 'processing'
+    }), 202
+
+def start_reocr_job(session_id, result_id, result_path, pdf_path, page_numbers, dpi, ocr_profile):
+    """
+    Re-OCR pages of a result in a background thread, or on the OCR workers with OCR_BACKEND 'queue'.
+    
+    The result id is removed from reocr_running when the job ends.
+    
+    Args:
+        session_id: Progress session of the re-OCR
+        result_id: Result id of the processed PDF
+        result_path: Path of its results store
+        pdf_path: Its kept source PDF
+        page_numbers: Pages to re-OCR (validated)
+        dpi: DPI to render the pages at
+        ocr_profile: Tesseract settings for the pages
+    """
+    app = current_app._get_current_object()
+    merge_options = {
+        'index_path': current_app.config['FULLTEXT_INDEX_PATH'],
+        'images_folder': current_app.config['IMAGES_FOLDER']
+    }
+    process_options = {
+        'pages_in_flight': current_app.config['OCR_PAGES_IN_FLIGHT'],
+        'highlight_first_pass': current_app.config['OCR_HIGHLIGHT_FIRST_PASS']
+    }
+    
+    def finished():
+        with reocr_lock:
+            reocr_running.discard(result_id)
+    
+    if current_app.config['OCR_BACKEND'] == 'queue':
+        part_path = reocr.reocr_part_path(result_path)
+        # The workers write the new page images aside; the merge moves them over the result's
+        staging_folder = reocr.reocr_staging_folder(current_app.config['IMAGES_FOLDER'], result_id, session_id)
+        # Pages chosen for re-OCR are read even if they look blank, as reocr_pages does
+        options = dict(process_options, dpi=dpi, ocr_profile=ocr_profile, detect_blank_pages=False,
+                       memory_budget_mb=current_app.config['OCR_MEMORY_BUDGET_MB'])
+        task_queue.enqueue_job(session_id, os.path.basename(pdf_path), pdf_path, part_path, page_numbers,
+                               images_folder=staging_folder, options=options,
+                               task_pages=current_app.config['OCR_TASK_PAGES'])
+        update_progress(session_id, 0, 'initializing', message='Waiting for an OCR worker...')
+        
+        def merge():
+            try:
+                replaced, failed = offload.run_blocking(
+                    reocr.merge_reocr_results, result_path, part_path, result_id, dpi, ocr_profile,
+                    group_matchers=search_word_registry.group_matchers(), staging_folder=staging_folder,
+                    **merge_options
+                )
+            finally:
+                finished()
+            if not replaced:
+                raise RuntimeError(reocr.reocr_summary(replaced, failed))
+            return reocr.reocr_summary(replaced, failed)
+        
+        def failed():
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            if os.path.isdir(staging_folder):
+                shutil.rmtree(staging_folder)
+            finished()
+        
+        follow_queued_job(session_id, result_id, on_completed=merge, on_failed=failed)
+        return
+    
+    def reocr_thread():
+        with app.app_context(), log_context(job_id=result_id):
+            try:
+                def progress_callback(current_page, total_pages, status, message=None, error=None, timing=None):
+                    # The job is complete once the pages are merged, not when process_pdf is done
+                    if status == 'completed':
+                        status, message = 'processing', 'Merging the re-OCRed pages...'
+                    update_progress(session_id, current_page, status, message, error, timing)
+                    if timing:
+                        record_page_timing(timing)
+                
+                outcome = reocr.reocr_pages(
+                    result_path, pdf_path, result_id, page_numbers, dpi=dpi, ocr_profile=ocr_profile,
+                    progress_callback=progress_callback, group_matchers=search_word_registry.group_matchers(),
+                    run_id=session_id, memory_budget=MemoryBudget.from_megabytes(current_app.config['OCR_MEMORY_BUDGET_MB']),
+                    **merge_options, **process_options
+                )
+                if outcome is not None:
+                    replaced, failed = outcome
+                    # Pages that failed were reported as errors by process_pdf; the job fails if none were read
+                    update_progress(session_id, len(page_numbers), 'completed' if replaced else 'error',
+                                    message=reocr.reocr_summary(replaced, failed))
+                complete_progress(session_id, success=bool(outcome and outcome[0]))
+            except Exception as e:
+                logger.exception("Re-OCR failed: %s", e)
+                update_progress(session_id, 0, 'error', error=str(e))
+                complete_progress(session_id, success=False)
+            finally:
+                finished()
+    
+    threading.Thread(target=reocr_thread, name=f"reocr-{result_id}", daemon=True).start()
+
+@bp.route('/page-images/<unique_id>/<int:page_number>')
 def serve_page_image(unique_id, page_number):
     """Serve a page image."""
     image_filename = f"page_{page_number}.png"
-    document_images_folder = os.path.join(app.config['IMAGES_FOLDER'], unique_id)
+    document_images_folder = os.path.join(current_app.config['IMAGES_FOLDER'], unique_id)
     return send_from_directory(document_images_folder, image_filename)
 
 def cleanup_old_images():
@@ -282,7 +878,7 @@ def cleanup_old_images():
     Completely purges the temp_images directory before each use.
     """
     try:
-        images_folder = app.config['IMAGES_FOLDER']
+        images_folder = current_app.config['IMAGES_FOLDER']
         if not os.path.exists(images_folder):
             return
             
@@ -296,47 +892,110 @@ def cleanup_old_images():
         if not os.path.exists(images_folder):
             os.makedirs(images_folder)
 
-@app.route('/get-results/<result_id>/<filename>')
+def get_result_path(result_id, filename):
+    """Get the path of the stored results for a processed PDF, in whichever format they exist."""
+    base_filename = os.path.splitext(secure_filename(filename))[0]
+    result_path = os.path.join(current_app.config['RESULTS_FOLDER'], f"{result_id}_{base_filename}_ocr_results.sqlite")
+    return resolve_results_path(result_path)
+
+def find_result_path(result_id):
+    """Find the stored results of a processed PDF from its result id alone."""
+    matches = glob.glob(os.path.join(current_app.config['RESULTS_FOLDER'], f"{glob.escape(result_id)}_*_ocr_results.sqlite"))
+    return matches[0] if matches else None
+
+@bp.route('/get-results/<result_id>/<filename>')
 def get_results(result_id, filename):
     """Get OCR results for the processed PDF."""
-    base_filename = os.path.splitext(filename)[0]
-    result_path = os.path.join(app.config['RESULTS_FOLDER'], f"{result_id}_{base_filename}_ocr_results.json")
+    result_path = get_result_path(result_id, filename)
     
     if os.path.exists(result_path):
-        with open(result_path, 'r', encoding='utf-8') as f:
-            ocr_results = json.load(f)
+        ocr_results = load_results(result_path)
+        ocr_results.pop(page_bitsets.METADATA_KEY, None)  # Search index, not needed by the client
         return jsonify(ocr_results)
     else:
         return jsonify({'error': 'Results not found'}), 404
 
-@app.route('/search-results', methods=['POST'])
+@bp.route('/download-json/<result_id>/<filename>')
+def download_json(result_id, filename):
+    """Download the OCR results of a processed PDF as a JSON file."""
+    result_path = get_result_path(result_id, filename)
+    
+    if not os.path.exists(result_path):
+        return jsonify({'error': 'Results not found'}), 404
+    
+    ocr_results = load_results(result_path)
+    ocr_results.pop(page_bitsets.METADATA_KEY, None)
+    base_filename = os.path.splitext(secure_filename(filename))[0]
+    response = make_response(json.dumps(ocr_results, ensure_ascii=False, indent=2))
+    response.headers["Content-Disposition"] = f"attachment; filename={base_filename}_ocr_results.json"
+    response.headers["Content-Type"] = "application/json; charset=utf-8"
+    return response
+
+@bp.route('/search-results', methods=['POST'])
+@profiling.profiled_route('search_results')
 def search_results():
     """Search within OCR results for specific words."""
     data = request.get_json()
     
-    if not data or 'resultPath' not in data or 'searchWords' not in data:
+    if not data or 'resultPath' not in data or ('searchWords' not in data and 'groupIds' not in data):
         return jsonify({'error': 'Missing required parameters'}), 400
     
-    result_path = data['resultPath']
-    search_words = set(data['searchWords'])
+    result_path = resolve_results_path(data['resultPath'])
     filter_type = data.get('filterType', 'both')  # 'highlights', 'words', 'both', or 'all'
+    match_mode = data.get('matchMode', 'exact')  # 'exact' or 'stem'
+    stemming = match_mode == 'stem'
+    fuzzy_distance = data.get('fuzzyDistance', 0) or 0
+    if isinstance(fuzzy_distance, bool) or not isinstance(fuzzy_distance, (int, str)) \
+            or not re.fullmatch(r'-?[0-9]+', str(fuzzy_distance).strip()):
+        return jsonify({'error': f'Invalid fuzzyDistance: {fuzzy_distance}, expected a number of edits (0-2)'}), 400
+    max_distance = min(max(int(fuzzy_distance), 0), 2)  # 0 = exact matching only
     
     if not os.path.exists(result_path):
         return jsonify({'error': 'Results file not found'}), 404
     
+    # Selected word groups are matched with the registry's precompiled matchers;
+    # a plain word list (searchWords) is still accepted
+    compiled = None
+    if 'groupIds' in data:
+        compiled, unknown_group_ids = search_word_registry.compiled(data['groupIds'])
+        if unknown_group_ids:
+            return jsonify({'error': 'Search words have changed, please reload the page',
+                            'unknown_group_ids': unknown_group_ids}), 409
+        search_words = set(compiled['words']) if compiled else set()
+    else:
+        search_words = set(data['searchWords'])
+    
+    # Variants the stemmer covers are dropped, so the expanded
+    # representative groups collapse to a few terms
+    if stemming:
+        search_words = set((compiled['terms'] if compiled else reduce_search_words(search_words)).values())
+    
     try:
-        # Load OCR results
-        with open(result_path, 'r', encoding='utf-8') as f:
-            ocr_results = json.load(f)
-        
-        # Search for words in pages (returns dictionary with matched words info)
-        search_results = {}
-        if 'words' in filter_type or filter_type == 'both' or filter_type == 'all':
-            # Use the improved search_words_in_pages function
-            search_results = search_words_in_pages(ocr_results, search_words)
+        # Load OCR results (shared with the cache, so pages are copied before marking them)
+        ocr_results, cache_hit = results_cache.get(result_path)
+        CACHE_REQUESTS.inc(cache='results', result='hit' if cache_hit else 'miss')
         
         # Prepare all pages for filtering
-        all_pages = ocr_results.get('pages', []).copy()
+        all_pages = [dict(page) for page in ocr_results.get('pages', [])]
+        
+        if 'groupIds' in data and max_distance == 0:
+            # Configured groups were searched once per document: combine their page bitsets
+            bitsets = page_bitsets.update_stored_bitsets(result_path, ocr_results,
+                                                         search_word_registry.group_matchers())
+            annotation_bits = page_bitsets.from_hex(bitsets['annotations'])
+            word_bits, matched_words_by_page = page_bitsets.combine_groups(
+                bitsets, data['groupIds'], 'stem' if stemming else 'exact')
+            search_results = {page_number: {'matched': True, 'matched_words': matched_words}
+                              for page_number, matched_words in matched_words_by_page.items()}
+        else:
+            # Search for words in pages (returns dictionary with matched words info)
+            search_results = {}
+            if 'words' in filter_type or filter_type == 'both' or filter_type == 'all':
+                # Use the improved search_words_in_pages function
+                search_results = search_words_in_pages(ocr_results, search_words, stemming=stemming,
+                                                       max_distance=max_distance, compiled=compiled)
+            annotation_bits = page_bitsets.annotation_bits(all_pages)
+            word_bits = page_bitsets.matched_bits(all_pages, search_results)
         
         # Add search results to each page
         for page in all_pages:
@@ -348,39 +1007,41 @@ def search_results():
             # Add search results to page data
             page['contains_search_words'] = contains_search_words
             page['matched_words'] = matched_words
+            page['fuzzy_matches'] = page_search_result.get('fuzzy_matches', [])
         
-        # Filter pages based on criteria, unless we want to show all pages
-        filtered_pages = []
-        if filter_type == 'all':
-            # Include all pages, but still mark which ones match criteria
-            filtered_pages = all_pages
-        else:
-            # Filter pages based on selected criteria
-            for page in all_pages:
-                has_annotations = page.get('has_annotations', False)
-                contains_search_words = page.get('contains_search_words', False)
-                
-                include_page = False
-                if filter_type == 'highlights' and has_annotations:
-                    include_page = True
-                elif filter_type == 'words' and contains_search_words:
-                    include_page = True
-                elif filter_type == 'both' and (has_annotations or contains_search_words):
-                    include_page = True
-                
-                if include_page:
-                    filtered_pages.append(page)
+        # Filter pages based on criteria with bitwise operations ('all' includes all
+        # pages, but they are still marked with which ones match criteria)
+        shown_bits = page_bitsets.filter_bits(filter_type, annotation_bits, word_bits, len(all_pages))
+        filtered_pages = [page for position, page in enumerate(all_pages) if shown_bits >> position & 1]
+        
+        # Create the highlighted images of the matching pages in the background,
+        # replacing the pre-warming of the document's previous search
+        prewarm_pages = 0
+        result_id = data.get('resultId')
+        if result_id and os.path.basename(result_path).startswith(f"{result_id}_"):
+            prewarm_pages = highlight_prewarmer.schedule(
+                result_id,
+                [page.get('page_number') for page in all_pages if page['contains_search_words']],
+                search_words, current_app.config['IMAGES_FOLDER'], result_path=result_path,
+                stemming=stemming, max_distance=max_distance, current_page=data.get('currentPage'),
+                max_pages=current_app.config['HIGHLIGHT_PREWARM_MAX_PAGES']
+            )
         
         # Create filtered results
         filtered_results = ocr_results.copy()
+        filtered_results.pop(page_bitsets.METADATA_KEY, None)
         filtered_results['filtered_pages'] = filtered_pages
         filtered_results['all_pages'] = all_pages  # Include all pages for reference
         filtered_results['search_information'] = {
             'search_words': list(search_words),
+            'group_ids': data.get('groupIds'),
             'filter_type': filter_type,
-            'total_matching_pages': len(filtered_pages) if filter_type != 'all' else sum(
-                1 for page in all_pages if page.get('has_annotations', False) or page.get('contains_search_words', False)
-            )
+            'match_mode': match_mode,
+            'max_distance': max_distance,
+            'total_matching_pages': len(filtered_pages) if filter_type != 'all' else page_bitsets.bit_count(
+                annotation_bits | word_bits
+            ),
+            'prewarm_pages': prewarm_pages
         }
         
         return jsonify(filtered_results)
@@ -388,7 +1049,28 @@ def search_results():
     except Exception as e:
         return jsonify({'error': f'Error processing search: {str(e)}'}), 500
 
-@app.route('/publish-notes', methods=['POST'])
+@bp.route('/search-all')
+@profiling.profiled_route('search_all')
+def search_all():
+    """Full-text search across all processed cases, returning ranked page hits with snippets."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing query parameter "q"'}), 400
+    
+    limit = min(request.args.get('limit', default=20, type=int), 200)
+    offset = request.args.get('offset', default=0, type=int)
+    match_any = request.args.get('mode', 'all') == 'any'
+    
+    try:
+        hits = fulltext_index.search(current_app.config['FULLTEXT_INDEX_PATH'], query,
+                                     limit=limit, offset=offset, match_any=match_any)
+    except Exception as e:
+        return jsonify({'error': f'Error searching all cases: {str(e)}'}), 500
+    
+    return jsonify({'query': query, 'hits': hits})
+
+@bp.route('/publish-notes', methods=['POST'])
+@profiling.profiled_route('publish_notes')
 def publish_notes():
     """Generate and save a docx file with multiple note sets for each page."""
     data = request.get_json()
@@ -400,222 +1082,104 @@ def publish_notes():
     base_filename = os.path.splitext(filename)[0]
     note_sets_data = data['noteSets']
     
-    # Create notes content in markdown format
-    markdown_content = f"1. המסמכים הרפואיים שעמדו בפני בעת עריכת חוות דעתי:\n"
-    markdown_content += "* תיק קופת חולים (סיכומי ביקור, אישורים, הפניות, מרשמים)\n"
-
-    family_doctor_dates = []
-    orthopedicHealthInsurance_doctor_dates = []
-    orthopedicHospital_doctor_dates = []
+    # Build the document structure once; every backend renders the same items
+    items = notes_export.build_notes_document(note_sets_data)
     
-    # Helper function to parse date for sorting
-    def parse_date_for_sorting(date_str):
-        """Parse date string for proper sorting. Handle various date formats."""
-        if not date_str or date_str.strip() == '':
-            return datetime.datetime.min  # Put empty dates at the beginning
-        
-        try:
-            # Try different date formats commonly used
-            date_formats = [
-                '%d/%m/%Y',    # DD/MM/YYYY
-                '%d.%m.%Y',    # DD.MM.YYYY
-                '%d-%m-%Y',    # DD-MM-YYYY
-                '%Y-%m-%d',    # YYYY-MM-DD
-                '%d/%m/%y',    # DD/MM/YY
-                '%d.%m.%y',    # DD.MM.YY
-                '%d-%m-%y',    # DD-MM-YY
-            ]
-            
-            date_str = date_str.strip()
-            for date_format in date_formats:
-                try:
-                    return datetime.datetime.strptime(date_str, date_format)
-                except ValueError:
-                    continue
-            
-            # If no format works, try to extract numbers and create a date
-            # This is a fallback for unusual formats
-            import re
-            numbers = re.findall(r'\d+', date_str)
-            if len(numbers) >= 3:
-                day, month, year = int(numbers[0]), int(numbers[1]), int(numbers[2])
-                # Handle 2-digit years
-                if year < 100:
-                    year += 2000 if year < 50 else 1900
-                return datetime.datetime(year, month, day)
-            
-        except Exception as e:
-            print(f"Error parsing date '{date_str}': {str(e)}")
-        
-        # If all else fails, return a date far in the future so it sorts last
-        return datetime.datetime.max
-    
-    # Helper function to format date to dd.mm.yy
-    def format_date_to_display(date_str):
-        """Convert date string to dd.mm.yy format for display."""
-        if not date_str or date_str.strip() == '':
-            return date_str
-        
-        try:
-            # Parse the date first
-            parsed_date = parse_date_for_sorting(date_str)
-            if parsed_date in (datetime.datetime.min, datetime.datetime.max):
-                return date_str  # Return original if parsing failed
-            
-            # Format to dd.mm.yy
-            return parsed_date.strftime('%d.%m.%y')
-        except Exception as e:
-            print(f"Error formatting date '{date_str}': {str(e)}")
-            return date_str  # Return original if formatting fails
-    
-    # Collect dates for each doctor type
-    for page_num in note_sets_data:
-        page_note_sets = note_sets_data.get(str(page_num), [])
-        for note_set in page_note_sets:
-            # Switch cases between family doctor and orthopedic doctor
-            if note_set.get('doctorType') == 'רופא משפחה':
-                family_doctor_dates.append(note_set.get('caseDate', ''))
-            elif note_set.get('doctorType') == 'אורתופד':
-                if note_set.get('isHospital', True):
-                    orthopedicHospital_doctor_dates.append(note_set.get('caseDate', ''))
-                else:
-                    orthopedicHealthInsurance_doctor_dates.append(note_set.get('caseDate', ''))
-    
-    # Sort dates for each doctor type and format them for display
-    family_doctor_dates.sort(key=parse_date_for_sorting)
-    orthopedicHealthInsurance_doctor_dates.sort(key=parse_date_for_sorting)
-    orthopedicHospital_doctor_dates.sort(key=parse_date_for_sorting)
-    
-    # Format dates to dd.mm.yy for display
-    family_doctor_dates_formatted = [format_date_to_display(date) for date in family_doctor_dates]
-    orthopedicHealthInsurance_dates_formatted = [format_date_to_display(date) for date in orthopedicHealthInsurance_doctor_dates]
-    orthopedicHospital_dates_formatted = [format_date_to_display(date) for date in orthopedicHospital_doctor_dates]
-    
-    # Add sorted and formatted dates to markdown content
-    markdown_content += f"  * רופא משפחה -- {', '.join(family_doctor_dates_formatted)}\n"
-    markdown_content += f"  * אורתופד -- {', '.join(orthopedicHealthInsurance_dates_formatted)}\n"
-    markdown_content += "* בתי חולים --\n\n\n"
-    if orthopedicHospital_dates_formatted:
-        markdown_content += f"  * אורתופד -- {', '.join(orthopedicHospital_dates_formatted)}\n"
-
-    markdown_content += "  1. במסמכים הרפואיים שעמדו לפני מצאתי רישומים רבים בהם מתוארים **כאבים בגב התחתון ובצוואר עובר לתאונה הראשונה**. להלן, חלק מאותן הרשומות:\n\n"
-    
-    # Acquire all notes and sort them by date
-    all_notes = []
-    for page_num in note_sets_data:
-        page_note_sets = note_sets_data.get(str(page_num), [])
-        for note_set in page_note_sets:
-            # Add each note set to the list
-            all_notes.append(note_set)
-
-    # Sort all notes by date first, then by doctor type
-    all_notes.sort(key=lambda x: (parse_date_for_sorting(x.get('caseDate', '')), x.get('doctorType', '')))
-    
-    # hebrew_letters = "אבגדהוזחטיכלמנסעפצקרשת"
-    english_letters = "abcdeghijklmnopqrstuvwxyz"
-
-    # Add each sorted note to the markdown content
-    for i, note in enumerate(all_notes):  # Start enumeration from 1
-        formatted_date = format_date_to_display(note.get('caseDate', 'Unknown'))
-        markdown_content += f'    {english_letters[i]}. {note.get('doctorType', 'Unknown')} רשם ביום {formatted_date}: "{note.get('citationNotes', '')}".\n'
+    # Generate a unique filename with timestamp
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    docx_filename = f"notes_{base_filename}_{timestamp}.docx"
+    reference_docx = current_app.config['NOTES_REFERENCE_DOCX']
     
     try:
-        # Generate a unique filename with timestamp
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # Generate temporary filenames for markdown and docx
-        temp_md_filename = f"temp_notes_{base_filename}_{timestamp}.md"
-        docx_filename = f"notes_{base_filename}_{timestamp}.docx"
-        
-        # Ensure directories exist
-        os.makedirs(app.config['NOTES_FOLDER'], exist_ok=True)
-        os.makedirs(app.config['DOCX_FOLDER'], exist_ok=True)
-        
-        # Full paths for files
-        temp_md_path = os.path.join(app.config['NOTES_FOLDER'], temp_md_filename)
-        docx_path = os.path.join(app.config['DOCX_FOLDER'], docx_filename)
-        
-        # Save markdown to a temporary file
-        with open(temp_md_path, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
-        
-        # Check if pandoc is installed
-        try:
-            import pypandoc
-            # Get pandoc version to verify installation
-            version = pypandoc.get_pandoc_version()
-            print(f"Pandoc version: {version}")
-        except Exception as e:
-            print(f"Error checking pandoc: {str(e)}")
-            # Fallback to text file if pandoc conversion fails
-            return jsonify({'error': f'Pandoc not available: {str(e)}'}), 500
-        
-        # Check if reference file exists
-        reference_docx_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'styles', 'reference.docx')
-        reference_arg = ['--reference-doc=' + reference_docx_path] if os.path.exists(reference_docx_path) else []
-        rtl_arg = ["--metadata=dir:rtl"]
-        
-        print(f"Converting {temp_md_path} to {docx_path}")
-        
-        try:
-            # Try conversion with explicit pandoc path first
-            pypandoc.convert_file(
-                temp_md_path,
-                'docx',
-                outputfile=docx_path,
-                extra_args=['--standalone'] + reference_arg + rtl_arg
-            )
-        except Exception as pandoc_error:
-            print(f"Error converting with pandoc: {str(pandoc_error)}")
-            
-            # As a fallback, let's return a text file instead of failing completely
-            text_filename = f"notes_{base_filename}_{timestamp}.txt"
-            text_path = os.path.join(app.config['NOTES_FOLDER'], text_filename)
+        if current_app.config['NOTES_EXPORT_BACKEND'] == 'pandoc':
+            # Optional pandoc backend: converts the markdown version through a pandoc process
+            if notes_export.pandoc_version() is None:
+                return jsonify({'error': 'Pandoc not available'}), 500
             
-            # Copy the markdown file to text file (they're essentially the same format)
-            shutil.copy(temp_md_path, text_path)
-            
-            # Clean up the temporary file
-            if os.path.exists(temp_md_path):
-                os.remove(temp_md_path)
-                
-            # Return text file with warning
-            response = make_response(open(text_path, 'r', encoding='utf-8').read())
-            response.headers["Content-Disposition"] = f"attachment; filename={text_filename}"
-            response.headers["Content-Type"] = "text/plain"
-            return response
-        
-        # Clean up the temporary markdown file
-        if os.path.exists(temp_md_path):
-            os.remove(temp_md_path)
-        
-        if not os.path.exists(docx_path):
-            return jsonify({'error': 'DOCX file was not created successfully'}), 500
+            # Ensure directories exist
+            os.makedirs(current_app.config['NOTES_FOLDER'], exist_ok=True)
+            os.makedirs(current_app.config['DOCX_FOLDER'], exist_ok=True)
+            docx_path = os.path.join(current_app.config['DOCX_FOLDER'], docx_filename)
             
-        # Return the docx file for download
-        return send_from_directory(
-            app.config['DOCX_FOLDER'],
-            docx_filename,
-            as_attachment=True,
-            etag=str(datetime.datetime.now().timestamp())
-        )
+            offload.run_blocking(notes_export.notes_to_docx_with_pandoc, items, docx_path,
+                                 current_app.config['NOTES_FOLDER'], reference_docx)
+            with open(docx_path, 'rb') as f:
+                docx_content = f.read()
+        else:
+            # Native backend: the DOCX is written in memory, no subprocess or temporary files
+            docx_content = offload.run_blocking(notes_export.notes_to_docx, items, reference_docx)
     
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"Error converting to DOCX: {str(e)}")
-        print(f"Detailed error: {error_details}")
-        return jsonify({'error': f'Error converting to DOCX: {str(e)}'}), 500
+        logger.error("Error converting to DOCX: %s", e)
+        
+        # As a fallback, return the notes as a text file instead of failing completely
+        text_filename = f"notes_{base_filename}_{timestamp}.txt"
+        response = make_response(notes_export.notes_to_markdown(items))
+        response.headers["Content-Disposition"] = f"attachment; filename={text_filename}"
+        response.headers["Content-Type"] = "text/plain"
+        return response
+    
+    # Stream the docx file from memory for download
+    return send_file(
+        io.BytesIO(docx_content),
+        mimetype=notes_export.DOCX_MIMETYPE,
+        as_attachment=True,
+        download_name=docx_filename
+    )
+
+@bp.route('/export-notes', methods=['POST'])
+def export_notes():
+    """Start exporting the note sets to DOCX in the background; progress arrives as export_update events."""
+    data = request.get_json()
+    
+    if not data or 'noteSets' not in data or 'filename' not in data:
+        return jsonify({'error': 'Missing required parameters'}), 400
+    
+    base_filename = os.path.splitext(secure_filename(data['filename']))[0]
+    
+    job, deduplicated = export_jobs.start_export(
+        data['noteSets'],
+        f"notes_{base_filename}.docx",
+        current_app.config['DOCX_FOLDER'],
+        backend=current_app.config['NOTES_EXPORT_BACKEND'],
+        reference_docx=current_app.config['NOTES_REFERENCE_DOCX']
+    )
+    job['deduplicated'] = deduplicated
+    return jsonify(job), 202
+
+@bp.route('/export-notes/<job_id>')
+def export_notes_status(job_id):
+    """Get the status of a notes export job."""
+    job = export_jobs.get_export(job_id)
+    if job is None:
+        return jsonify({'error': 'Export job not found'}), 404
+    return jsonify(job)
 
-@app.route('/clean-page-images/<unique_id>/<int:page_number>')
+@bp.route('/export-notes/<job_id>/download')
+def download_exported_notes(job_id):
+    """Download the document of a finished notes export job."""
+    job = export_jobs.get_export(job_id)
+    if job is None:
+        return jsonify({'error': 'Export job not found'}), 404
+    
+    export = export_jobs.export_file(job_id)
+    if export is None:
+        return jsonify({'error': 'Export is not ready', 'status': job['status']}), 409
+    
+    path, download_name = export
+    mimetype = notes_export.DOCX_MIMETYPE if job['format'] == 'docx' else 'text/plain'
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name)
+
+@bp.route('/clean-page-images/<unique_id>/<int:page_number>')
 def serve_clean_page_image(unique_id, page_number):
     """Serve a clean page image (without highlights)."""
     # The clean image files are stored with a specific naming convention
     image_filename = f"page{page_number}_no_highlights.png"
-    clean_images_folder = os.path.join(app.config['IMAGES_FOLDER'], unique_id, "clean_images")
+    clean_images_folder = os.path.join(current_app.config['IMAGES_FOLDER'], unique_id, "clean_images")
     return send_from_directory(clean_images_folder, image_filename)
 
-@app.route('/highlighted-page-images/<unique_id>/<int:page_number>')
+@bp.route('/highlighted-page-images/<unique_id>/<int:page_number>')
+@profiling.profiled_route('highlighted_page_image')
 def serve_highlighted_page_image(unique_id, page_number):
     """Serve a highlighted page image with search words marked."""
     try:
@@ -630,14 +1194,24 @@ def serve_highlighted_page_image(unique_id, page_number):
         if not search_words:
             return jsonify({'error': 'No valid search words provided'}), 400
         
+        # Match on Hebrew stems when the search was done that way
+        stemming = request.args.get('stem', '0') == '1'
+        max_distance = min(max(request.args.get('fuzzy', default=0, type=int), 0), 2)
+        
         # Create highlighted image on demand
-        success, highlighted_image_path, highlight_count = highlight_page_on_demand(
-            unique_id, page_number, search_words, app.config['IMAGES_FOLDER']
+        from word_highlighter import highlight_page_on_demand
+        # Off the event loop when served by eventlet: a miss runs Tesseract on the page
+        success, highlighted_image_path, highlight_count = offload.run_blocking(
+            highlight_page_on_demand, unique_id, page_number, search_words, current_app.config['IMAGES_FOLDER'],
+            result_path=find_result_path(unique_id), stemming=stemming, max_distance=max_distance
         )
         
+        if success:
+            CACHE_REQUESTS.inc(cache='highlight', result='hit' if highlight_count == -1 else 'miss')
+        
         if success and os.path.exists(highlighted_image_path):
             # Get just the filename and folder structure
-            highlighted_images_folder = os.path.join(app.config['IMAGES_FOLDER'], unique_id, "highlighted_images")
+            highlighted_images_folder = os.path.join(current_app.config['IMAGES_FOLDER'], unique_id, "highlighted_images")
             highlighted_image_filename = os.path.basename(highlighted_image_path)
             
             return send_from_directory(highlighted_images_folder, highlighted_image_filename)
@@ -647,6 +1221,37 @@ def serve_highlighted_page_image(unique_id, page_number):
     except Exception as e:
         return jsonify({'error': f'Error serving highlighted image: {str(e)}'}), 500
 
+@bp.route('/prewarm-highlights/<unique_id>', methods=['POST'])
+def prewarm_highlights(unique_id):
+    """Pre-warm the highlighted images nearest to the page the reviewer moved to first."""
+    data = request.get_json(silent=True) or {}
+    current_page = data.get('currentPage')
+    if not isinstance(current_page, int):
+        return jsonify({'error': 'Missing current page'}), 400
+    
+    return jsonify({'pending_pages': highlight_prewarmer.reprioritize(unique_id, current_page)})
+
+@bp.route('/profiles')
+def get_profiles():
+    """List the stored profiles (job ids and profiled requests), newest first."""
+    return jsonify({'profiles': profiling.list_profiles(current_app.config['PROFILES_FOLDER'])})
+
+@bp.route('/profiles/<profile_id>')
+def download_profile(profile_id):
+    """Download a profile as pstats data, or its text summary with ?format=text."""
+    as_text = request.args.get('format') == 'text'
+    try:
+        path = profiling.profile_path(current_app.config['PROFILES_FOLDER'], profile_id, '.txt' if as_text else '.prof')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not os.path.exists(path):
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    return send_from_directory(current_app.config['PROFILES_FOLDER'], os.path.basename(path),
+                               as_attachment=not as_text,
+                               mimetype='text/plain' if as_text else 'application/octet-stream')
+
 def display_ascii_art():
     """
     Display ASCII art from a text file when the application starts.
@@ -683,4 +1288,7 @@ def display_ascii_art():
 if __name__ == '__main__':
     display_ascii_art()
     ensure_user_search_words_file()
+    app = create_app()
+    # Pick up results added or removed while the app was not running
+    fulltext_index.update_index(app.config['FULLTEXT_INDEX_PATH'], app.config['RESULTS_FOLDER'])
     socketio.run(app, debug=True, host='0.0.0.0', port=5001, allow_unsafe_werkzeug=True)
\ No newline at end of file
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark: how long a fresh Python process takes to import the
+app (and create it), and which heavy backends get loaded on the way.
+
+Every measurement runs in a new interpreter, so module caches from earlier
+runs do not hide the cost:
+
+    python benchmarks/bench_import_time.py --output import_before.json
+    python benchmarks/bench_import_time.py --compare import_before.json
+"""
+
+import os
+import sys
+import json
+import platform
+import argparse
+import datetime
+import subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from run_benchmarks import summarize, git_commit, print_comparison
+
+# Modules that are expensive to import and should only load on first use
+HEAVY_MODULES = ("cv2", "numpy", "fitz", "PyPDF2", "pytesseract", "pdf2image", "pypandoc")
+
+# What to time: name -> statement run in a fresh interpreter
+TARGETS = {
+    "import_app": "import app",
+    "create_app": "import app; app.create_app({'LOG_FILE': None})",
+    "import_searcher": "import ocr_results_searcher",
+    "import_pdf_ocr_processor": "import pdf_ocr_processor",
+    "import_word_highlighter": "import word_highlighter",
+}
+
+# Child program: times the statement and reports the heavy modules it loaded
+CHILD_TEMPLATE = """
+import sys, time, json
+sys.path.insert(0, {repo_dir!r})
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_target(statement, python):
+    """
+    Time one statement in a fresh interpreter.
+
+    Args:
+        statement: Python statement to run
+        python: Interpreter to use
+
+    Returns:
+        Tuple of (seconds, heavy modules loaded)
+    """
+    code = CHILD_TEMPLATE.format(repo_dir=REPO_DIR, statement=statement, heavy=HEAVY_MODULES)
+    completed = subprocess.run([python, "-c", code], cwd=REPO_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else "failed")
+    measurement = json.loads(completed.stdout.strip().splitlines()[-1])
+    return measurement["seconds"], measurement["heavy"]
+
+
+def run_import_benchmarks(args):
+    """Time every target and collect the report."""
+    results = {}
+    for name, statement in TARGETS.items():
+        print(f"Timing {name}...", file=sys.stderr)
+        try:
+            timings = []
+            heavy = []
+            for _ in range(args.repeat):
+                seconds, heavy = time_target(statement, args.python)
+                timings.append(seconds)
+            results[name] = summarize(timings)
+            results[name]["heavy_modules_loaded"] = heavy
+        except Exception as e:
+            results[name] = {"error": str(e)}
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"repeat": args.repeat},
+        "results": results
+    }
+
+
+def main():
+    """Command line interface for the import-time benchmark."""
+    parser = argparse.ArgumentParser(description="Measure the import and startup cost of the app")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per target (default: 5)")
+    parser.add_argument("--python", default=sys.executable, help="Interpreter to measure (default: this one)")
+    parser.add_argument("--output", "-o", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON report to compare median timings against")
+    args = parser.parse_args()
+
+    report = run_import_benchmarks(args)
+    report_json = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report_json + "\n")
+        print(f"Import-time report written to {args.output}", file=sys.stderr)
+    else:
+        print(report_json)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
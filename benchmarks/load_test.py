@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Load test: how many concurrent viewers the app serves in each server mode.
+
+Starts serve.py in each mode on a synthetic case (see synthetic_pdf.py) and
+simulates viewers at increasing concurrency. Every viewer keeps a Socket.IO
+connection open (long-polling, as the browser does before upgrading) and
+loops over what the viewer page requests: the case results, full-size page
+images and, every few rounds, a /publish-notes DOCX conversion. A mode's
+capacity is the largest viewer count served without errors and with a 95th
+percentile request latency under --max-p95-ms:
+
+    python benchmarks/load_test.py --viewers 10,50,100,200 --output load.json
+    python benchmarks/load_test.py --modes threading --compare load.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import signal
+import socket
+import argparse
+import platform
+import datetime
+import tempfile
+import threading
+import subprocess
+import statistics
+import http.client
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from run_benchmarks import git_commit, synthetic_note_sets
+
+# Result id and file name of the synthetic case the viewers open
+RESULT_ID = "loadtest"
+DOCUMENT_NAME = "synthetic_case.pdf"
+
+# Every this many rounds a viewer publishes its notes
+PUBLISH_EVERY = 5
+
+# Seconds to wait for a server to answer after starting it
+STARTUP_TIMEOUT = 60
+
+# Server program: serve.py on the synthetic case's folders, without OCR workers
+SERVER_TEMPLATE = """
+import sys, json
+sys.path.insert(0, {repo_dir!r})
+import serve
+serve.run_server({mode!r}, '127.0.0.1', {port}, json.loads({config!r}), ocr_workers=0)
+"""
+
+
+def prepare_case(work_dir, pages, dpi, seed):
+    """
+    Write the synthetic case's results and page images where the servers find them.
+
+    Returns:
+        Tuple of (app config, ground truth of the synthetic pages)
+    """
+    from synthetic_pdf import generate_case_pdf, ground_truth_results
+    from results_store import save_results
+    from pdf_document import PdfDocument
+
+    config = {
+        "RESULTS_FOLDER": os.path.join(work_dir, "results"),
+        "IMAGES_FOLDER": os.path.join(work_dir, "temp_images"),
+        "NOTES_FOLDER": os.path.join(work_dir, "notes"),
+        "DOCX_FOLDER": os.path.join(work_dir, "docx_files"),
+        "UPLOADS_FOLDER": os.path.join(work_dir, "uploads"),
+        "PROFILES_FOLDER": os.path.join(work_dir, "profiles"),
+        "OCR_BACKEND": "queue",  # Nothing is OCRed; the eventlet mode requires it
+        "HIGHLIGHT_PREWARM_WORKERS": 0,
+        "LOG_FILE": None
+    }
+    page_images_folder = os.path.join(config["IMAGES_FOLDER"], RESULT_ID)
+    os.makedirs(config["RESULTS_FOLDER"])
+    os.makedirs(page_images_folder)
+
+    pdf_path = os.path.join(work_dir, DOCUMENT_NAME)
+    ground_truth = generate_case_pdf(pdf_path, pages=pages, seed=seed)
+    results = ground_truth_results(ground_truth, DOCUMENT_NAME)
+    with PdfDocument(pdf_path) as document:
+        for page in results["pages"]:
+            page_number = page["page_number"]
+            document.render(page_number, dpi=dpi).save(os.path.join(page_images_folder, f"page_{page_number}.png"))
+            page["image_url"] = f"/page-images/{RESULT_ID}/{page_number}"
+    base_filename = os.path.splitext(DOCUMENT_NAME)[0]
+    save_results(results, os.path.join(config["RESULTS_FOLDER"], f"{RESULT_ID}_{base_filename}_ocr_results.sqlite"))
+    return config, ground_truth
+
+
+def free_port():
+    """A TCP port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, config, python, log_path):
+    """
+    Start serve.py in a mode and wait until it answers.
+
+    Args:
+        mode: Server mode
+        config: App config of the synthetic case
+        python: Interpreter running the server
+        log_path: File the server's output (its access log) is written to
+
+    Returns:
+        Tuple of (server process, port)
+    """
+    port = free_port()
+    code = SERVER_TEMPLATE.format(repo_dir=REPO_DIR, mode=mode, port=port, config=json.dumps(config))
+    with open(log_path, "w") as log:
+        process = subprocess.Popen([python, "-c", code], cwd=REPO_DIR, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            with open(log_path, "r") as log:
+                error = log.read().strip().splitlines()
+            raise RuntimeError(error[-1] if error else f"server exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/metrics")
+            connection.getresponse().read()
+            connection.close()
+            return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"server did not answer within {STARTUP_TIMEOUT}s")
+
+
+def stop_server(process):
+    """Interrupt a server and wait for it to exit."""
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+class Viewer:
+    """One simulated browser: a Socket.IO connection plus the viewer's page requests."""
+
+    def __init__(self, port, note_sets, timeout, stop):
+        self.port = port
+        self.note_sets = note_sets
+        self.timeout = timeout
+        self.stop = stop
+        self.latencies = []
+        self.errors = 0
+        self.socket_connected = False
+        self.socket_connection = None
+
+    def _request(self, connection, method, path, body=None, headers=None):
+        """Send a request on a kept-alive connection; returns (status, body)."""
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.read()
+
+    def hold_socket(self):
+        """Connect to Socket.IO over long-polling and answer its pings until stopped."""
+        connection = self.socket_connection = http.client.HTTPConnection("127.0.0.1", self.port,
+                                                                         timeout=self.timeout + 30)
+        try:
+            status, body = self._request(connection, "GET", "/socket.io/?EIO=4&transport=polling")
+            if status != 200:
+                raise RuntimeError(f"handshake returned {status}")
+            sid = json.loads(body.decode("utf-8")[1:])["sid"]
+            path = f"/socket.io/?EIO=4&transport=polling&sid={sid}"
+            self._request(connection, "POST", path, body=b"40", headers={"Content-Type": "text/plain"})
+            while not self.stop.is_set():
+                status, body = self._request(connection, "GET", path)
+                if status != 200:
+                    raise RuntimeError(f"poll returned {status}")
+                packets = body.decode("utf-8").split("\x1e")
+                if any(packet.startswith("40") for packet in packets):
+                    self.socket_connected = True
+                if "2" in packets:
+                    self._request(connection, "POST", path, body=b"3", headers={"Content-Type": "text/plain"})
+        except Exception:
+            if not self.stop.is_set():
+                self.errors += 1
+        finally:
+            connection.close()
+
+    def disconnect(self):
+        """End a pending long-poll, which would otherwise last until the server's next ping."""
+        sock = self.socket_connection.sock if self.socket_connection else None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def browse(self, page_numbers):
+        """Request the results, page images and note exports until stopped."""
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=self.timeout)
+        notes_body = json.dumps({"noteSets": self.note_sets, "filename": DOCUMENT_NAME}).encode("utf-8")
+        requests_cycle = [("GET", f"/get-results/{RESULT_ID}/{DOCUMENT_NAME}", None)]
+        rounds = 0
+        while not self.stop.is_set():
+            page_number = random.choice(page_numbers)
+            requests = requests_cycle + [("GET", f"/page-images/{RESULT_ID}/{page_number}", None)]
+            if rounds % PUBLISH_EVERY == PUBLISH_EVERY - 1:
+                requests.append(("POST", "/publish-notes", notes_body))
+            for method, path, body in requests:
+                if self.stop.is_set():
+                    break
+                start = time.perf_counter()
+                try:
+                    headers = {"Content-Type": "application/json"} if body else {}
+                    status, _ = self._request(connection, method, path, body=body, headers=headers)
+                    if status != 200:
+                        self.errors += 1
+                except Exception:
+                    self.errors += 1
+                    connection.close()
+                    connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=self.timeout)
+                    continue
+                self.latencies.append(time.perf_counter() - start)
+            rounds += 1
+        connection.close()
+
+
+def run_load(port, viewers, duration, note_sets, page_numbers, timeout):
+    """Run a number of viewers against a server for a duration and summarize their requests."""
+    stop = threading.Event()
+    simulated = [Viewer(port, note_sets, timeout, stop) for _ in range(viewers)]
+    threads = []
+    for viewer in simulated:
+        threads.append(threading.Thread(target=viewer.hold_socket, daemon=True))
+        threads.append(threading.Thread(target=viewer.browse, args=(page_numbers,), daemon=True))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    elapsed = time.perf_counter() - start
+    for viewer in simulated:
+        viewer.disconnect()
+    for thread in threads:
+        thread.join(timeout=timeout)
+
+    latencies_ms = sorted(latency * 1000 for viewer in simulated for latency in viewer.latencies)
+    p95_index = min(len(latencies_ms) - 1, int(round(0.95 * (len(latencies_ms) - 1))))
+    return {
+        "viewers": viewers,
+        "requests": len(latencies_ms),
+        "requests_per_second": round(len(latencies_ms) / elapsed, 2),
+        "errors": sum(viewer.errors for viewer in simulated),
+        "sockets_connected": sum(viewer.socket_connected for viewer in simulated),
+        "median_ms": round(statistics.median(latencies_ms), 3) if latencies_ms else None,
+        "p95_ms": round(latencies_ms[p95_index], 3) if latencies_ms else None,
+        "max_ms": round(latencies_ms[-1], 3) if latencies_ms else None
+    }
+
+
+def capacity(levels, max_p95_ms):
+    """Largest viewer count served without errors and within the latency target (0 if none)."""
+    served = [level["viewers"] for level in levels
+              if level["errors"] == 0 and level["p95_ms"] is not None and level["p95_ms"] <= max_p95_ms]
+    return max(served, default=0)
+
+
+def run_load_tests(args):
+    """Test every mode at every viewer count and collect the report."""
+    viewer_counts = [int(count) for count in args.viewers.split(",")]
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="mca_load_") as work_dir:
+        print(f"Preparing a {args.pages}-page synthetic case...", file=sys.stderr)
+        config, ground_truth = prepare_case(work_dir, args.pages, args.dpi, args.seed)
+        note_sets = synthetic_note_sets({"ground_truth": ground_truth}, count=args.notes)
+        page_numbers = [page["page_number"] for page in ground_truth]
+
+        for mode in args.modes.split(","):
+            try:
+                process, port = start_server(mode, config, args.python,
+                                             os.path.join(work_dir, f"server_{mode}.log"))
+            except Exception as e:
+                results[mode] = {"error": str(e)}
+                continue
+            try:
+                levels = []
+                for viewers in viewer_counts:
+                    print(f"{mode}: {viewers} viewers for {args.duration}s...", file=sys.stderr)
+                    levels.append(run_load(port, viewers, args.duration, note_sets, page_numbers, args.timeout))
+                results[mode] = {"capacity_viewers": capacity(levels, args.max_p95_ms), "levels": levels}
+            finally:
+                stop_server(process)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"viewers": viewer_counts, "duration": args.duration, "pages": args.pages,
+                       "dpi": args.dpi, "notes": args.notes, "max_p95_ms": args.max_p95_ms},
+        "results": results
+    }
+
+
+def print_comparison(report, baseline):
+    """Print each mode's capacity and p95 latency per viewer count next to a baseline report."""
+    print(f"{'Mode':<10} {'Viewers':>8} {'Baseline p95':>13} {'Current p95':>12} {'Errors':>7}", file=sys.stderr)
+    print("-" * 54, file=sys.stderr)
+    for mode, current in report["results"].items():
+        previous_levels = {level["viewers"]: level
+                           for level in baseline.get("results", {}).get(mode, {}).get("levels", [])}
+        for level in current.get("levels", []):
+            previous = previous_levels.get(level["viewers"], {})
+            print(f"{mode:<10} {level['viewers']:>8} {previous.get('p95_ms', '-'):>13} {level['p95_ms']:>12} "
+                  f"{level['errors']:>7}", file=sys.stderr)
+        previous_capacity = baseline.get("results", {}).get(mode, {}).get("capacity_viewers", "-")
+        print(f"{mode:<10} capacity: {previous_capacity} -> {current.get('capacity_viewers', current.get('error'))}",
+              file=sys.stderr)
+
+
+def main():
+    """Command line interface for the load test."""
+    parser = argparse.ArgumentParser(description="Compare the concurrent viewer capacity of the server modes")
+    parser.add_argument("--modes", default="threading,eventlet", help="Server modes to test (default: threading,eventlet)")
+    parser.add_argument("--viewers", default="10,50,100", help="Concurrent viewer counts (default: 10,50,100)")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per viewer count (default: 20)")
+    parser.add_argument("--pages", type=int, default=5, help="Pages of the synthetic case (default: 5)")
+    parser.add_argument("--dpi", type=int, default=300, help="Resolution of the page images (default: 300, as in the app)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the synthetic PDF (default: 42)")
+    parser.add_argument("--notes", type=int, default=25, help="Note sets per /publish-notes request (default: 25)")
+    parser.add_argument("--max-p95-ms", type=float, default=2000,
+                        help="95th percentile latency a served viewer count stays under (default: 2000)")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds before a request fails (default: 30)")
+    parser.add_argument("--python", default=sys.executable, help="Interpreter running the servers (default: this one)")
+    parser.add_argument("--output", "-o", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run_load_tests(args)
+    report_json = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report_json + "\n")
+        print(f"Load test report written to {args.output}", file=sys.stderr)
+    else:
+        print(report_json)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,741 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the OCR pipeline, search and highlighting.
+
+Generates a synthetic case PDF (see synthetic_pdf.py), runs each benchmark
+against it and writes the timings as JSON, so runs can be compared across
+commits:
+
+    python benchmarks/run_benchmarks.py --pages 20 --output bench_main.json
+    python benchmarks/run_benchmarks.py --pages 20 --compare bench_main.json
+
+Benchmarks that need an external tool (Tesseract, Poppler) are reported as
+skipped when the tool is not installed.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+# Peak RSS growth allowed for the full streaming_memory run beyond its short run
+MEMORY_GROWTH_TOLERANCE_MB = 32
+
+# Registered benchmarks, in run order: name -> function(context) -> list of seconds per operation,
+# or a tuple of (list of seconds, extra fields for the report such as peak memory)
+BENCHMARKS = {}
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark that cannot run in this environment."""
+
+
+def benchmark(name):
+    """Register a benchmark function under a name."""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def timed(func, *args, **kwargs):
+    """Call a function and return (seconds, result)."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def read_peak_rss():
+    """Peak resident set size of the process in bytes (Linux), or None."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """Reset the peak resident set size to the current one (Linux); returns False if unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def measure_memory(func, *args, **kwargs):
+    """
+    Call a function and return its peak memory use in bytes.
+
+    Returns a dict with the tracemalloc peak (Python and NumPy allocations)
+    and, on Linux, the growth of the peak RSS, which also covers buffers
+    allocated by C libraries such as Pillow.
+    """
+    import tracemalloc
+
+    rss_supported = reset_peak_rss()
+    rss_before = read_peak_rss() if rss_supported else None
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, traced_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    memory = {"traced_peak": traced_peak}
+    if rss_before is not None:
+        memory["rss_peak_growth"] = max(read_peak_rss() - rss_before, 0)
+    return memory
+
+
+def summarize(timings):
+    """Summarize a list of per-operation timings in milliseconds."""
+    timings_ms = sorted(t * 1000 for t in timings)
+    p95_index = min(len(timings_ms) - 1, int(round(0.95 * (len(timings_ms) - 1))))
+    return {
+        "runs": len(timings_ms),
+        "mean_ms": round(statistics.mean(timings_ms), 3),
+        "median_ms": round(statistics.median(timings_ms), 3),
+        "min_ms": round(timings_ms[0], 3),
+        "max_ms": round(timings_ms[-1], 3),
+        "p95_ms": round(timings_ms[p95_index], 3),
+        "total_ms": round(sum(timings_ms), 3)
+    }
+
+
+def load_search_words():
+    """All words of the configured search word groups, as the UI sends them."""
+    for filename in ("search_words.json", "search_words.template.json"):
+        path = os.path.join(REPO_DIR, filename)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                groups = json.load(f)
+            return {word for group in groups for word in group.get("representative_group", [])}
+    return {"צוואר", "neck"}
+
+
+def page_numbers(context, highlighted_only=False):
+    """Page numbers of the synthetic document to run per-page benchmarks on."""
+    pages = [page for page in context["ground_truth"] if page["has_annotations"] or not highlighted_only]
+    return [page["page_number"] for page in pages][:context["max_pages"]]
+
+
+@benchmark("render_pdf2image")
+def bench_render_pdf2image(context):
+    """Render single pages with pdf2image (Poppler), as process_pdf did before PdfDocument, for reference."""
+    if shutil.which("pdftoppm") is None:
+        raise SkipBenchmark("Poppler (pdftoppm) not installed")
+    try:
+        from pdf2image import convert_from_path
+    except ImportError:
+        raise SkipBenchmark("pdf2image not installed")
+
+    return [
+        timed(convert_from_path, context["pdf_path"], dpi=context["dpi"],
+              first_page=page_number, last_page=page_number)[0]
+        for page_number in page_numbers(context)
+    ]
+
+
+@benchmark("render_pymupdf")
+def bench_render_pymupdf(context):
+    """Render single pages with PyMuPDF through one PdfDocument handle, as process_pdf does."""
+    from pdf_document import PdfDocument
+
+    with PdfDocument(context["pdf_path"]) as document:
+        return [
+            timed(document.render, page_number, dpi=context["dpi"])[0]
+            for page_number in page_numbers(context)
+        ]
+
+
+@benchmark("time_to_first_progress")
+def bench_time_to_first_progress(context):
+    """Time from calling process_pdf until its first per-page progress event (opening and parsing the PDF)."""
+    from pdf_ocr_processor import process_pdf
+
+    output_path = os.path.join(context["work_dir"], "first_progress.json")
+    timings = []
+    for _ in range(context["repeat"]):
+        events = []
+
+        def progress_callback(current_page, total_pages, status, message=None, error=None, timing=None):
+            if status == 'processing' and total_pages and not events:
+                events.append(time.perf_counter())
+
+        start = time.perf_counter()
+        process_pdf(context["pdf_path"], output_path, page_numbers=[1], dpi=context["dpi"],
+                    progress_callback=progress_callback)
+        if not events:
+            raise RuntimeError("process_pdf reported no page progress")
+        timings.append(events[0] - start)
+    return timings
+
+
+def generate_long_pdf(output_path, ground_truth, pages):
+    """
+    Build a long document for the memory benchmark by repeating the synthetic pages.
+
+    The pages keep their size, line layout and highlights but use a built-in
+    font (the English words only), so nothing is embedded per page and even
+    1000 pages are written in seconds.
+    """
+    import fitz
+    from synthetic_pdf import PAGE_WIDTH, PAGE_HEIGHT, MARGIN, FONT_SIZE, LINE_HEIGHT
+
+    doc = fitz.open()
+    for index in range(pages):
+        truth = ground_truth[index % len(ground_truth)]
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        y = MARGIN
+        for line in truth["text"].splitlines():
+            page.insert_text((MARGIN, y), " ".join(word for word in line.split() if word.isascii()),
+                             fontsize=FONT_SIZE, fontname="helv")
+            y += LINE_HEIGHT
+            if y > PAGE_HEIGHT - MARGIN:
+                break
+        if truth["has_annotations"]:
+            page.add_highlight_annot(fitz.Rect(MARGIN, MARGIN, PAGE_WIDTH - MARGIN, MARGIN + LINE_HEIGHT))
+    doc.save(output_path, garbage=3, deflate=True)
+    doc.close()
+
+
+@benchmark("streaming_memory")
+def bench_streaming_memory(context):
+    """
+    Check that process_pdf's memory stays flat on a long document.
+
+    Processes the first tenth of a --memory-pages document (default 1000)
+    and then all of it, writing page images and SQLite results as the app
+    does, and fails if the peak RSS growth of the full run exceeds the short
+    run's by more than MEMORY_GROWTH_TOLERANCE_MB. Tesseract is replaced by a
+    stand-in returning a page of text: it runs in its own process, and
+    OCRing 1000 pages would take hours. Linux only (peak RSS).
+    """
+    import pdf_ocr_processor
+    from memory_budget import MemoryBudget, DEFAULT_JOB_BUDGET_MB
+    from results_store import load_results
+
+    if not reset_peak_rss():
+        raise SkipBenchmark("peak RSS cannot be measured on this platform")
+
+    pages = context["memory_pages"]
+    pdf_path = os.path.join(context["work_dir"], "long_case.pdf")
+    generate_long_pdf(pdf_path, context["ground_truth"], pages)
+    stand_in_text = context["ground_truth"][0]["text"]
+
+    def run(page_count):
+        image_dir = os.path.join(context["work_dir"], f"streaming_{page_count}")
+        output_path = os.path.join(context["work_dir"], f"streaming_{page_count}_ocr_results.sqlite")
+        budget = MemoryBudget.from_megabytes(DEFAULT_JOB_BUDGET_MB)
+        reset_peak_rss()
+        rss_before = read_peak_rss()
+        seconds, success = timed(pdf_ocr_processor.process_pdf, pdf_path, output_path,
+                                 page_numbers=list(range(1, page_count + 1)), dpi=context["memory_dpi"],
+                                 image_output_dir=image_dir, memory_budget=budget)
+        growth = max(read_peak_rss() - rss_before, 0)
+        shutil.rmtree(image_dir, ignore_errors=True)
+        if not success:
+            raise RuntimeError(f"process_pdf failed on {page_count} pages")
+        # process_pdf records page errors and carries on, so a broken pipeline would still "succeed"
+        stored_pages = load_results(output_path)["pages"]
+        failed_pages = [page["page_number"] for page in stored_pages if "error" in page]
+        if len(stored_pages) != page_count or failed_pages:
+            raise RuntimeError(f"process_pdf stored {len(stored_pages)} of {page_count} pages, "
+                               f"with errors on pages {failed_pages[:10]}")
+        return seconds, growth, budget.peak
+
+    original_ocr = pdf_ocr_processor.perform_ocr_on_image
+    pdf_ocr_processor.perform_ocr_on_image = lambda image, lang, config=None: stand_in_text
+    try:
+        _, short_growth, _ = run(max(1, pages // 10))
+        seconds, full_growth, budget_peak = run(pages)
+    finally:
+        pdf_ocr_processor.perform_ocr_on_image = original_ocr
+
+    fields = {
+        "pages": pages,
+        "dpi": context["memory_dpi"],
+        "peak_rss_growth_mb_short_run": round(short_growth / 2 ** 20, 2),
+        "peak_rss_growth_mb": round(full_growth / 2 ** 20, 2),
+        "peak_reserved_mb": round(budget_peak / 2 ** 20, 2)
+    }
+    if full_growth > short_growth + MEMORY_GROWTH_TOLERANCE_MB * 2 ** 20:
+        raise RuntimeError(f"peak RSS grew with the page count: {fields}")
+    return [seconds / pages], fields
+
+
+@benchmark("remove_annotations")
+def bench_remove_annotations(context):
+    """Remove highlights from a page and save the clean image (remove_highlights_from_page)."""
+    from pdf_ocr_processor import remove_highlights_from_page
+
+    pages = page_numbers(context, highlighted_only=True)
+    if not pages:
+        raise SkipBenchmark("synthetic document has no highlighted pages")
+
+    output_dir = os.path.join(context["work_dir"], "clean_images")
+    return [
+        timed(remove_highlights_from_page, context["pdf_path"], page_number,
+              output_dir=output_dir, dpi=context["dpi"])[0]
+        for page_number in pages
+    ]
+
+
+def generate_blank_pages_pdf(output_path):
+    """
+    Build the pages blank page detection must skip: an empty page, a page with
+    only a page number and an empty sheet scanned with the synthetic scan noise.
+    """
+    import io
+    import random
+    import fitz
+    from PIL import Image
+    from synthetic_pdf import PAGE_WIDTH, PAGE_HEIGHT, add_noise
+
+    doc = fitz.open()
+    doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_text((PAGE_WIDTH / 2 - 10, PAGE_HEIGHT - 40), "- 7 -", fontsize=10)
+    scan = add_noise(Image.new("RGB", (int(PAGE_WIDTH * 150 / 72), int(PAGE_HEIGHT * 150 / 72)), "white"),
+                     random.Random(0), 0.08)
+    buffer = io.BytesIO()
+    scan.save(buffer, "PNG")
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_image(page.rect, stream=buffer.getvalue())
+    doc.save(output_path)
+    doc.close()
+
+
+def generate_short_word_pages_pdf(output_path):
+    """
+    Build pages holding a single short word ("OK", "Signed", "No"), which
+    have as little ink as a page number but must not be skipped as blank.
+    """
+    import fitz
+    from synthetic_pdf import PAGE_WIDTH, PAGE_HEIGHT
+
+    doc = fitz.open()
+    for word, fontsize in (("OK", 10), ("Signed", 12), ("No", 11)):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        page.insert_text((PAGE_WIDTH / 2 - 20, PAGE_HEIGHT / 2), word, fontsize=fontsize)
+    doc.save(output_path)
+    doc.close()
+
+
+@benchmark("blank_check")
+def bench_blank_check(context):
+    """
+    Classify pages as blank from a low-resolution render, as process_pdf does before OCR.
+
+    Runs over the synthetic document and pages with a single short word (no
+    page may be classified blank) and generated blank pages (all must be),
+    and fails on a misclassification.
+    """
+    from pdf_document import PdfDocument
+    from blank_pages import BLANK_CHECK_DPI, is_blank_page
+
+    def classify(document, page_number):
+        with document.render(page_number, dpi=BLANK_CHECK_DPI, annots=False) as image:
+            return is_blank_page(image)
+
+    blank_pdf_path = os.path.join(context["work_dir"], "blank_pages.pdf")
+    generate_blank_pages_pdf(blank_pdf_path)
+    short_word_pdf_path = os.path.join(context["work_dir"], "short_word_pages.pdf")
+    generate_short_word_pages_pdf(short_word_pdf_path)
+
+    timings = []
+    for pdf_path, expected_blank in ((context["pdf_path"], False), (short_word_pdf_path, False),
+                                     (blank_pdf_path, True)):
+        with PdfDocument(pdf_path) as document:
+            for page_number in range(1, document.page_count + 1):
+                seconds, (blank, statistics) = timed(classify, document, page_number)
+                if blank != expected_blank:
+                    raise RuntimeError(f"Page {page_number} of {os.path.basename(pdf_path)} classified as "
+                                       f"{'blank' if blank else 'not blank'}: {statistics}")
+                timings.append(seconds)
+    return timings
+
+
+@benchmark("ocr_page")
+def bench_ocr_page(context):
+    """Tesseract OCR of one rendered page (perform_ocr_on_image)."""
+    if shutil.which("tesseract") is None:
+        raise SkipBenchmark("Tesseract not installed")
+    import fitz
+    from PIL import Image
+    from pdf_ocr_processor import perform_ocr_on_image, setup_tesseract_for_multilingual
+
+    lang = setup_tesseract_for_multilingual()
+    timings = []
+    with fitz.open(context["pdf_path"]) as doc:
+        for page_number in page_numbers(context)[:context["ocr_pages"]]:
+            scale = context["dpi"] / 72
+            pix = doc[page_number - 1].get_pixmap(matrix=fitz.Matrix(scale, scale))
+            image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+            timings.append(timed(perform_ocr_on_image, image, lang)[0])
+    return timings
+
+
+def bench_search(context, **search_options):
+    """Run search_words_in_pages over the ground-truth text with the configured words."""
+    from ocr_results_searcher import search_words_in_pages
+
+    return [
+        timed(search_words_in_pages, context["results"], context["search_words"], **search_options)[0]
+        for _ in range(context["repeat"])
+    ]
+
+
+@benchmark("search_words_exact")
+def bench_search_exact(context):
+    """search_words_in_pages, exact whole-word regex matching."""
+    return bench_search(context)
+
+
+@benchmark("search_words_stem")
+def bench_search_stem(context):
+    """search_words_in_pages with Hebrew stem matching."""
+    return bench_search(context, stemming=True)
+
+
+@benchmark("search_words_fuzzy")
+def bench_search_fuzzy(context):
+    """search_words_in_pages with fuzzy matching (distance 1) on stems."""
+    return bench_search(context, stemming=True, max_distance=1)
+
+
+def synthetic_word_boxes(text, image_width):
+    """Lay the words of a page text out in a grid of boxes, standing in for Tesseract output."""
+    boxes = []
+    left, top = 100, 100
+    for word in text.split():
+        width = 24 * len(word)
+        if left + width > image_width - 100:
+            left, top = 100, top + 70
+        boxes.append({"text": word, "confidence": 90, "left": left, "top": top, "width": width,
+                      "height": 50, "right": left + width, "bottom": top + 50})
+        left += width + 30
+    return boxes
+
+
+@benchmark("highlight_image")
+def bench_highlight_image(context):
+    """
+    create_highlighted_image with precomputed word boxes (matching and drawing, no OCR).
+
+    Besides the latency per page, reports the peak memory of highlighting
+    one page: the tracemalloc peak and the peak RSS growth (Linux), in MB.
+    """
+    import fitz
+    from word_highlighter import create_highlighted_image
+
+    timings = []
+    traced_peaks = []
+    rss_peaks = []
+    image_dir = os.path.join(context["work_dir"], "highlight")
+    os.makedirs(image_dir, exist_ok=True)
+    texts = {page["page_number"]: page["text"] for page in context["ground_truth"]}
+
+    with fitz.open(context["pdf_path"]) as doc:
+        for page_number in page_numbers(context)[:context["highlight_pages"]]:
+            scale = context["dpi"] / 72
+            pix = doc[page_number - 1].get_pixmap(matrix=fitz.Matrix(scale, scale))
+            image_path = os.path.join(image_dir, f"page_{page_number}.png")
+            pix.save(image_path)
+
+            words_data = synthetic_word_boxes(texts[page_number], pix.width)
+            output_path = os.path.join(image_dir, f"page_{page_number}_highlighted.png")
+            timings.append(timed(create_highlighted_image, image_path, context["search_words"],
+                                 output_path, words_data=words_data)[0])
+
+            # Measured in a separate call, as tracing slows the timed one down
+            memory = measure_memory(create_highlighted_image, image_path, context["search_words"],
+                                    output_path, words_data=words_data)
+            traced_peaks.append(memory["traced_peak"])
+            if "rss_peak_growth" in memory:
+                rss_peaks.append(memory["rss_peak_growth"])
+
+    memory_fields = {"peak_traced_mb": round(max(traced_peaks) / 2 ** 20, 2) if traced_peaks else None}
+    if rss_peaks:
+        memory_fields["peak_rss_growth_mb"] = round(max(rss_peaks) / 2 ** 20, 2)
+    return timings, memory_fields
+
+
+@benchmark("search_results_endpoint")
+def bench_search_results_endpoint(context):
+    """POST /search-results through the Flask test client, as the UI calls it."""
+    try:
+        import app as web_app
+    except Exception as e:
+        raise SkipBenchmark(f"cannot import the web app: {e}")
+    from results_store import save_results
+
+    result_path = os.path.join(context["work_dir"], "bench_synthetic_ocr_results.sqlite")
+    save_results(context["results"], result_path)
+
+    client = web_app.create_app().test_client()
+    request_data = {
+        "resultPath": result_path,
+        "searchWords": sorted(context["search_words"]),
+        "filterType": "all",
+        "matchMode": "stem"
+    }
+
+    timings = []
+    for _ in range(context["repeat"]):
+        seconds, response = timed(client.post, "/search-results", json=request_data)
+        if response.status_code != 200:
+            raise RuntimeError(f"/search-results returned {response.status_code}")
+        timings.append(seconds)
+    return timings
+
+
+# Concurrent offloaded calls of offload_logging, and how long they may take before the server counts as hung
+OFFLOAD_CALLS = 40
+OFFLOAD_TIMEOUT_SECONDS = 30
+
+# Run in a child process: under eventlet, a call that hangs blocks the whole event loop
+OFFLOAD_LOGGING_SCRIPT = """
+import sys, json, time, logging
+try:
+    import eventlet
+except Exception as e:
+    print(json.dumps({"skipped": f"eventlet is not available: {e}"}))
+    sys.exit(0)
+eventlet.monkey_patch()
+sys.path.insert(0, sys.argv[1])
+import offload
+from ocr_logging import setup_loggers, log_context, stop_logging
+
+setup_loggers(sys.argv[2], names=("word_highlighter",))
+logger = logging.getLogger("word_highlighter")
+
+def offloaded(i):
+    logger.warning("offloaded call %d", i)
+    logging.getLogger("unconfigured").warning("offloaded call %d without handlers", i)
+    return i
+
+def call(i):
+    with log_context(job_id=f"job{i}"):
+        start = time.perf_counter()
+        offload.run_blocking(offloaded, i)
+        return time.perf_counter() - start
+
+timings = list(eventlet.GreenPool().imap(call, range(int(sys.argv[3]))))
+stop_logging()
+print(json.dumps({"timings": timings}))
+"""
+
+
+@benchmark("offload_logging")
+def bench_offload_logging(context):
+    """
+    Check that calls offloaded to eventlet's thread pool return when they log.
+
+    Runs OFFLOAD_CALLS concurrent offload.run_blocking calls of a function
+    that logs (through a configured logger and one without handlers) in a
+    monkey-patched child process, and fails if they do not all return within
+    OFFLOAD_TIMEOUT_SECONDS or a record is missing from the log file.
+    """
+    log_path = os.path.join(context["work_dir"], "offload_logging.log")
+    try:
+        completed = subprocess.run([sys.executable, "-c", OFFLOAD_LOGGING_SCRIPT, REPO_DIR, log_path,
+                                    str(OFFLOAD_CALLS)],
+                                   capture_output=True, text=True, timeout=OFFLOAD_TIMEOUT_SECONDS)
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"offloaded calls that log did not return within {OFFLOAD_TIMEOUT_SECONDS}s")
+    if completed.returncode != 0:
+        raise RuntimeError(f"offload check failed: {completed.stderr.strip().splitlines()[-1:]}")
+
+    outcome = json.loads(completed.stdout.strip().splitlines()[-1])
+    if "skipped" in outcome:
+        raise SkipBenchmark(outcome["skipped"])
+    with open(log_path, encoding="utf-8") as f:
+        logged = sum(1 for line in f if "offloaded call" in line and "[job job" in line)
+    if logged != OFFLOAD_CALLS:
+        raise RuntimeError(f"{logged} of {OFFLOAD_CALLS} offloaded log records were written with their job tag")
+    return outcome["timings"]
+
+
+def synthetic_note_sets(context, count=25):
+    """Note sets as the UI sends them to /publish-notes, one citation per synthetic page."""
+    doctor_types = ["רופא משפחה", "אורתופד", "אורתופד"]
+    note_sets = {}
+    for index, page in enumerate(context["ground_truth"][:count]):
+        note_sets[str(page["page_number"])] = [{
+            "doctorType": doctor_types[index % len(doctor_types)],
+            "caseDate": f"{index % 28 + 1:02d}/{index % 12 + 1:02d}/20{10 + index % 10}",
+            "isHospital": index % 2 == 0,
+            "citationNotes": page["text"][:120]
+        }]
+    return note_sets
+
+
+@benchmark("notes_export_native")
+def bench_notes_export_native(context):
+    """Build the notes document and write the DOCX in memory (the default /publish-notes backend)."""
+    import notes_export
+
+    note_sets = synthetic_note_sets(context)
+    return [
+        timed(lambda: notes_export.notes_to_docx(notes_export.build_notes_document(note_sets)))[0]
+        for _ in range(context["repeat"])
+    ]
+
+
+@benchmark("notes_export_pandoc")
+def bench_notes_export_pandoc(context):
+    """Build the notes document and convert it with pandoc (the optional /publish-notes backend)."""
+    import notes_export
+
+    if notes_export.pandoc_version() is None:
+        raise SkipBenchmark("pandoc not installed")
+
+    note_sets = synthetic_note_sets(context)
+    docx_path = os.path.join(context["work_dir"], "notes.docx")
+    return [
+        timed(lambda: notes_export.notes_to_docx_with_pandoc(notes_export.build_notes_document(note_sets),
+                                                             docx_path, context["work_dir"]))[0]
+        for _ in range(context["repeat"])
+    ]
+
+
+def git_commit():
+    """Current git commit of the repository, if available."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(args):
+    """Generate the synthetic document, run the selected benchmarks and collect the report."""
+    # Imported here so bench_import_time can reuse the helpers without loading PyMuPDF
+    from synthetic_pdf import generate_case_pdf, ground_truth_results
+
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"Unknown benchmark(s): {', '.join(unknown)}. Available: {', '.join(BENCHMARKS)}")
+
+    work_dir = tempfile.mkdtemp(prefix="mca_bench_")
+    try:
+        pdf_path = os.path.join(work_dir, "synthetic_case.pdf")
+        print(f"Generating {args.pages}-page synthetic PDF (seed {args.seed})...", file=sys.stderr)
+        ground_truth = generate_case_pdf(pdf_path, pages=args.pages, seed=args.seed,
+                                         highlight_share=args.highlight_share,
+                                         scanned_share=args.scanned_share)
+
+        context = {
+            "work_dir": work_dir,
+            "pdf_path": pdf_path,
+            "ground_truth": ground_truth,
+            "results": ground_truth_results(ground_truth),
+            "search_words": load_search_words(),
+            "dpi": args.dpi,
+            "repeat": args.repeat,
+            "max_pages": args.pages,
+            "ocr_pages": args.ocr_pages,
+            "highlight_pages": args.highlight_pages,
+            "memory_pages": args.memory_pages,
+            "memory_dpi": args.memory_dpi
+        }
+
+        results = {}
+        for name in selected:
+            print(f"Running {name}...", file=sys.stderr)
+            try:
+                outcome = BENCHMARKS[name](context)
+                if isinstance(outcome, tuple):
+                    timings, extra_fields = outcome
+                    results[name] = dict(summarize(timings), **extra_fields)
+                else:
+                    results[name] = summarize(outcome)
+            except SkipBenchmark as e:
+                results[name] = {"skipped": str(e)}
+            except Exception as e:
+                results[name] = {"error": str(e)}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "pages": args.pages, "seed": args.seed, "dpi": args.dpi, "repeat": args.repeat,
+            "highlight_share": args.highlight_share, "scanned_share": args.scanned_share
+        },
+        "results": results
+    }
+
+
+def print_comparison(report, baseline):
+    """Print median timings next to a baseline report."""
+    print(f"{'Benchmark':<28} {'Baseline ms':>12} {'Current ms':>12} {'Change':>9}", file=sys.stderr)
+    print("-" * 64, file=sys.stderr)
+    for name, current in report["results"].items():
+        previous = baseline.get("results", {}).get(name, {})
+        if "median_ms" not in current or "median_ms" not in previous:
+            status = current.get("skipped") or current.get("error") or "no baseline"
+            print(f"{name:<28} {'-':>12} {current.get('median_ms', '-'):>12} {status}", file=sys.stderr)
+            continue
+        change = (current["median_ms"] - previous["median_ms"]) / previous["median_ms"] * 100
+        print(f"{name:<28} {previous['median_ms']:>12.2f} {current['median_ms']:>12.2f} {change:>+8.1f}%",
+              file=sys.stderr)
+
+
+def main():
+    """Command line interface for the benchmark suite."""
+    parser = argparse.ArgumentParser(description="Run the pipeline benchmarks on a synthetic case PDF")
+    parser.add_argument("--pages", type=int, default=10, help="Pages in the synthetic PDF (default: 10)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the synthetic PDF (default: 42)")
+    parser.add_argument("--dpi", type=int, default=300, help="Rendering DPI (default: 300, as in the app)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions of whole-document benchmarks (default: 5)")
+    parser.add_argument("--highlight-share", type=float, default=0.3, help="Share of highlighted pages (default: 0.3)")
+    parser.add_argument("--scanned-share", type=float, default=0.5, help="Share of scanned-style pages (default: 0.5)")
+    parser.add_argument("--ocr-pages", type=int, default=3, help="Pages to OCR in ocr_page (default: 3)")
+    parser.add_argument("--highlight-pages", type=int, default=3, help="Pages for highlight_image (default: 3)")
+    parser.add_argument("--memory-pages", type=int, default=1000,
+                        help="Pages of the long document for streaming_memory (default: 1000)")
+    parser.add_argument("--memory-dpi", type=int, default=150, help="Rendering DPI for streaming_memory (default: 150)")
+    parser.add_argument("--only", help=f"Comma-separated benchmarks to run ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--output", "-o", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON report to compare median timings against")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+    report_json = json.dumps(report, ensure_ascii=False, indent=2)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report_json + "\n")
+        print(f"Benchmark report written to {args.output}", file=sys.stderr)
+    else:
+        print(report_json)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Generator for reproducible synthetic case PDFs used by the benchmarks.
+
+Pages mix Hebrew (RTL) and English (LTR) lines of medical-looking text. A
+configurable share of the pages gets highlight annotations, and a share is
+"scanned": rendered to an image, degraded with noise and a slight skew, and
+embedded as a picture instead of text. The same seed always produces the
+same document and the same ground-truth text.
+"""
+
+import io
+import os
+import sys
+import json
+import random
+import argparse
+
+import fitz
+import numpy as np
+from PIL import Image
+
+HEBREW_WORDS = [
+    "צוואר", "הצוואר", "בצוואר", "כאבים", "בגב", "התחתון", "ברך", "הברך", "כתף", "בכתף",
+    "מרפק", "קרסול", "לסת", "המטופל", "מתלונן", "על", "רגישות", "במישוש", "הגבלה",
+    "בתנועה", "בדיקה", "גופנית", "תקינה", "הפניה", "לאורתופד", "צילום", "טיפול",
+    "פיזיותרפיה", "משככי", "תאונה", "דרכים", "לאחר", "שבועות", "ללא", "שיפור"
+]
+
+ENGLISH_WORDS = [
+    "neck", "pain", "cervical", "spine", "lumbar", "L4", "L5", "MRI", "x-ray", "disc",
+    "protrusion", "knee", "shoulder", "rotator", "cuff", "tear", "no", "fracture",
+    "patient", "reports", "tenderness", "limited", "range", "of", "motion", "whiplash"
+]
+
+# Fonts with Hebrew glyphs, tried in order when no --font is given
+HEBREW_FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSansHebrew-Regular.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+
+PAGE_WIDTH, PAGE_HEIGHT = fitz.paper_size("a4")
+MARGIN = 56
+FONT_SIZE = 12
+LINE_HEIGHT = 18
+
+
+def find_hebrew_font(font_path=None):
+    """Return a font file with Hebrew glyphs, or None to fall back to Helvetica."""
+    for path in ([font_path] if font_path else []) + HEBREW_FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def make_line(rng, hebrew):
+    """Make one line of text in logical order, with the occasional word of the other language."""
+    words = []
+    for _ in range(rng.randint(5, 11)):
+        use_hebrew = hebrew if rng.random() > 0.15 else not hebrew
+        words.append(rng.choice(HEBREW_WORDS if use_hebrew else ENGLISH_WORDS))
+    return " ".join(words)
+
+
+def visual_order(line):
+    """
+    Approximate the visual order of an RTL line for drawing left to right.
+
+    PDF text is drawn in visual order, so Hebrew lines are reversed word by
+    word with the letters of Hebrew words reversed too; embedded English
+    words keep their own letter order.
+    """
+    words = []
+    for word in reversed(line.split()):
+        words.append(word[::-1] if any("\u0590" <= ch <= "\u05ff" for ch in word) else word)
+    return " ".join(words)
+
+
+def add_noise(image, rng, noise_level):
+    """Degrade a rendered page so it looks scanned: grey noise, speckles and a slight skew."""
+    np_rng = np.random.default_rng(rng.randint(0, 2 ** 32 - 1))
+    pixels = np.asarray(image.convert("L"), dtype=np.int16)
+
+    pixels = pixels + np_rng.normal(0, 255 * noise_level, pixels.shape).astype(np.int16)
+    speckles = np_rng.random(pixels.shape) < noise_level / 10
+    pixels[speckles] = 0
+
+    noisy = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), mode="L")
+    return noisy.rotate(rng.uniform(-1.5, 1.5), fillcolor=255, expand=False)
+
+
+def generate_case_pdf(output_path, pages=20, seed=42, highlight_share=0.3, scanned_share=0.5,
+                      noise_level=0.08, scan_dpi=150, font_path=None):
+    """
+    Generate a synthetic case PDF.
+
+    Args:
+        output_path: Where to write the PDF
+        pages: Number of pages
+        seed: Random seed; the same seed gives the same document
+        highlight_share: Share of pages with highlight annotations (0-1)
+        scanned_share: Share of pages embedded as noisy scanned images (0-1)
+        noise_level: Strength of the scan noise (0-1)
+        scan_dpi: Resolution of the scanned pages
+        font_path: Font with Hebrew glyphs (auto-detected if None)
+
+    Returns:
+        Ground truth: list of dicts with page_number, text, scanned and highlighted flags
+    """
+    rng = random.Random(seed)
+    font_file = find_hebrew_font(font_path)
+    if font_file is None:
+        print("Warning: no font with Hebrew glyphs found; Hebrew text will not render. "
+              "Pass --font to use one.", file=sys.stderr)
+
+    font = fitz.Font(fontfile=font_file) if font_file else fitz.Font("helv")
+    font_kwargs = {"fontname": "hebfont", "fontfile": font_file} if font_file else {"fontname": "helv"}
+
+    doc = fitz.open()
+    ground_truth = []
+
+    for page_number in range(1, pages + 1):
+        scanned = rng.random() < scanned_share
+        highlighted = rng.random() < highlight_share
+
+        lines = []
+        for _ in range(rng.randint(18, 34)):
+            lines.append(make_line(rng, hebrew=rng.random() < 0.7))
+
+        # Lay the text out on a born-digital page first
+        text_doc = fitz.open()
+        text_page = text_doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        y = MARGIN
+        for line in lines:
+            is_rtl = any("\u0590" <= ch <= "\u05ff" for ch in line.split()[0])
+            drawn = visual_order(line) if is_rtl else line
+            x = MARGIN
+            if is_rtl:
+                width = font.text_length(drawn, fontsize=FONT_SIZE)
+                x = max(MARGIN, PAGE_WIDTH - MARGIN - width)
+            text_page.insert_text((x, y), drawn, fontsize=FONT_SIZE, **font_kwargs)
+            y += LINE_HEIGHT
+            if y > PAGE_HEIGHT - MARGIN:
+                break
+
+        if scanned:
+            # Replace the text page with a degraded picture of itself
+            pix = text_page.get_pixmap(matrix=fitz.Matrix(scan_dpi / 72, scan_dpi / 72))
+            image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+            noisy = add_noise(image, rng, noise_level)
+            page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            png_buffer = io.BytesIO()
+            noisy.save(png_buffer, "PNG")
+            page.insert_image(page.rect, stream=png_buffer.getvalue())
+        else:
+            doc.insert_pdf(text_doc)
+            page = doc[-1]
+        text_doc.close()
+
+        if highlighted:
+            # Highlight a few random line bands, the way reviewers mark findings
+            for _ in range(rng.randint(1, 4)):
+                line_index = rng.randrange(len(lines))
+                top = MARGIN + line_index * LINE_HEIGHT - FONT_SIZE
+                rect = fitz.Rect(MARGIN, top, PAGE_WIDTH - MARGIN, top + LINE_HEIGHT)
+                page.add_highlight_annot(rect)
+
+        ground_truth.append({
+            "page_number": page_number,
+            "text": "\n".join(lines),
+            "scanned": scanned,
+            "has_annotations": highlighted
+        })
+
+    doc.save(output_path, garbage=3, deflate=True)
+    doc.close()
+    return ground_truth
+
+
+def ground_truth_results(ground_truth, document_name="synthetic.pdf"):
+    """Wrap ground truth in the layout of process_pdf results, for benchmarks that skip OCR."""
+    return {
+        "document_name": document_name,
+        "total_pages_in_document": len(ground_truth),
+        "pages_processed": len(ground_truth),
+        "page_numbers_processed": [page["page_number"] for page in ground_truth],
+        "language": "Hebrew and English",
+        "pages": [
+            {
+                "page_number": page["page_number"],
+                "has_annotations": page["has_annotations"],
+                "annotation_types": ["Highlight"] if page["has_annotations"] else [],
+                "text": page["text"]
+            }
+            for page in ground_truth
+        ]
+    }
+
+
+def main():
+    """Command line interface for generating a synthetic case PDF."""
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic Hebrew/English case PDF")
+    parser.add_argument("output", help="Output PDF path")
+    parser.add_argument("--pages", type=int, default=20, help="Number of pages (default: 20)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument("--highlight-share", type=float, default=0.3, help="Share of highlighted pages (default: 0.3)")
+    parser.add_argument("--scanned-share", type=float, default=0.5, help="Share of scanned-style pages (default: 0.5)")
+    parser.add_argument("--noise", type=float, default=0.08, help="Scan noise level 0-1 (default: 0.08)")
+    parser.add_argument("--font", help="Font file with Hebrew glyphs")
+    parser.add_argument("--ground-truth", help="Also write the page texts as OCR-style results JSON")
+    args = parser.parse_args()
+
+    ground_truth = generate_case_pdf(args.output, args.pages, args.seed, args.highlight_share,
+                                     args.scanned_share, args.noise, font_path=args.font)
+    print(f"Wrote {args.output} ({args.pages} pages)")
+
+    if args.ground_truth:
+        with open(args.ground_truth, "w", encoding="utf-8") as f:
+            json.dump(ground_truth_results(ground_truth, os.path.basename(args.output)), f,
+                      ensure_ascii=False, indent=2)
+        print(f"Wrote {args.ground_truth}")
+
+
+if __name__ == "__main__":
+    main()
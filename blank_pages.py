@@ -0,0 +1,106 @@
+from typing import Any, Dict
+
+import cv2
+import numpy as np
+
+# Resolution of the render the classifier looks at (a letter page is about 425x550 pixels)
+BLANK_CHECK_DPI = 50
+
+# Default thresholds of is_blank_page; each can be overridden (app config, processor CLI)
+DEFAULT_BLANK_THRESHOLDS = {
+    # Grayscale value (0-255) below which a pixel counts as ink; bleed-through and paper tone stay above it
+    "ink_level": 160,
+    # Share of the page that may be ink
+    "max_ink_ratio": 0.003,
+    # Ink blobs a blank page may have (a page number, punch holes that escaped the border)
+    "max_components": 5,
+    # Ink blobs a blank page may have in its body, inside the margins: a single short
+    # word there ("OK", "Signed") has as few blobs as a page number, but is text
+    "max_body_components": 0,
+    # Share of each side, inside the border, where page numbers, running headers and punch holes are
+    "margin": 0.12,
+    # Blobs smaller than this many pixels are dust and scanner noise, not ink
+    "min_component_area": 4,
+    # Share of each side ignored, where scan edges, shadows and punch holes are
+    "border": 0.04,
+}
+
+
+def thresholds_with(overrides: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Get the default thresholds with some of them replaced (None values are ignored)."""
+    thresholds = dict(DEFAULT_BLANK_THRESHOLDS)
+    for key, value in (overrides or {}).items():
+        if key not in thresholds:
+            raise ValueError(f"Unknown blank page threshold: {key}")
+        if value is not None:
+            thresholds[key] = value
+    return thresholds
+
+
+def ink_statistics(image, ink_level: int = DEFAULT_BLANK_THRESHOLDS["ink_level"],
+                   min_component_area: int = DEFAULT_BLANK_THRESHOLDS["min_component_area"],
+                   border: float = DEFAULT_BLANK_THRESHOLDS["border"],
+                   margin: float = DEFAULT_BLANK_THRESHOLDS["margin"]) -> Dict[str, Any]:
+    """
+    Measure the ink on a (low-resolution) page image.
+
+    Args:
+        image: PIL image of the page
+        ink_level: Grayscale value below which a pixel counts as ink
+        min_component_area: Smallest blob, in pixels, counted as a component
+        border: Share of each side left out of the measurement
+        margin: Share of each side, inside the border, outside the page body
+
+    Returns:
+        Dictionary with 'ink_ratio' (share of ink pixels), 'components'
+        (ink blobs of at least min_component_area pixels) and 'body_components'
+        (those of them centered in the page body)
+    """
+    gray = np.asarray(image.convert("L"))
+    height, width = gray.shape
+    dy, dx = int(height * border), int(width * border)
+    gray = gray[dy:height - dy, dx:width - dx]
+    if gray.size == 0:
+        return {"ink_ratio": 0.0, "components": 0, "body_components": 0}
+
+    ink = (gray < ink_level).astype(np.uint8)
+    ink_pixels = int(np.count_nonzero(ink))
+    components = body_components = 0
+    if ink_pixels:
+        _, _, stats, centroids = cv2.connectedComponentsWithStats(ink, connectivity=8)
+        # Row 0 is the background
+        counted = stats[1:, cv2.CC_STAT_AREA] >= min_component_area
+        components = int(np.count_nonzero(counted))
+        height, width = gray.shape
+        x, y = centroids[1:, 0], centroids[1:, 1]
+        in_body = ((x >= width * margin) & (x <= width * (1 - margin))
+                   & (y >= height * margin) & (y <= height * (1 - margin)))
+        body_components = int(np.count_nonzero(counted & in_body))
+    return {"ink_ratio": round(ink_pixels / gray.size, 6), "components": components,
+            "body_components": body_components}
+
+
+def is_blank_page(image, thresholds: Dict[str, Any] = None) -> tuple:
+    """
+    Classify a page as blank (separator sheet, empty back side) from pixel statistics.
+
+    A page is blank when its ink ratio and its number of ink blobs are under
+    the thresholds: a near-blank page with a page number still counts as
+    blank, while a page with a few lines of text has far more blobs than
+    max_components. Any blob in the page body (max_body_components) makes
+    it text, however short, as the margins are where page numbers are.
+
+    Args:
+        image: PIL image of the page, rendered at about BLANK_CHECK_DPI
+        thresholds: Thresholds as in DEFAULT_BLANK_THRESHOLDS (defaults if None)
+
+    Returns:
+        Tuple of (blank, statistics from ink_statistics)
+    """
+    thresholds = thresholds or DEFAULT_BLANK_THRESHOLDS
+    statistics = ink_statistics(image, thresholds["ink_level"], thresholds["min_component_area"],
+                                thresholds["border"], thresholds["margin"])
+    blank = (statistics["ink_ratio"] <= thresholds["max_ink_ratio"]
+             and statistics["components"] <= thresholds["max_components"]
+             and statistics["body_components"] <= thresholds["max_body_components"])
+    return blank, statistics
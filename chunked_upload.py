@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+# Size of the chunks the browser sends (each chunk is one request, below MAX_CONTENT_LENGTH)
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Largest accepted upload
+MAX_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024
+
+# Block size for streaming request bodies to disk and hashing files
+COPY_BLOCK_SIZE = 1024 * 1024
+
+# Incomplete uploads older than this are removed by cleanup_stale_uploads
+STALE_UPLOAD_SECONDS = 24 * 60 * 60
+
+# Suffixes of the upload state file and the partial data file
+STATE_SUFFIX = '.json'
+PART_SUFFIX = '.part'
+
+
+class UploadError(Exception):
+    """Error in a chunked upload, carrying the HTTP status to report it with."""
+
+    def __init__(self, message: str, status: int = 400, received_bytes: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.received_bytes = received_bytes
+
+
+# One lock per upload id, so concurrent chunk requests of the same upload are serialized
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(upload_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(upload_id, threading.Lock())
+
+
+def _paths(uploads_folder: str, upload_id: str) -> Tuple[str, str]:
+    """Paths of an upload's state file and partial data file."""
+    if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+        raise UploadError('Invalid upload id', 400)
+    return (os.path.join(uploads_folder, upload_id + STATE_SUFFIX),
+            os.path.join(uploads_folder, upload_id + PART_SUFFIX))
+
+
+def _with_progress(state: Dict[str, Any], part_path: str) -> Dict[str, Any]:
+    """Add the number of bytes received so far (the size of the partial file) to a state."""
+    state = dict(state)
+    state['received_bytes'] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    return state
+
+
+def create_upload(uploads_folder: str, filename: str, total_size: int, sha256: Optional[str] = None,
+                  options: Optional[Dict[str, Any]] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Start a chunked upload, or resume an unfinished one of the same file.
+
+    An upload is resumed when an incomplete upload with the same filename,
+    size and checksum exists, so a browser that lost its upload id can still
+    continue where it stopped.
+
+    Args:
+        uploads_folder: Folder holding partial uploads
+        filename: Sanitized name of the uploaded file
+        total_size: Size of the whole file in bytes
+        sha256: Hex SHA-256 of the whole file, verified on completion (optional)
+        options: Extra job options stored with the upload (e.g. page range)
+        chunk_size: Chunk size the client should use
+
+    Returns:
+        Upload state with upload_id, chunk_size and received_bytes
+    """
+    if total_size <= 0:
+        raise UploadError('File is empty', 400)
+    if total_size > MAX_UPLOAD_SIZE:
+        raise UploadError(f'File is larger than {MAX_UPLOAD_SIZE // (1024 * 1024)} MB', 413)
+
+    os.makedirs(uploads_folder, exist_ok=True)
+    sha256 = sha256.lower() if sha256 else None
+
+    existing = find_upload(uploads_folder, filename, total_size, sha256)
+    if existing:
+        return existing
+
+    state = {
+        'upload_id': uuid.uuid4().hex,
+        'filename': filename,
+        'total_size': total_size,
+        'sha256': sha256,
+        'chunk_size': chunk_size,
+        'options': options or {},
+        'created': time.time()
+    }
+    state_path, part_path = _paths(uploads_folder, state['upload_id'])
+    open(part_path, 'wb').close()
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+
+    return _with_progress(state, part_path)
+
+
+def find_upload(uploads_folder: str, filename: str, total_size: int,
+                sha256: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Find an incomplete upload of the same file (same name, size and checksum)."""
+    if not os.path.isdir(uploads_folder):
+        return None
+
+    for entry in os.listdir(uploads_folder):
+        if not entry.endswith(STATE_SUFFIX):
+            continue
+        try:
+            state = load_upload(uploads_folder, entry[:-len(STATE_SUFFIX)])
+        except UploadError:
+            continue
+        if (state['filename'], state['total_size'], state.get('sha256')) == (filename, total_size, sha256):
+            return state
+    return None
+
+
+def load_upload(uploads_folder: str, upload_id: str) -> Dict[str, Any]:
+    """
+    Get the state of an upload, including how many bytes have been received.
+
+    Raises:
+        UploadError: If the upload does not exist
+    """
+    state_path, part_path = _paths(uploads_folder, upload_id)
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        raise UploadError('Upload not found', 404)
+    return _with_progress(state, part_path)
+
+
+def write_chunk(uploads_folder: str, upload_id: str, offset: int, stream: BinaryIO) -> int:
+    """
+    Stream one chunk from a request body into the partial file.
+
+    The chunk must start at or before the number of bytes already received:
+    re-sending the last chunk after a lost acknowledgement overwrites it,
+    while a gap is rejected. Data is flushed to disk before returning, so
+    an acknowledged chunk survives a crash.
+
+    Args:
+        uploads_folder: Folder holding partial uploads
+        upload_id: Id of the upload
+        offset: Byte offset of the chunk in the file
+        stream: Readable binary stream with the chunk data
+
+    Returns:
+        Number of bytes received after this chunk
+
+    Raises:
+        UploadError: For unknown uploads, gaps, or data beyond the declared size
+    """
+    with _lock_for(upload_id):
+        state = load_upload(uploads_folder, upload_id)
+        received = state['received_bytes']
+        if offset < 0 or offset > received:
+            raise UploadError(f'Chunk offset {offset} does not match received bytes', 409, received)
+
+        _, part_path = _paths(uploads_folder, upload_id)
+        with open(part_path, 'r+b') as f:
+            f.seek(offset)
+            position = offset
+            while True:
+                block = stream.read(COPY_BLOCK_SIZE)
+                if not block:
+                    break
+                position += len(block)
+                if position > state['total_size']:
+                    f.truncate(offset)
+                    raise UploadError('Chunk goes beyond the declared file size', 400, offset)
+                f.write(block)
+            # A re-sent chunk may be shorter than the data it replaces
+            if position < received:
+                f.truncate(position)
+            f.flush()
+            os.fsync(f.fileno())
+            return position
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a file, read from disk in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete_upload(uploads_folder: str, upload_id: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Verify an upload is whole and hand over the assembled file.
+
+    Args:
+        uploads_folder: Folder holding partial uploads
+        upload_id: Id of the upload
+
+    Returns:
+        Tuple of (path of the assembled PDF, upload state). The caller owns
+        the file from now on.
+
+    Raises:
+        UploadError: If bytes are missing (409) or the checksum does not match (422).
+                     A file with a wrong checksum is discarded.
+    """
+    with _lock_for(upload_id):
+        state = load_upload(uploads_folder, upload_id)
+        state_path, part_path = _paths(uploads_folder, upload_id)
+
+        if state['received_bytes'] != state['total_size']:
+            raise UploadError('Upload is incomplete', 409, state['received_bytes'])
+
+        if state.get('sha256'):
+            actual = file_sha256(part_path)
+            if actual != state['sha256']:
+                remove_upload(uploads_folder, upload_id)
+                raise UploadError('Checksum mismatch, the upload was discarded', 422)
+
+        pdf_path = os.path.join(uploads_folder, upload_id + '.pdf')
+        os.replace(part_path, pdf_path)
+        os.remove(state_path)
+
+    with _locks_guard:
+        _locks.pop(upload_id, None)
+    return pdf_path, state
+
+
+def remove_upload(uploads_folder: str, upload_id: str) -> None:
+    """Delete an upload's state and partial data."""
+    for path in _paths(uploads_folder, upload_id):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def cleanup_stale_uploads(uploads_folder: str, max_age: float = STALE_UPLOAD_SECONDS) -> int:
+    """
+    Remove incomplete uploads that have not received data for a while.
+
+    Args:
+        uploads_folder: Folder holding partial uploads
+        max_age: Age in seconds after which an untouched upload is removed
+
+    Returns:
+        Number of uploads removed
+    """
+    if not os.path.isdir(uploads_folder):
+        return 0
+
+    removed = 0
+    now = time.time()
+    for entry in os.listdir(uploads_folder):
+        if not entry.endswith(STATE_SUFFIX):
+            continue
+        upload_id = entry[:-len(STATE_SUFFIX)]
+        try:
+            _, part_path = _paths(uploads_folder, upload_id)
+        except UploadError:
+            continue
+        last_write = os.path.getmtime(part_path) if os.path.exists(part_path) else 0
+        if now - last_write > max_age:
+            remove_upload(uploads_folder, upload_id)
+            removed += 1
+    return removed
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import notes_export
+from offload import run_blocking
+from progress_tracker import emit_event
+
+logger = logging.getLogger(__name__)
+
+# Socket.IO event carrying export job updates, next to the OCR 'progress_update' events
+EXPORT_EVENT = 'export_update'
+
+# Exported files and finished jobs older than this are removed
+EXPORT_MAX_AGE_SECONDS = 24 * 60 * 60
+
+# Bumped when the export output changes, so older exported files are not reused
+EXPORT_FORMAT_VERSION = 1
+
+# Prefix of the exported files in the export folder (named by content digest)
+EXPORT_FILE_PREFIX = 'export_'
+
+# Statuses of an export that is still running, so an identical one waits for it
+ACTIVE_STATUSES = ('queued', 'building', 'writing')
+
+# Export jobs by job id, and the job id of each content digest
+export_jobs: Dict[str, Dict[str, Any]] = {}
+_jobs_by_digest: Dict[str, str] = {}
+_lock = threading.Lock()
+
+
+def notes_digest(note_sets_data: Dict[str, Any], filename: str, backend: str,
+                 reference_docx: Optional[str]) -> str:
+    """
+    Content digest of an export: the note sets, file name, backend and reference styles.
+
+    Exports with the same digest produce the same document, so the first
+    one is reused.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(note_sets_data, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    digest.update(f"\0{filename}\0{backend}\0{EXPORT_FORMAT_VERSION}".encode('utf-8'))
+    if reference_docx and os.path.exists(reference_docx):
+        stat = os.stat(reference_docx)
+        digest.update(f"\0{stat.st_mtime_ns}\0{stat.st_size}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of a job (without server paths), as returned to clients."""
+    status = {key: value for key, value in job.items() if key != 'path'}
+    if job['status'] == 'completed':
+        status['download_url'] = f"/export-notes/{job['job_id']}/download"
+    return status
+
+
+def _update(job: Dict[str, Any], status: str, percentage: int, message: str, **fields) -> None:
+    """Update a job and emit it to the clients."""
+    with _lock:
+        job.update(status=status, percentage=percentage, message=message, **fields)
+        payload = {'job_id': job['job_id'], 'data': job_status(job)}
+    emit_event(EXPORT_EVENT, payload)
+
+
+def _run_export(job: Dict[str, Any], note_sets_data: Dict[str, Any], backend: str,
+                reference_docx: Optional[str], export_folder: str) -> None:
+    """Build and write the document of an export job (runs in a background thread)."""
+    items = None
+    try:
+        _update(job, 'building', 10, f"Sorting {job['notes_count']} note sets...")
+        items = notes_export.build_notes_document(note_sets_data)
+
+        _update(job, 'writing', 50, 'Writing DOCX document...')
+        temp_path = f"{job['path']}.{job['job_id']}.tmp"
+        if backend == 'pandoc':
+            run_blocking(notes_export.notes_to_docx_with_pandoc, items, temp_path, export_folder, reference_docx)
+        else:
+            docx_content = run_blocking(notes_export.notes_to_docx, items, reference_docx)
+            with open(temp_path, 'wb') as f:
+                f.write(docx_content)
+        # Publish the finished file atomically, so a reused export is never partial
+        os.replace(temp_path, job['path'])
+
+        _update(job, 'completed', 100, 'Notes exported to DOCX', finished=time.time())
+
+    except Exception as e:
+        logger.error("Error exporting notes: %s", e, extra={'job_id': job['job_id']})
+        if os.path.exists(f"{job['path']}.{job['job_id']}.tmp"):
+            os.remove(f"{job['path']}.{job['job_id']}.tmp")
+
+        # As a fallback, export the notes as a text file instead of failing completely
+        try:
+            if items is None:
+                items = notes_export.build_notes_document(note_sets_data)
+            text_path = os.path.join(export_folder, f"{EXPORT_FILE_PREFIX}{job['job_id']}.txt")
+            with open(text_path, 'w', encoding='utf-8') as f:
+                f.write(notes_export.notes_to_markdown(items))
+            _update(job, 'completed', 100, 'DOCX export failed, notes exported as text',
+                    path=text_path, format='txt', filename=os.path.splitext(job['filename'])[0] + '.txt',
+                    error=str(e), finished=time.time())
+        except Exception as fallback_error:
+            _update(job, 'error', job['percentage'], 'Export failed', error=str(fallback_error),
+                    finished=time.time())
+
+
+def start_export(note_sets_data: Dict[str, Any], filename: str, export_folder: str, backend: str = 'native',
+                 reference_docx: Optional[str] = notes_export.DEFAULT_REFERENCE_DOCX) -> Tuple[Dict[str, Any], bool]:
+    """
+    Start exporting note sets in a background thread, or reuse an identical export.
+
+    Progress is emitted as EXPORT_EVENT over Socket.IO and can be polled with
+    get_export.
+
+    Args:
+        note_sets_data: Note sets by page number, as sent by the UI
+        filename: Download name of the exported document
+        export_folder: Folder for the exported files
+        backend: Export backend ('native' or 'pandoc')
+        reference_docx: Path of the reference DOCX providing the styles
+
+    Returns:
+        Tuple of (job status, whether an existing export was reused)
+    """
+    os.makedirs(export_folder, exist_ok=True)
+    cleanup_old_exports(export_folder)
+
+    digest = notes_digest(note_sets_data, filename, backend, reference_docx)
+    path = os.path.join(export_folder, f"{EXPORT_FILE_PREFIX}{digest[:32]}.docx")
+    now = time.time()
+
+    with _lock:
+        # A running export is joined and a finished DOCX reused; failed ones are retried
+        existing = export_jobs.get(_jobs_by_digest.get(digest))
+        if existing and existing.get('format') == 'docx' and (
+                existing['status'] in ACTIVE_STATUSES
+                or (existing['status'] == 'completed' and os.path.exists(existing['path']))):
+            return job_status(existing), True
+
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'digest': digest,
+            'filename': filename,
+            'format': 'docx',
+            'path': path,
+            'notes_count': sum(len(note_sets) for note_sets in note_sets_data.values()),
+            'status': 'queued',
+            'percentage': 0,
+            'message': 'Export queued',
+            'created': now,
+            'finished': None
+        }
+        export_jobs[job['job_id']] = job
+        _jobs_by_digest[digest] = job['job_id']
+
+        # The same notes were exported before this process started
+        if os.path.exists(path):
+            os.utime(path)
+            job.update(status='completed', percentage=100, message='Notes exported to DOCX', finished=now)
+            return job_status(job), True
+
+    threading.Thread(target=_run_export, args=(job, note_sets_data, backend, reference_docx, export_folder),
+                     daemon=True).start()
+    return job_status(job), False
+
+
+def get_export(job_id: str) -> Optional[Dict[str, Any]]:
+    """Get the status of an export job, or None if it is unknown."""
+    with _lock:
+        job = export_jobs.get(job_id)
+        return job_status(job) if job else None
+
+
+def export_file(job_id: str) -> Optional[Tuple[str, str]]:
+    """
+    Get the exported file of a completed job.
+
+    Returns:
+        Tuple of (file path, download name), or None if the job is unknown,
+        not completed or its file was removed
+    """
+    with _lock:
+        job = export_jobs.get(job_id)
+        if not job or job['status'] != 'completed' or not os.path.exists(job['path']):
+            return None
+        return job['path'], job['filename']
+
+
+def cleanup_old_exports(export_folder: str, max_age: float = EXPORT_MAX_AGE_SECONDS) -> int:
+    """
+    Remove exported files and finished jobs older than max_age.
+
+    Args:
+        export_folder: Folder of the exported files
+        max_age: Age in seconds after which an export is removed
+
+    Returns:
+        Number of files removed
+    """
+    now = time.time()
+    with _lock:
+        for job_id, job in list(export_jobs.items()):
+            if job['finished'] and now - job['finished'] > max_age:
+                del export_jobs[job_id]
+                if _jobs_by_digest.get(job['digest']) == job_id:
+                    del _jobs_by_digest[job['digest']]
+
+    removed = 0
+    if not os.path.isdir(export_folder):
+        return removed
+    for entry in os.listdir(export_folder):
+        path = os.path.join(export_folder, entry)
+        if entry.startswith(EXPORT_FILE_PREFIX) and now - os.path.getmtime(path) > max_age:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
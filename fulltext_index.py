@@ -0,0 +1,324 @@
+import os
+import sys
+import glob
+import time
+import sqlite3
+import argparse
+from contextlib import closing
+from typing import List, Dict, Any, Optional
+
+import results_store
+
+# Suffixes of the results files that are fed into the index
+RESULTS_SUFFIXES = ("_ocr_results.sqlite", "_ocr_results.json")
+
+# Default file name of the index inside the results folder
+DEFAULT_INDEX_FILENAME = "fulltext_index.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    document_name TEXT,
+    source_path TEXT NOT NULL,
+    source_mtime REAL NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5(
+    document_id UNINDEXED,
+    page_number UNINDEXED,
+    text,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def connect(index_path: str) -> sqlite3.Connection:
+    """Open the full-text index, creating the schema if needed."""
+    conn = sqlite3.connect(index_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def document_id_for(results_path: str) -> str:
+    """
+    Get the document id of a results file: its name without the results suffix.
+
+    For files written by the web app this is '<result_id>_<original name>'.
+    """
+    filename = os.path.basename(results_path)
+    for suffix in RESULTS_SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return os.path.splitext(filename)[0]
+
+
+def find_results_files(results_folder: str) -> Dict[str, str]:
+    """
+    Find all results files in a folder, keyed by document id.
+
+    When a document exists in both formats the SQLite file wins.
+    """
+    files = {}
+    for suffix in reversed(RESULTS_SUFFIXES):
+        for path in glob.glob(os.path.join(results_folder, f"*{suffix}")):
+            files[document_id_for(path)] = path
+    return files
+
+
+def _index_document(conn: sqlite3.Connection, document_id: str, results: Dict[str, Any],
+                    source_path: str, source_mtime: float) -> None:
+    """Replace the indexed pages of one document."""
+    conn.execute("DELETE FROM page_text WHERE document_id = ?", (document_id,))
+    conn.executemany(
+        "INSERT INTO page_text (document_id, page_number, text) VALUES (?, ?, ?)",
+        ((document_id, page.get("page_number"), results_store.searchable_text(page))
+         for page in results.get("pages", []))
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO documents (document_id, document_name, source_path, source_mtime, indexed_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (document_id, results.get("document_name"), os.path.abspath(source_path), source_mtime, time.time())
+    )
+
+
+def index_results_file(index_path: str, results_path: str, force: bool = False) -> bool:
+    """
+    Add (or refresh) one results file in the index.
+
+    Files whose modification time hasn't changed since they were last
+    indexed are skipped, which makes repeated calls cheap.
+
+    Args:
+        index_path: Path of the full-text index
+        results_path: Path of the results file to index
+        force: Re-index even if the file is unchanged
+
+    Returns:
+        True if the file was (re-)indexed, False if it was already up to date
+    """
+    document_id = document_id_for(results_path)
+    source_mtime = os.path.getmtime(results_path)
+
+    with closing(connect(index_path)) as conn:
+        if not force:
+            row = conn.execute(
+                "SELECT source_mtime FROM documents WHERE document_id = ?", (document_id,)
+            ).fetchone()
+            if row and row[0] >= source_mtime:
+                return False
+
+        results = results_store.load_results(results_path)
+        with conn:
+            _index_document(conn, document_id, results, results_path, source_mtime)
+
+    return True
+
+
+def index_pages(index_path: str, results_path: str, page_numbers: List[int]) -> bool:
+    """
+    Refresh only some pages of an indexed document, e.g. after they were re-OCRed.
+
+    Documents that are not indexed yet are indexed as a whole.
+
+    Args:
+        index_path: Path of the full-text index
+        results_path: Path of the results file the pages were stored in
+        page_numbers: Page numbers to re-index
+
+    Returns:
+        True if only the pages were re-indexed, False if the whole document was
+    """
+    document_id = document_id_for(results_path)
+
+    with closing(connect(index_path)) as conn:
+        indexed = conn.execute("SELECT 1 FROM documents WHERE document_id = ?", (document_id,)).fetchone()
+    if not indexed:
+        index_results_file(index_path, results_path, force=True)
+        return False
+
+    pages = [results_store.load_page(results_path, page_number) for page_number in page_numbers]
+    with closing(connect(index_path)) as conn:
+        with conn:
+            conn.executemany(
+                "DELETE FROM page_text WHERE document_id = ? AND page_number = ?",
+                ((document_id, page_number) for page_number in page_numbers)
+            )
+            conn.executemany(
+                "INSERT INTO page_text (document_id, page_number, text) VALUES (?, ?, ?)",
+                ((document_id, page["page_number"], results_store.searchable_text(page))
+                 for page in pages if page is not None)
+            )
+            # The file changed, but its index is current again
+            conn.execute(
+                "UPDATE documents SET source_mtime = ?, indexed_at = ? WHERE document_id = ?",
+                (os.path.getmtime(results_path), time.time(), document_id)
+            )
+    return True
+
+
+def remove_document(index_path: str, document_id: str) -> None:
+    """Remove a document from the index."""
+    with closing(connect(index_path)) as conn:
+        with conn:
+            conn.execute("DELETE FROM page_text WHERE document_id = ?", (document_id,))
+            conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+
+
+def update_index(index_path: str, results_folder: str) -> Dict[str, int]:
+    """
+    Incrementally bring the index in line with a results folder.
+
+    New and modified results are indexed; documents whose results no longer
+    exist are removed.
+
+    Args:
+        index_path: Path of the full-text index
+        results_folder: Folder containing the results files
+
+    Returns:
+        Counts of 'indexed', 'unchanged' and 'removed' documents
+    """
+    counts = {"indexed": 0, "unchanged": 0, "removed": 0}
+    results_files = find_results_files(results_folder)
+
+    for document_id, results_path in sorted(results_files.items()):
+        try:
+            if index_results_file(index_path, results_path):
+                counts["indexed"] += 1
+            else:
+                counts["unchanged"] += 1
+        except Exception as e:
+            print(f"Error indexing {results_path}: {str(e)}", file=sys.stderr)
+
+    with closing(connect(index_path)) as conn:
+        indexed_ids = [row[0] for row in conn.execute("SELECT document_id FROM documents")]
+
+    for document_id in indexed_ids:
+        if document_id not in results_files:
+            remove_document(index_path, document_id)
+            counts["removed"] += 1
+
+    return counts
+
+
+def rebuild_index(index_path: str, results_folder: str) -> Dict[str, int]:
+    """
+    Rebuild the index from scratch from a results folder.
+
+    Args:
+        index_path: Path of the full-text index
+        results_folder: Folder containing the results files
+
+    Returns:
+        Counts of 'indexed', 'unchanged' and 'removed' documents
+    """
+    with closing(connect(index_path)) as conn:
+        with conn:
+            conn.execute("DELETE FROM page_text")
+            conn.execute("DELETE FROM documents")
+        conn.execute("INSERT INTO page_text (page_text) VALUES ('optimize')")
+
+    return update_index(index_path, results_folder)
+
+
+def build_match_query(query: str, match_any: bool = False) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every term is quoted so FTS5 operators and punctuation in the user's
+    input are matched literally.
+
+    Args:
+        query: Free-text query
+        match_any: Match pages containing any term instead of all terms
+
+    Returns:
+        The MATCH expression, or None if the query has no terms
+    """
+    terms = [term.replace('"', '""') for term in query.split() if term.strip()]
+    if not terms:
+        return None
+    return (" OR " if match_any else " ").join(f'"{term}"' for term in terms)
+
+
+def search(index_path: str, query: str, limit: int = 20, offset: int = 0,
+           match_any: bool = False) -> List[Dict[str, Any]]:
+    """
+    Search all indexed documents and return ranked page hits.
+
+    Args:
+        index_path: Path of the full-text index
+        query: Free-text query
+        limit: Maximum number of hits to return
+        offset: Number of hits to skip (for paging)
+        match_any: Match pages containing any term instead of all terms
+
+    Returns:
+        List of hits, best first, each with document id/name, page number,
+        BM25 score (lower is better) and a snippet with the matches in [brackets]
+    """
+    match_query = build_match_query(query, match_any)
+    if match_query is None or not os.path.exists(index_path):
+        return []
+
+    with closing(connect(index_path)) as conn:
+        rows = conn.execute(
+            """
+            SELECT page_text.document_id, documents.document_name, page_text.page_number,
+                   bm25(page_text) AS score,
+                   snippet(page_text, 2, '[', ']', '...', 16)
+            FROM page_text
+            LEFT JOIN documents ON documents.document_id = page_text.document_id
+            WHERE page_text MATCH ?
+            ORDER BY score
+            LIMIT ? OFFSET ?
+            """,
+            (match_query, limit, offset)
+        ).fetchall()
+
+    return [
+        {
+            "document_id": document_id,
+            "document_name": document_name,
+            "page_number": page_number,
+            "score": round(score, 4),
+            "snippet": snippet
+        }
+        for document_id, document_name, page_number, score, snippet in rows
+    ]
+
+
+def main() -> None:
+    """Command line interface for building and querying the cross-case index."""
+    parser = argparse.ArgumentParser(description='Full-text search across all processed cases')
+    parser.add_argument('--index', help=f'Path of the index (default: <results folder>/{DEFAULT_INDEX_FILENAME})')
+    parser.add_argument('--results-folder', default='results', help='Folder containing OCR results (default: results)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    search_parser = subparsers.add_parser('search', help='Search all indexed cases')
+    search_parser.add_argument('query', nargs='+', help='Words to search for')
+    search_parser.add_argument('--limit', type=int, default=20, help='Maximum number of hits (default: 20)')
+    search_parser.add_argument('--any', action='store_true', help='Match pages containing any of the words')
+
+    subparsers.add_parser('update', help='Index new and changed results, drop deleted ones')
+    subparsers.add_parser('rebuild', help='Rebuild the index from scratch')
+
+    args = parser.parse_args()
+    index_path = args.index or os.path.join(args.results_folder, DEFAULT_INDEX_FILENAME)
+
+    if args.command == 'search':
+        hits = search(index_path, " ".join(args.query), limit=args.limit, match_any=args.any)
+        if not hits:
+            print("No matches found.")
+        for hit in hits:
+            print(f"{hit['document_name'] or hit['document_id']} (page {hit['page_number']}, score {hit['score']})")
+            print(f"    {hit['snippet']}")
+    else:
+        rebuild = args.command == 'rebuild'
+        counts = (rebuild_index if rebuild else update_index)(index_path, args.results_folder)
+        print(f"Indexed {counts['indexed']}, unchanged {counts['unchanged']}, removed {counts['removed']} document(s).")
+
+
+if __name__ == "__main__":
+    main()
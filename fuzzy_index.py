@@ -0,0 +1,137 @@
+from typing import List, Set, Dict, Tuple, Iterable
+
+# Largest edit distance the fuzzy index supports
+MAX_SUPPORTED_DISTANCE = 2
+
+# Search words shorter than this many characters per allowed edit are only
+# matched exactly; one typo in a three-letter word matches too much noise
+CHARS_PER_EDIT = 4
+
+
+def allowed_distance(word: str, max_distance: int) -> int:
+    """
+    Get the edit distance allowed for a search word.
+
+    Short words get a smaller budget than max_distance: words of up to three
+    letters are matched exactly, four to seven letters allow one edit, and
+    so on.
+
+    Args:
+        word: The search word
+        max_distance: The configured maximum distance
+
+    Returns:
+        The number of edits tolerated for this word
+    """
+    return max(0, min(max_distance, len(word) // CHARS_PER_EDIT))
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions).
+
+    Stops early once the distance is known to exceed max_distance.
+
+    Args:
+        a: First string
+        b: Second string
+        max_distance: Distance above which the exact value is not needed
+
+    Returns:
+        The distance, or max_distance + 1 if it is larger than max_distance
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        # Later rows can only reach back one row further (transpositions)
+        if min(current) > max_distance and min(previous) + 1 > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+def deletes(word: str, max_distance: int) -> Set[str]:
+    """
+    Get every string reachable from a word by deleting up to max_distance characters.
+
+    Args:
+        word: The word to generate deletions for
+        max_distance: Maximum number of deleted characters
+
+    Returns:
+        Set of deletion variants, the word itself included
+    """
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for variant in frontier:
+            for i in range(len(variant)):
+                next_frontier.add(variant[:i] + variant[i + 1:])
+        next_frontier -= variants
+        variants |= next_frontier
+        frontier = next_frontier
+    return variants
+
+
+class DeletionIndex:
+    """
+    Symmetric-deletion index over a token vocabulary (as used by SymSpell).
+
+    Every vocabulary token is stored under all of its deletion variants. A
+    lookup generates the deletion variants of the query, so only tokens
+    sharing a variant are compared with a real edit distance instead of the
+    whole vocabulary.
+    """
+
+    def __init__(self, vocabulary: Iterable[str], max_distance: int = 1):
+        if not 0 <= max_distance <= MAX_SUPPORTED_DISTANCE:
+            raise ValueError(f"max_distance must be between 0 and {MAX_SUPPORTED_DISTANCE}")
+
+        self.max_distance = max_distance
+        self.vocabulary: Set[str] = set(vocabulary)
+        self._variants: Dict[str, List[str]] = {}
+        for token in self.vocabulary:
+            for variant in deletes(token, max_distance):
+                self._variants.setdefault(variant, []).append(token)
+
+    def lookup(self, word: str, max_distance: int = None) -> List[Tuple[str, int]]:
+        """
+        Find vocabulary tokens within an edit distance of a word.
+
+        Args:
+            word: The (normalized) word to look up
+            max_distance: Distance to use, at most the index's (default: the index's)
+
+        Returns:
+            List of (token, distance) pairs, closest first
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+        max_distance = min(max_distance, self.max_distance)
+
+        if max_distance == 0:
+            return [(word, 0)] if word in self.vocabulary else []
+
+        candidates = set()
+        for variant in deletes(word, max_distance):
+            candidates.update(self._variants.get(variant, ()))
+
+        matches = []
+        for token in candidates:
+            distance = edit_distance(word, token, max_distance)
+            if distance <= max_distance:
+                matches.append((token, distance))
+
+        return sorted(matches, key=lambda match: (match[1], match[0]))
@@ -0,0 +1,255 @@
+import os
+import re
+import sys
+import json
+import argparse
+from typing import List, Set, Dict, Any, Tuple
+
+# Tokens as seen by the whole-word regex matching (letters, digits, underscore)
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Hebrew letters (alef to tav) - prefixes are only stripped from Hebrew tokens
+HEBREW_LETTER_PATTERN = re.compile(r'[א-ת]')
+
+# Niqqud and cantillation marks
+NIQQUD_PATTERN = re.compile(r'[֑-ׇ]')
+
+# Final letter forms mapped to their regular forms
+FINAL_LETTERS = str.maketrans('ךםןףץ', 'כמנפצ')
+
+# Letters that can be attached in front of a word (ו, ה, ב, ל, מ, כ, ש)
+PREFIX_LETTERS = 'והבלמכש'
+
+# Longest prefix sequence stripped (e.g. "ומה", "וכש", "שבה")
+MAX_PREFIX_LENGTH = 3
+
+# Never strip a word down to fewer letters than this; two-letter stems made
+# common words match short search words (מיד found יד, שגב found גב)
+MIN_STEM_LENGTH = 3
+
+# Bump when stem matching changes, so stem matches cached elsewhere are recomputed
+STEMMER_VERSION = 2
+
+
+def normalize_token(token: str) -> str:
+    """
+    Normalize a single token for stem matching.
+
+    Lowercases, removes niqqud, maps final letters to their regular forms and
+    collapses doubled ו/י so plene and defective spellings (כתיב מלא/חסר,
+    e.g. צוואר/צואר) compare equal.
+
+    Args:
+        token: The token to normalize
+
+    Returns:
+        Normalized token
+    """
+    token = NIQQUD_PATTERN.sub('', token.lower().strip())
+    token = token.translate(FINAL_LETTERS)
+    return token.replace('וו', 'ו').replace('יי', 'י')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into tokens using the same word boundaries as whole-word matching.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of raw (not normalized) tokens
+    """
+    return TOKEN_PATTERN.findall(NIQQUD_PATTERN.sub('', text))
+
+
+def _is_valid_prefix(prefix: str) -> bool:
+    """
+    Check whether a sequence of letters can be a Hebrew proclitic prefix.
+
+    ו (and) can only open the sequence and ה (the) can only close it, so
+    e.g. "ומה", "וב", "שה" are accepted but "הב" or "בו" are not.
+    """
+    if not prefix or any(letter not in PREFIX_LETTERS for letter in prefix):
+        return False
+    if 'ו' in prefix[1:]:
+        return False
+    if 'ה' in prefix[:-1]:
+        return False
+    return len(set(prefix)) == len(prefix)
+
+
+def stem_candidates(token: str) -> Set[str]:
+    """
+    Get all normalized forms a token may stand for once prefixes are stripped.
+
+    Prefix stripping is ambiguous (מלך may be a word or מ + לך), so instead of
+    picking one stem every plausible reading is returned, the full token
+    included.
+
+    Args:
+        token: A single raw token
+
+    Returns:
+        Set of normalized candidate stems
+    """
+    candidates = {normalize_token(token)}
+    if not HEBREW_LETTER_PATTERN.match(token):
+        return candidates
+
+    for length in range(1, MAX_PREFIX_LENGTH + 1):
+        if len(token) - length < MIN_STEM_LENGTH:
+            break
+        if not _is_valid_prefix(token[:length]):
+            break
+        candidates.add(normalize_token(token[length:]))
+
+    return candidates
+
+
+def term_key(word: str) -> Tuple[str, ...]:
+    """
+    Get the normalized token sequence a search word is matched by.
+
+    Args:
+        word: Search word or phrase
+
+    Returns:
+        Tuple of normalized tokens (one element for single words)
+    """
+    return tuple(normalize_token(token) for token in tokenize(word))
+
+
+def reduce_search_words(search_words: Set[str]) -> Dict[Tuple[str, ...], str]:
+    """
+    Collapse search word variants that stem matching already covers.
+
+    A word is dropped when it is another configured word with a prefix
+    attached (הצוואר, לצוואר, ...) or a spelling variant of it (צואר),
+    since matching on stems finds those forms anyway.
+
+    Args:
+        search_words: Set of search words, typically a representative group
+
+    Returns:
+        Dictionary mapping each remaining term key to the word it is displayed as
+    """
+    terms: Dict[Tuple[str, ...], str] = {}
+
+    # Shortest normalized form first, so the base form is kept as the display
+    # word; among equal forms prefer the plene spelling (צוואר over צואר)
+    for word in sorted(search_words, key=lambda w: (len(''.join(term_key(w))), -len(w), w)):
+        key = term_key(word)
+        if key and key not in terms:
+            terms[key] = word
+
+    reduced = {}
+    for key, word in terms.items():
+        if len(key) == 1:
+            covering_forms = stem_candidates(tokenize(word)[0]) - {key[0]}
+            if any((form,) in terms for form in covering_forms):
+                continue
+        reduced[key] = word
+
+    return reduced
+
+
+def match_terms(text_tokens: List[str], terms: Dict[Tuple[str, ...], str]) -> List[str]:
+    """
+    Find which search terms occur in a list of tokens, matching on stems.
+
+    Args:
+        text_tokens: Raw tokens of the text to search
+        terms: Term keys mapped to display words, as built by reduce_search_words
+
+    Returns:
+        Display words of the matching terms
+    """
+    token_candidates = [stem_candidates(token) for token in text_tokens]
+    all_candidates = set().union(*token_candidates) if token_candidates else set()
+
+    matched = []
+    for key, word in terms.items():
+        if len(key) == 1:
+            if key[0] in all_candidates:
+                matched.append(word)
+            continue
+
+        # Phrases: every token must match, consecutively
+        if not all(part in all_candidates for part in key):
+            continue
+        for start in range(len(token_candidates) - len(key) + 1):
+            if all(key[i] in token_candidates[start + i] for i in range(len(key))):
+                matched.append(word)
+                break
+
+    return matched
+
+
+def compatibility_report(word_groups: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Show which configured variants of each word group the stemmer already covers.
+
+    Args:
+        word_groups: Search word groups as in search_words.json
+
+    Returns:
+        One entry per group with the variants still needed and those covered
+    """
+    report = []
+    for group in word_groups:
+        variants = group.get("representative_group", [])
+        needed = sorted(reduce_search_words(set(variants)).values())
+        needed_set = set(needed)
+        covered = sorted({variant for variant in variants if variant not in needed_set})
+        report.append({
+            "word": group.get("word"),
+            "configured_variants": len(set(variants)),
+            "needed": needed,
+            "covered": covered
+        })
+    return report
+
+
+def main() -> None:
+    """Print the stemmer compatibility report for a search words file."""
+    parser = argparse.ArgumentParser(description='Report which search word variants Hebrew stem matching covers')
+    parser.add_argument('--search-words', default=None,
+                        help='Search words JSON file (default: search_words.json, or the template)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('--verbose', '-v', action='store_true', help='List the covered variants too')
+    args = parser.parse_args()
+
+    path = args.search_words
+    if path is None:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        path = os.path.join(base_dir, 'search_words.json')
+        if not os.path.exists(path):
+            path = os.path.join(base_dir, 'search_words.template.json')
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            word_groups = json.load(f)
+    except Exception as e:
+        print(f"Error loading search words from '{path}': {str(e)}")
+        sys.exit(1)
+
+    report = compatibility_report(word_groups)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    total_configured = sum(entry["configured_variants"] for entry in report)
+    total_needed = sum(len(entry["needed"]) for entry in report)
+    for entry in report:
+        print(f"{entry['word']}: {entry['configured_variants']} variants, "
+              f"{len(entry['needed'])} needed, {len(entry['covered'])} covered by the stemmer")
+        if args.verbose and entry["covered"]:
+            print(f"    covered: {', '.join(entry['covered'])}")
+    print("-" * 80)
+    print(f"Total: {total_needed} of {total_configured} configured variants still needed for stem matching.")
+
+
+if __name__ == "__main__":
+    main()
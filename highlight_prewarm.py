@@ -0,0 +1,241 @@
+import os
+import sys
+import heapq
+import logging
+import itertools
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from offload import green_threads, run_blocking
+from ocr_logging import log_context
+
+logger = logging.getLogger(__name__)
+
+# Pre-warm threads run at the lowest CPU priority (Linux nice value), below OCR jobs
+PREWARM_NICENESS = 19
+
+# Seconds between checks whether the OCR jobs that paused pre-warming have finished
+OCR_POLL_INTERVAL = 1.0
+
+
+def prewarm_order(page_numbers: Iterable[int], current_page: Optional[int] = None) -> List[int]:
+    """
+    Order pages for pre-warming: the current page's neighbours first.
+
+    Pages are sorted by their distance to the current page, the following
+    page before the preceding one at the same distance. Without a current
+    page they keep document order.
+
+    Args:
+        page_numbers: Page numbers to pre-warm
+        current_page: Page the reviewer is looking at (optional)
+
+    Returns:
+        Page numbers in pre-warm order
+    """
+    pages = sorted(set(page_numbers))
+    if current_page is None:
+        return pages
+    return sorted(pages, key=lambda page: (abs(page - current_page), page < current_page))
+
+
+def _lower_thread_priority() -> None:
+    """Run the calling thread at the lowest priority (Linux sets nice values per thread)."""
+    # A greenlet shares its OS thread with the whole eventlet server
+    if not sys.platform.startswith('linux') or green_threads():
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PREWARM_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+class HighlightPrewarmer:
+    """
+    Low-priority worker pool creating highlighted page images ahead of time.
+
+    After a search, the matching pages of the document are queued (see
+    schedule) and the workers create their highlighted images with
+    highlight_page_on_demand, so the first click on "show word highlights"
+    finds them in the cache. Each document has one plan: a new search on
+    it replaces the queued pages of the previous one, and a page change
+    only reorders them (reprioritize). A page already being highlighted
+    is finished, everything else of a replaced plan is dropped.
+
+    Pre-warming never competes with OCR: the workers run at the lowest
+    CPU priority, and no new page is started while ocr_active() is true.
+    """
+
+    def __init__(self, workers: int = 1, ocr_active: Optional[Callable[[], bool]] = None,
+                 on_page: Optional[Callable[[str], None]] = None):
+        """
+        Create a pool; its threads are started with the first schedule.
+
+        Args:
+            workers: Number of worker threads (0 disables pre-warming)
+            ocr_active: Returns True while OCR jobs are running, pausing the workers
+            on_page: Called with 'generated', 'cached', 'failed' or 'cancelled'
+                for every queued page, e.g. to count them in metrics
+        """
+        self.workers = workers
+        self.ocr_active = ocr_active or (lambda: False)
+        self.on_page = on_page or (lambda result: None)
+        self._cond = threading.Condition()
+        self._queue: List[tuple] = []  # (priority, sequence, unique_id, generation, page_number)
+        self._plans: Dict[str, Dict[str, Any]] = {}
+        self._sequence = itertools.count()
+        self._generations = itertools.count(1)
+        self._threads: List[threading.Thread] = []
+        self._stopped = False
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the pool has workers."""
+        return self.workers > 0 and not self._stopped
+
+    def _start_workers(self) -> None:
+        """Start the worker threads that are not running yet (called with the lock held)."""
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"highlight-prewarm-{len(self._threads)}",
+                                      daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _drop_queued(self, unique_id: str, cancelled: bool = True) -> None:
+        """Remove the queued pages of a document (called with the lock held)."""
+        dropped = [entry for entry in self._queue if entry[2] == unique_id]
+        if dropped:
+            self._queue = [entry for entry in self._queue if entry[2] != unique_id]
+            heapq.heapify(self._queue)
+            if cancelled:
+                for _ in dropped:
+                    self.on_page('cancelled')
+
+    def _enqueue(self, unique_id: str, plan: Dict[str, Any], current_page: Optional[int]) -> int:
+        """Queue the pending pages of a plan in pre-warm order (called with the lock held)."""
+        self._drop_queued(unique_id, cancelled=False)
+        plan['generation'] = next(self._generations)
+        pages = prewarm_order(plan['pending'], current_page)
+        for priority, page_number in enumerate(pages):
+            heapq.heappush(self._queue, (priority, next(self._sequence), unique_id, plan['generation'], page_number))
+        self._plans[unique_id] = plan
+        self._start_workers()
+        self._cond.notify_all()
+        return len(pages)
+
+    def schedule(self, unique_id: str, page_numbers: Iterable[int], search_words: Set[str],
+                 images_folder: str, result_path: Optional[str] = None, stemming: bool = False,
+                 max_distance: int = 0, current_page: Optional[int] = None, max_pages: int = 50) -> int:
+        """
+        Pre-warm the highlighted images of a search, replacing the document's previous one.
+
+        Args:
+            unique_id: Unique identifier of the document
+            page_numbers: Pages the search matched
+            search_words: Words to highlight, as the highlight route receives them
+            images_folder: Base images folder path
+            result_path: Path to the document's results, used to cache word boxes
+            stemming: Match on Hebrew stems
+            max_distance: Also highlight words within this edit distance
+            current_page: Page the reviewer is looking at, whose neighbours go first
+            max_pages: Pre-warm at most this many pages (the nearest ones)
+
+        Returns:
+            Number of pages queued
+        """
+        with self._cond:
+            # The previous search's pages are not needed anymore
+            self._cancel(unique_id)
+            pages = prewarm_order(page_numbers, current_page)[:max_pages]
+            if not self.enabled or not search_words or not pages:
+                return 0
+            plan = {
+                'pending': set(pages),
+                'search_words': set(search_words),
+                'images_folder': images_folder,
+                'result_path': result_path,
+                'stemming': stemming,
+                'max_distance': max_distance
+            }
+            return self._enqueue(unique_id, plan, current_page)
+
+    def reprioritize(self, unique_id: str, current_page: int) -> int:
+        """
+        Reorder a document's queued pages around the page the reviewer moved to.
+
+        Returns:
+            Number of pages still queued for the document
+        """
+        with self._cond:
+            plan = self._plans.get(unique_id)
+            if plan is None or not plan['pending']:
+                return 0
+            return self._enqueue(unique_id, plan, current_page)
+
+    def _cancel(self, unique_id: str) -> None:
+        """Drop a document's plan (called with the lock held)."""
+        self._drop_queued(unique_id)
+        self._plans.pop(unique_id, None)
+
+    def cancel(self, unique_id: str) -> None:
+        """Stop pre-warming a document; a page already being highlighted is finished."""
+        with self._cond:
+            self._cancel(unique_id)
+
+    def pending(self, unique_id: str) -> int:
+        """Number of pages of a document still queued."""
+        with self._cond:
+            plan = self._plans.get(unique_id)
+            return len(plan['pending']) if plan else 0
+
+    def shutdown(self) -> None:
+        """Drop all queued work and stop the workers once their current page is done."""
+        with self._cond:
+            self._stopped = True
+            for unique_id in list(self._plans):
+                self._cancel(unique_id)
+            self._cond.notify_all()
+
+    def _next_page(self) -> Optional[tuple]:
+        """Wait for the next page to pre-warm; None once the pool is shut down."""
+        with self._cond:
+            while not self._stopped:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                if self.ocr_active():
+                    self._cond.wait(OCR_POLL_INTERVAL)
+                    continue
+
+                _, _, unique_id, generation, page_number = heapq.heappop(self._queue)
+                plan = self._plans.get(unique_id)
+                if plan is None or plan['generation'] != generation:
+                    continue
+                plan['pending'].discard(page_number)
+                if not plan['pending']:
+                    del self._plans[unique_id]
+                return unique_id, page_number, plan
+            return None
+
+    def _work(self) -> None:
+        """Worker thread: highlight queued pages until the pool is shut down."""
+        _lower_thread_priority()
+        # Imported here like in the app: it pulls in cv2, numpy and the Tesseract wrapper
+        from word_highlighter import highlight_page_on_demand
+
+        while True:
+            task = self._next_page()
+            if task is None:
+                return
+            unique_id, page_number, plan = task
+            with log_context(job_id=unique_id, page=page_number):
+                try:
+                    success, _, highlight_count = run_blocking(
+                        highlight_page_on_demand, unique_id, page_number, plan['search_words'], plan['images_folder'],
+                        result_path=plan['result_path'], stemming=plan['stemming'],
+                        max_distance=plan['max_distance']
+                    )
+                    self.on_page('failed' if not success else 'cached' if highlight_count == -1 else 'generated')
+                except Exception as e:
+                    logger.error("Error pre-warming highlights: %s", e)
+                    self.on_page('failed')
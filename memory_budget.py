@@ -0,0 +1,71 @@
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+# Default budget of an OCR job for rendered page images, in megabytes
+DEFAULT_JOB_BUDGET_MB = 512
+
+
+class MemoryBudget:
+    """
+    A byte budget shared by the work items that hold large buffers.
+
+    Each rendered page reserves its estimated size before it is rendered and
+    releases it once its images are written and OCRed, so the pages in
+    flight never hold more than the limit. A single reservation larger than
+    the whole budget is admitted when nothing else is reserved, so a huge
+    page slows the job down instead of blocking it forever.
+    """
+
+    def __init__(self, limit_bytes: int):
+        """
+        Create a budget.
+
+        Args:
+            limit_bytes: Bytes that may be reserved at the same time
+        """
+        if limit_bytes <= 0:
+            raise ValueError(f"Memory budget must be positive, got {limit_bytes}")
+        self.limit_bytes = limit_bytes
+        self.in_use = 0
+        self.peak = 0
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_megabytes(cls, megabytes: float) -> "MemoryBudget":
+        """Create a budget of a number of megabytes."""
+        return cls(int(megabytes * 2 ** 20))
+
+    def acquire(self, nbytes: int, timeout: Optional[float] = None) -> bool:
+        """
+        Reserve bytes, waiting until they fit into the budget.
+
+        Args:
+            nbytes: Bytes to reserve
+            timeout: Seconds to wait at most (None waits until they fit)
+
+        Returns:
+            True if the bytes were reserved, False on timeout
+        """
+        with self._cond:
+            fits = lambda: self.in_use == 0 or self.in_use + nbytes <= self.limit_bytes
+            if not self._cond.wait_for(fits, timeout):
+                return False
+            self.in_use += nbytes
+            self.peak = max(self.peak, self.in_use)
+            return True
+
+    def release(self, nbytes: int) -> None:
+        """Return reserved bytes to the budget."""
+        with self._cond:
+            self.in_use = max(self.in_use - nbytes, 0)
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes: int):
+        """Hold a reservation for the duration of a block."""
+        self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            self.release(nbytes)
@@ -0,0 +1,263 @@
+import os
+import time
+import threading
+from typing import Callable, Dict, List, Tuple, Iterable, Optional
+
+# Default histogram buckets in seconds, from fast requests to slow OCR pages
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value the way Prometheus expects (+Inf, integers without a decimal point)."""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """Format a label set as {name="value",...}, escaping values."""
+    if not labels:
+        return ''
+    escaped = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+class Metric:
+    """Base class for metrics with an optional set of label names."""
+
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """Label values in label-name order; every label must be given."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Current samples as (name, labels, value) tuples."""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """Lines of the text exposition format for this metric."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increase the counter for a label set."""
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Current value for a label set."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        if not self.labelnames and not values:
+            # Unlabelled counters are reported from zero
+            values = {(): 0}
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in values.items()]
+
+
+class Gauge(Metric):
+    """
+    Value that can go up and down.
+
+    A gauge can also be computed at scrape time with set_function, for values
+    that are cheaper to read on demand than to keep up to date.
+    """
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], object]] = None
+
+    def set(self, value: float, **labels) -> None:
+        """Set the gauge for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increase the gauge for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        """Decrease the gauge for a label set."""
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], object]) -> None:
+        """
+        Compute the gauge when scraped.
+
+        Args:
+            function: Returns a number for unlabelled gauges, or a dictionary of
+                      label-value tuples to numbers for labelled ones
+        """
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            values = self._function()
+            if not self.labelnames:
+                values = {(): values}
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in values.items()]
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets, with sum and count."""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """Record one observation for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            else:
+                series[0][-1] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the duration of a block."""
+        return _Timer(self, labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (bucket_counts, total, count) in self._series.items():
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket", {**labels, 'le': _format_value(bound)}, cumulative))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class _Timer:
+    """Context manager used by Histogram.time."""
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Registry:
+    """Collection of metrics rendered together on the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric; names must be unique."""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # A failing scrape-time gauge should not hide the other metrics
+                lines.append(f"# Error collecting {metric.name}: {str(e)}")
+        return '\n'.join(lines) + '\n'
+
+
+# Registry used by the web app
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    """Create a counter in the default registry."""
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+    """Create a gauge in the default registry."""
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Iterable[str] = (),
+              buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Create a histogram in the default registry."""
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def folder_size(path: str) -> int:
+    """Total size in bytes of the files below a folder (0 if it does not exist)."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                # Files may disappear while walking (cleanup, cache rewrites)
+                pass
+    return total
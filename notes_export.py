@@ -0,0 +1,434 @@
+import io
+import os
+import re
+import datetime
+import functools
+import zipfile
+from typing import Any, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+# Export backends of /publish-notes: native writes the DOCX in-process, pandoc converts markdown
+EXPORT_BACKENDS = ('native', 'pandoc')
+
+DOCX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+# Reference document whose styles the export uses (the same file pandoc gets as --reference-doc)
+DEFAULT_REFERENCE_DOCX = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'styles', 'reference.docx')
+
+# Letters of the citation list in the markdown (pandoc only uses the first one to pick the list style)
+LIST_LETTERS = "abcdeghijklmnopqrstuvwxyz"
+
+# Markdown marker of each list kind
+MARKDOWN_MARKERS = {'bullet': '*', 'decimal': '1.'}
+
+# Word numbering format and level text of each list kind
+NUMBERING_FORMATS = {
+    'bullet': ('bullet', ['•', '◦', '▪']),
+    'decimal': ('decimal', None),
+    'letter': ('lowerLetter', None),
+}
+
+# Parts copied from the reference document, with their content types
+REFERENCE_PARTS = {
+    'word/styles.xml': 'application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml',
+    'word/theme/theme1.xml': 'application/vnd.openxmlformats-officedocument.theme+xml',
+    'word/fontTable.xml': 'application/vnd.openxmlformats-officedocument.wordprocessingml.fontTable+xml',
+}
+
+# Relationship type of each copied part
+REFERENCE_RELATIONSHIPS = {
+    'word/styles.xml': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles',
+    'word/theme/theme1.xml': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/theme',
+    'word/fontTable.xml': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/fontTable',
+}
+
+# Fixed timestamp of the zip entries, so the same notes give byte-identical documents
+ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+
+# Characters not allowed in XML 1.0 (control characters pasted into notes)
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+W_NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+DEFAULT_STYLES_XML = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="{W_NAMESPACE}">
+  <w:docDefaults>
+    <w:rPrDefault><w:rPr>
+      <w:rFonts w:ascii="Calibri" w:hAnsi="Calibri" w:eastAsia="Calibri" w:cs="Arial"/>
+      <w:sz w:val="24"/><w:szCs w:val="24"/>
+      <w:lang w:val="en-US" w:bidi="he-IL"/>
+    </w:rPr></w:rPrDefault>
+    <w:pPrDefault><w:pPr><w:spacing w:after="120"/></w:pPr></w:pPrDefault>
+  </w:docDefaults>
+  <w:style w:type="paragraph" w:default="1" w:styleId="Normal">
+    <w:name w:val="Normal"/><w:qFormat/>
+  </w:style>
+  <w:style w:type="paragraph" w:customStyle="1" w:styleId="Compact">
+    <w:name w:val="Compact"/><w:basedOn w:val="Normal"/><w:qFormat/>
+    <w:pPr><w:spacing w:before="36" w:after="36"/></w:pPr>
+  </w:style>
+</w:styles>
+"""
+
+
+def parse_date_for_sorting(date_str):
+    """Parse date string for proper sorting. Handle various date formats."""
+    if not date_str or date_str.strip() == '':
+        return datetime.datetime.min  # Put empty dates at the beginning
+
+    try:
+        # Try different date formats commonly used
+        date_formats = [
+            '%d/%m/%Y',    # DD/MM/YYYY
+            '%d.%m.%Y',    # DD.MM.YYYY
+            '%d-%m-%Y',    # DD-MM-YYYY
+            '%Y-%m-%d',    # YYYY-MM-DD
+            '%d/%m/%y',    # DD/MM/YY
+            '%d.%m.%y',    # DD.MM.YY
+            '%d-%m-%y',    # DD-MM-YY
+        ]
+
+        date_str = date_str.strip()
+        for date_format in date_formats:
+            try:
+                return datetime.datetime.strptime(date_str, date_format)
+            except ValueError:
+                continue
+
+        # If no format works, try to extract numbers and create a date
+        # This is a fallback for unusual formats
+        numbers = re.findall(r'\d+', date_str)
+        if len(numbers) >= 3:
+            day, month, year = int(numbers[0]), int(numbers[1]), int(numbers[2])
+            # Handle 2-digit years
+            if year < 100:
+                year += 2000 if year < 50 else 1900
+            return datetime.datetime(year, month, day)
+
+    except Exception as e:
+        print(f"Error parsing date '{date_str}': {str(e)}")
+
+    # If all else fails, return a date far in the future so it sorts last
+    return datetime.datetime.max
+
+
+def format_date_to_display(date_str):
+    """Convert date string to dd.mm.yy format for display."""
+    if not date_str or date_str.strip() == '':
+        return date_str
+
+    try:
+        # Parse the date first
+        parsed_date = parse_date_for_sorting(date_str)
+        if parsed_date in (datetime.datetime.min, datetime.datetime.max):
+            return date_str  # Return original if parsing failed
+
+        # Format to dd.mm.yy
+        return parsed_date.strftime('%d.%m.%y')
+    except Exception as e:
+        print(f"Error formatting date '{date_str}': {str(e)}")
+        return date_str  # Return original if formatting fails
+
+
+def _item(kind: str, level: int, list_id: int, runs: List[Tuple[str, bool]],
+          blank_lines_after: int = 0) -> Dict[str, Any]:
+    """
+    One list paragraph of the notes document.
+
+    Args:
+        kind: 'bullet', 'decimal' or 'letter'
+        level: Nesting level (0 = outermost)
+        list_id: Items with the same id form one list and are numbered together
+        runs: (text, bold) pieces of the paragraph
+        blank_lines_after: Blank lines after the item in the markdown
+    """
+    return {'kind': kind, 'level': level, 'list_id': list_id, 'runs': runs,
+            'blank_lines_after': blank_lines_after}
+
+
+def build_notes_document(note_sets_data: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Build the structure of the notes export from the note sets of each page.
+
+    The document lists the medical records with the sorted dates per doctor
+    type, followed by a lettered list of every note's citation, sorted by date.
+    All backends render this same structure.
+
+    Args:
+        note_sets_data: Note sets by page number, as sent by the UI
+
+    Returns:
+        List of paragraph items (see _item)
+    """
+    family_doctor_dates = []
+    orthopedicHealthInsurance_doctor_dates = []
+    orthopedicHospital_doctor_dates = []
+    all_notes = []
+
+    # Collect dates for each doctor type
+    for page_num in note_sets_data:
+        page_note_sets = note_sets_data.get(str(page_num), [])
+        for note_set in page_note_sets:
+            all_notes.append(note_set)
+            # Switch cases between family doctor and orthopedic doctor
+            if note_set.get('doctorType') == 'רופא משפחה':
+                family_doctor_dates.append(note_set.get('caseDate', ''))
+            elif note_set.get('doctorType') == 'אורתופד':
+                if note_set.get('isHospital', True):
+                    orthopedicHospital_doctor_dates.append(note_set.get('caseDate', ''))
+                else:
+                    orthopedicHealthInsurance_doctor_dates.append(note_set.get('caseDate', ''))
+
+    # Sort dates for each doctor type and format them to dd.mm.yy for display
+    def sorted_dates(dates):
+        return ', '.join(format_date_to_display(date) for date in sorted(dates, key=parse_date_for_sorting))
+
+    items = [
+        _item('decimal', 0, 0, [("המסמכים הרפואיים שעמדו בפני בעת עריכת חוות דעתי:", False)]),
+        _item('bullet', 0, 1, [("תיק קופת חולים (סיכומי ביקור, אישורים, הפניות, מרשמים)", False)]),
+        _item('bullet', 1, 1, [(f"רופא משפחה -- {sorted_dates(family_doctor_dates)}", False)]),
+        _item('bullet', 1, 1, [(f"אורתופד -- {sorted_dates(orthopedicHealthInsurance_doctor_dates)}", False)]),
+        _item('bullet', 0, 1, [("בתי חולים --", False)], blank_lines_after=2),
+    ]
+    if orthopedicHospital_doctor_dates:
+        items.append(_item('bullet', 1, 1, [(f"אורתופד -- {sorted_dates(orthopedicHospital_doctor_dates)}", False)]))
+
+    items.append(_item('decimal', 1, 2, [
+        ("במסמכים הרפואיים שעמדו לפני מצאתי רישומים רבים בהם מתוארים ", False),
+        ("כאבים בגב התחתון ובצוואר עובר לתאונה הראשונה", True),
+        (". להלן, חלק מאותן הרשומות:", False)
+    ], blank_lines_after=1))
+
+    # Sort all notes by date first, then by doctor type
+    all_notes.sort(key=lambda x: (parse_date_for_sorting(x.get('caseDate', '')), x.get('doctorType', '')))
+    for note in all_notes:
+        formatted_date = format_date_to_display(note.get('caseDate', 'Unknown'))
+        citation = f"{note.get('doctorType', 'Unknown')} רשם ביום {formatted_date}: \"{note.get('citationNotes', '')}\"."
+        items.append(_item('letter', 2, 3, [(citation, False)]))
+
+    return items
+
+
+def notes_to_markdown(items: List[Dict[str, Any]]) -> str:
+    """
+    Render the notes document as markdown (the pandoc input and the plain-text fallback).
+
+    Args:
+        items: Paragraph items from build_notes_document
+
+    Returns:
+        Markdown text
+    """
+    lines = []
+    letter_index = {}
+    for item in items:
+        if item['kind'] == 'letter':
+            index = letter_index.get(item['list_id'], 0)
+            letter_index[item['list_id']] = index + 1
+            marker = f"{LIST_LETTERS[index % len(LIST_LETTERS)]}."
+        else:
+            marker = MARKDOWN_MARKERS[item['kind']]
+        text = ''.join(f"**{run}**" if bold else run for run, bold in item['runs'])
+        lines.append('  ' * item['level'] + f"{marker} {text}\n" + '\n' * item['blank_lines_after'])
+    return ''.join(lines)
+
+
+def _xml_text(text: str) -> str:
+    """Escape text for a w:t element."""
+    return escape(INVALID_XML_CHARS.sub('', text))
+
+
+def _run_xml(text: str, bold: bool) -> str:
+    """A right-to-left run; line breaks in the text become w:br."""
+    properties = '<w:b/><w:bCs/><w:rtl/>' if bold else '<w:rtl/>'
+    pieces = [f'<w:t xml:space="preserve">{_xml_text(piece)}</w:t>' for piece in text.split('\n')]
+    return f'<w:r><w:rPr>{properties}</w:rPr>{"<w:br/>".join(pieces)}</w:r>'
+
+
+def _document_xml(items: List[Dict[str, Any]]) -> str:
+    """word/document.xml with one right-to-left list paragraph per item."""
+    paragraphs = []
+    for item in items:
+        runs = ''.join(_run_xml(text, bold) for text, bold in item['runs'])
+        paragraphs.append(
+            '<w:p><w:pPr><w:pStyle w:val="Compact"/>'
+            f'<w:numPr><w:ilvl w:val="{item["level"]}"/><w:numId w:val="{item["list_id"] + 1}"/></w:numPr>'
+            f'<w:bidi/></w:pPr>{runs}</w:p>'
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<w:document xmlns:w="{W_NAMESPACE}"><w:body>{"".join(paragraphs)}'
+        '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+        '<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" w:header="708" w:footer="708" w:gutter="0"/>'
+        '<w:bidi/></w:sectPr></w:body></w:document>'
+    )
+
+
+def _numbering_xml(items: List[Dict[str, Any]]) -> str:
+    """word/numbering.xml with one numbering definition per list kind and one restarting instance per list."""
+    abstract_ids = {kind: index for index, kind in enumerate(NUMBERING_FORMATS)}
+    abstract_nums = []
+    for kind, (num_format, bullets) in NUMBERING_FORMATS.items():
+        levels = []
+        for level in range(9):
+            level_text = bullets[level % len(bullets)] if bullets else f"%{level + 1}."
+            levels.append(
+                f'<w:lvl w:ilvl="{level}"><w:start w:val="1"/><w:numFmt w:val="{num_format}"/>'
+                f'<w:lvlText w:val="{level_text}"/><w:lvlJc w:val="left"/>'
+                f'<w:pPr><w:ind w:left="{720 * (level + 1)}" w:hanging="360"/></w:pPr></w:lvl>'
+            )
+        abstract_nums.append(f'<w:abstractNum w:abstractNumId="{abstract_ids[kind]}">{"".join(levels)}</w:abstractNum>')
+
+    lists = {}
+    for item in items:
+        lists.setdefault(item['list_id'], item)
+    nums = [
+        f'<w:num w:numId="{list_id + 1}"><w:abstractNumId w:val="{abstract_ids[first["kind"]]}"/>'
+        f'<w:lvlOverride w:ilvl="{first["level"]}"><w:startOverride w:val="1"/></w:lvlOverride></w:num>'
+        for list_id, first in sorted(lists.items())
+    ]
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<w:numbering xmlns:w="{W_NAMESPACE}">{"".join(abstract_nums)}{"".join(nums)}</w:numbering>'
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _reference_parts(reference_docx: str, mtime: float) -> Dict[str, bytes]:
+    """Parts of the reference document used by the export (cached until the file changes)."""
+    with zipfile.ZipFile(reference_docx) as reference:
+        names = set(reference.namelist())
+        return {name: reference.read(name) for name in REFERENCE_PARTS if name in names}
+
+
+def load_reference_parts(reference_docx: Optional[str]) -> Dict[str, bytes]:
+    """
+    Get the styles, theme and font table of the reference document.
+
+    Args:
+        reference_docx: Path of the reference DOCX (None or missing: built-in styles)
+
+    Returns:
+        Part contents by part name; empty when there is no usable reference document
+    """
+    if not reference_docx or not os.path.exists(reference_docx):
+        return {}
+    try:
+        return _reference_parts(reference_docx, os.path.getmtime(reference_docx))
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"Error reading reference document {reference_docx}: {str(e)}")
+        return {}
+
+
+def notes_to_docx(items: List[Dict[str, Any]], reference_docx: Optional[str] = DEFAULT_REFERENCE_DOCX) -> bytes:
+    """
+    Write the notes document as DOCX in memory, without pandoc.
+
+    Paragraphs are right-to-left list items with the same nesting as the
+    markdown export; styles, theme and fonts come from reference_docx when it
+    exists. The output is deterministic for the same notes and reference.
+
+    Args:
+        items: Paragraph items from build_notes_document
+        reference_docx: Path of the reference DOCX providing the styles
+
+    Returns:
+        The DOCX file content
+    """
+    parts = {'word/styles.xml': DEFAULT_STYLES_XML.encode('utf-8')}
+    parts.update(load_reference_parts(reference_docx))
+
+    overrides = ''.join(f'<Override PartName="/{name}" ContentType="{REFERENCE_PARTS[name]}"/>' for name in parts)
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '<Override PartName="/word/numbering.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.numbering+xml"/>'
+        f'{overrides}</Types>'
+    )
+    package_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/></Relationships>'
+    )
+    relationships = [('http://schemas.openxmlformats.org/officeDocument/2006/relationships/numbering', 'numbering.xml')]
+    relationships += [(REFERENCE_RELATIONSHIPS[name], name[len('word/'):]) for name in parts]
+    document_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        + ''.join(f'<Relationship Id="rId{index}" Type="{rel_type}" Target="{target}"/>'
+                  for index, (rel_type, target) in enumerate(relationships, start=1))
+        + '</Relationships>'
+    )
+
+    files = [
+        ('[Content_Types].xml', content_types.encode('utf-8')),
+        ('_rels/.rels', package_rels.encode('utf-8')),
+        ('word/document.xml', _document_xml(items).encode('utf-8')),
+        ('word/_rels/document.xml.rels', document_rels.encode('utf-8')),
+        ('word/numbering.xml', _numbering_xml(items).encode('utf-8')),
+    ] + sorted(parts.items())
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as docx:
+        for name, data in files:
+            info = zipfile.ZipInfo(name, date_time=ZIP_TIMESTAMP)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            docx.writestr(info, data)
+    return buffer.getvalue()
+
+
+@functools.lru_cache(maxsize=1)
+def pandoc_version() -> Optional[str]:
+    """Version of the installed pandoc, or None without pypandoc or pandoc (checked once per process)."""
+    try:
+        import pypandoc
+        return pypandoc.get_pandoc_version()
+    except Exception as e:
+        print(f"Error checking pandoc: {str(e)}")
+        return None
+
+
+def notes_to_docx_with_pandoc(items: List[Dict[str, Any]], docx_path: str, work_dir: str,
+                              reference_docx: Optional[str] = DEFAULT_REFERENCE_DOCX) -> str:
+    """
+    Convert the notes document to DOCX with pandoc (the optional backend).
+
+    Args:
+        items: Paragraph items from build_notes_document
+        docx_path: Path of the DOCX file to write
+        work_dir: Folder for the temporary markdown file
+        reference_docx: Path of the reference DOCX passed as --reference-doc
+
+    Returns:
+        docx_path
+
+    Raises:
+        RuntimeError: If pandoc is not available
+    """
+    if pandoc_version() is None:
+        raise RuntimeError('Pandoc not available')
+    import pypandoc
+
+    temp_md_path = os.path.join(work_dir, os.path.splitext(os.path.basename(docx_path))[0] + '.md')
+    with open(temp_md_path, 'w', encoding='utf-8') as f:
+        f.write(notes_to_markdown(items))
+
+    reference_arg = ['--reference-doc=' + reference_docx] if reference_docx and os.path.exists(reference_docx) else []
+    try:
+        pypandoc.convert_file(
+            temp_md_path,
+            'docx',
+            outputfile=docx_path,
+            extra_args=['--standalone'] + reference_arg + ['--metadata=dir:rtl']
+        )
+    finally:
+        # Clean up the temporary markdown file
+        if os.path.exists(temp_md_path):
+            os.remove(temp_md_path)
+    return docx_path
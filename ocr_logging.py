@@ -0,0 +1,319 @@
+import os
+import json
+import queue
+import atexit
+import socket
+import logging
+import threading
+import contextlib
+import contextvars
+import logging.handlers
+
+# Format shared by the log file and the console; context is the job and page of the record, if any
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(context)s%(message)s'
+
+# Default log file of the OCR processing
+DEFAULT_LOG_FILE = 'ocr_process.log'
+
+# The log file is rotated at this size, keeping this many old files
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+# Loggers of the app's modules, configured together by the app factory. Socket.IO and
+# Engine.IO log every emit and poll, so they only log warnings unless configured otherwise.
+APP_LOGGERS = ('app', 'pdf_ocr_processor', 'progress_tracker', 'word_highlighter', 'highlight_prewarm',
+               'export_jobs', 'profiling', 'socketio', 'engineio')
+DEFAULT_LEVELS = {'socketio': logging.WARNING, 'engineio': logging.WARNING}
+
+# Job and page the current thread is working on, added to its log records
+_job_id = contextvars.ContextVar('log_job_id', default=None)
+_page = contextvars.ContextVar('log_page', default=None)
+
+# Records the current thread holds back instead of handling them (see hold_records)
+_held = threading.local()
+
+# Loggers already configured, so repeated setup (app factory, tests) adds no duplicate handlers
+_configured = set()
+
+# Log file as configured -> (queue, listener writing its records from a background thread, per_process)
+_listeners = {}
+
+
+@contextlib.contextmanager
+def log_context(job_id=None, page=None):
+    """
+    Tag the log records of the calling thread with a job id and/or page number.
+
+    Threads start without context: code starting a thread for the same job
+    runs it in contextvars.copy_context() to keep the tags.
+
+    Args:
+        job_id: Job (result id) the records belong to
+        page: Page number the records belong to
+    """
+    tokens = []
+    if job_id is not None:
+        tokens.append((_job_id, _job_id.set(job_id)))
+    if page is not None:
+        tokens.append((_page, _page.set(page)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Add the job_id and page of the logging thread to its records (unless passed as extra)."""
+
+    def filter(self, record):
+        if not hasattr(record, 'job_id'):
+            record.job_id = _job_id.get()
+        if not hasattr(record, 'page'):
+            record.page = _page.get()
+        return True
+
+
+class HoldFilter(logging.Filter):
+    """Collect the records of a thread inside hold_records instead of letting them through."""
+
+    def filter(self, record):
+        records = getattr(_held, 'records', None)
+        if records is None:
+            return True
+        records.append(record)
+        return False
+
+
+_hold_filter = HoldFilter()
+
+# Unconfigured loggers (e.g. pypandoc's) fall back to lastResort, whose lock is taken the same way
+logging.lastResort.addFilter(_hold_filter)
+
+
+@contextlib.contextmanager
+def hold_records(records):
+    """
+    Collect the log records of the calling thread in a list instead of handling them.
+
+    For threads that must not take the handlers' locks: under eventlet they
+    are green, and eventlet's thread pool (see offload.run_blocking) runs
+    real threads that cannot wait on them. Another thread hands the records
+    to the handlers later with handle_records. Applies to the loggers
+    configured by setup_logging and to those without handlers.
+
+    Args:
+        records: List the records are appended to
+    """
+    previous = getattr(_held, 'records', None)
+    _held.records = records
+    try:
+        yield records
+    finally:
+        _held.records = previous
+
+
+def handle_records(records):
+    """Hand records held back by hold_records to their loggers' handlers."""
+    for record in records:
+        logging.getLogger(record.name).handle(record)
+
+
+class TextFormatter(logging.Formatter):
+    """LOG_FORMAT lines, with '[job ... page ...] ' before the message of tagged records."""
+
+    def format(self, record):
+        tags = [f"{name} {value}" for name, value in (('job', getattr(record, 'job_id', None)),
+                                                      ('page', getattr(record, 'page', None))) if value is not None]
+        record.context = f"[{' '.join(tags)}] " if tags else ''
+        return super().format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers: time, level, logger, job_id, page and message."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'job_id': getattr(record, 'job_id', None),
+            'page': getattr(record, 'page', None),
+            'message': record.getMessage()
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def parse_levels(levels):
+    """
+    Parse per-logger levels from 'name=LEVEL,...' (as in MCA_LOG_LEVELS) or a dictionary.
+
+    Raises:
+        ValueError: If an entry or level name is invalid
+    """
+    if not levels:
+        return {}
+    if isinstance(levels, str):
+        entries = [entry.strip() for entry in levels.split(',') if entry.strip()]
+        if any('=' not in entry for entry in entries):
+            raise ValueError(f"Log levels must look like 'module=LEVEL,...', got: {levels}")
+        levels = dict(entry.split('=', 1) for entry in entries)
+
+    parsed = {}
+    for name, level in levels.items():
+        if isinstance(level, str):
+            level = logging.getLevelName(level.strip().upper())
+            if not isinstance(level, int):
+                raise ValueError(f"Unknown log level for {name}: {levels[name]}")
+        parsed[name.strip()] = level
+    return parsed
+
+
+def process_log_file(log_file):
+    """
+    Log file of the current process, for processes sharing a configured log file.
+
+    'ocr_process.log' becomes 'ocr_process.<host>-<pid>.log': RotatingFileHandler
+    cannot rotate a file other processes write to, as each rolls it over on
+    its own size count and the others go on writing to the renamed file.
+    The host is included since workers on several machines share the storage.
+    """
+    base, ext = os.path.splitext(log_file)
+    return f"{base}.{socket.gethostname()}-{os.getpid()}{ext}"
+
+
+def _file_handler(path, formatter, max_bytes, backup_count):
+    """Rotating file handler for all logs the loggers let through (INFO and above by default)."""
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                        encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    return file_handler
+
+
+def _listener_queue(log_file, json_format, max_bytes, backup_count, per_process):
+    """Get the queue of a log file's listener, starting the listener on first use."""
+    if log_file in _listeners:
+        return _listeners[log_file][0]
+
+    formatter = JsonFormatter() if json_format else TextFormatter(LOG_FORMAT)
+    handlers = []
+
+    if log_file:
+        handlers.append(_file_handler(process_log_file(log_file) if per_process else log_file,
+                                      formatter, max_bytes, backup_count))
+
+    # Console handler only for WARNING and ERROR
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.WARNING)
+    console_handler.setFormatter(formatter)
+    handlers.append(console_handler)
+
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners[log_file] = (records, listener, per_process)
+    return records
+
+
+def setup_logging(log_file=DEFAULT_LOG_FILE, name='pdf_ocr_processor', levels=None, json_format=False,
+                  max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT, per_process=False):
+    """
+    Configure logging of a module - INFO to a rotating file, WARNING and ERROR to the console.
+
+    Logging calls only put the record on a queue; a background thread per
+    log file formats and writes them, so jobs never wait for the file or
+    console. Records carry the job id and page set with log_context.
+
+    Called by the app factory and the command line tools rather than at import
+    time, so importing the modules opens no log file.
+
+    A log file is written and rotated by one process only. Processes started
+    alongside the app with the same log file (worker.py) pass per_process to
+    write their own file instead (see process_log_file), and so do the
+    children they fork.
+
+    Args:
+        log_file: Path of the log file (None to log to the console only)
+        name: Name of the logger to configure
+        levels: Per-logger levels overriding INFO ('name=LEVEL,...' or a dictionary, see parse_levels)
+        json_format: Write JSON lines instead of LOG_FORMAT text (applies from the log file's first setup)
+        max_bytes: Size at which the log file is rotated (0 never rotates)
+        backup_count: Rotated log files kept
+        per_process: Write to this process's own file next to log_file (applies from its first setup)
+
+    Returns:
+        The configured logger
+    """
+    logger = logging.getLogger(name)
+    levels = parse_levels(levels)
+    if name in _configured:
+        if name in levels:
+            logger.setLevel(levels[name])
+        return logger
+
+    queue_handler = logging.handlers.QueueHandler(_listener_queue(log_file, json_format, max_bytes, backup_count,
+                                                                  per_process))
+    # Added here, in the logging thread, where the job and page context is set
+    queue_handler.addFilter(ContextFilter())
+    logger.addHandler(queue_handler)
+    logger.addFilter(_hold_filter)
+
+    logger.setLevel(levels.get(name, DEFAULT_LEVELS.get(name, logging.INFO)))
+
+    # Prevent double logging
+    logger.propagate = False
+
+    _configured.add(name)
+    return logger
+
+
+def setup_loggers(log_file=DEFAULT_LOG_FILE, names=APP_LOGGERS, levels=None, **options):
+    """
+    Configure several loggers with setup_logging (by default those of the app's modules).
+
+    Loggers in levels that are not configured here (e.g. 'werkzeug') get
+    their level set, keeping their own handlers.
+
+    Args:
+        log_file: Path of the log file (None to log to the console only)
+        names: Names of the loggers to configure
+        levels: Per-logger levels ('name=LEVEL,...' or a dictionary, see parse_levels)
+        **options: json_format, max_bytes, backup_count and per_process as in setup_logging
+    """
+    levels = parse_levels(levels)
+    for name in names:
+        setup_logging(log_file, name, levels, **options)
+    for name, level in levels.items():
+        if name not in names:
+            logging.getLogger(name).setLevel(level)
+
+
+def _restart_listeners():
+    """
+    Start the listener threads again in a forked child (worker processes), which only inherits the queues.
+
+    Per-process log files are switched to the child's own file.
+    """
+    for log_file, (records, listener, per_process) in list(_listeners.items()):
+        handlers = []
+        for handler in listener.handlers:
+            if per_process and isinstance(handler, logging.handlers.RotatingFileHandler):
+                handler.close()
+                handler = _file_handler(process_log_file(log_file), handler.formatter, handler.maxBytes,
+                                        handler.backupCount)
+            handlers.append(handler)
+        listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+        listener.start()
+        _listeners[log_file] = (records, listener, per_process)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listeners)
+
+
+@atexit.register
+def stop_logging():
+    """Write the queued records and stop the listener threads (at exit)."""
+    while _listeners:
+        _, (_, listener, _) = _listeners.popitem()
+        listener.stop()
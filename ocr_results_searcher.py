@@ -1,16 +1,37 @@
+import os
+import csv
+import glob
 import json
 import argparse
 import sys
 import re
-from typing import List, Set, Dict, Any, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Set, Dict, Any, Tuple, Optional, Iterator, TextIO
+
+import results_store
+from hebrew_tokenizer import tokenize, reduce_search_words, match_terms, stem_candidates
+from fuzzy_index import DeletionIndex, allowed_distance
+
+# Suffixes of the results files written by pdf_ocr_processor / the web app
+RESULTS_FILE_SUFFIX = "_ocr_results.json"
+RESULTS_DB_SUFFIX = "_ocr_results.sqlite"
+
+# Suffix of the precomputed word index stored next to a results file
+INDEX_FILE_SUFFIX = "_ocr_results.index.json"
+
+# Bump when the layout of the word index changes so stale indexes are ignored
+WORD_INDEX_VERSION = 1
+
+# Tokens as seen by the whole-word regex used in search_words_in_pages
+TOKEN_PATTERN = re.compile(r'\w+')
 
 
 def load_ocr_results(json_path: str) -> Dict[str, Any]:
     """
-    Load OCR results from a JSON file.
+    Load OCR results from a JSON file or a SQLite results store.
     
     Args:
-        json_path: Path to the JSON file containing OCR results
+        json_path: Path to the JSON (or .sqlite) file containing OCR results
         
     Returns:
         Dictionary containing the OCR results
@@ -20,8 +41,7 @@ def load_ocr_results(json_path: str) -> Dict[str, Any]:
         json.JSONDecodeError: If the JSON file is invalid
     """
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return results_store.load_results(json_path)
     except FileNotFoundError:
         print(f"Error: File '{json_path}' not found.")
         sys.exit(1)
@@ -46,7 +66,50 @@ def normalize_text(text: str) -> str:
     return text.lower().strip()
 
 
-def search_words_in_pages(ocr_results: Dict[str, Any], search_words: Set[str]) -> Dict[int, Dict[str, Any]]:
+def compile_search_words(search_words: Set[str]) -> Dict[str, Any]:
+    """
+    Precompute the matching forms of a set of search words, for repeated searches.
+    
+    Args:
+        search_words: Set of words to search for
+        
+    Returns:
+        Dictionary with the words, their whole-word regex patterns and their
+        reduced stem terms (see hebrew_tokenizer.reduce_search_words)
+    """
+    normalized_words = sorted({normalize_text(word) for word in search_words})
+    return {
+        "words": frozenset(search_words),
+        "patterns": [(word, re.compile(r'\b' + re.escape(word) + r'\b')) for word in normalized_words],
+        "terms": reduce_search_words(set(search_words))
+    }
+
+
+def merge_compiled_search_words(compiled_groups: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine precompiled search words (see compile_search_words) into one.
+    
+    Args:
+        compiled_groups: Compiled search words, e.g. one per selected word group
+        
+    Returns:
+        Compiled search words matching the words of all groups
+    """
+    words = set()
+    patterns: Dict[str, Any] = {}
+    terms: Dict[Tuple[str, ...], str] = {}
+    for compiled in compiled_groups:
+        words.update(compiled["words"])
+        for word, pattern in compiled["patterns"]:
+            patterns.setdefault(word, pattern)
+        for key, word in compiled["terms"].items():
+            terms.setdefault(key, word)
+    return {"words": frozenset(words), "patterns": sorted(patterns.items()), "terms": terms}
+
+
+def search_words_in_pages(ocr_results: Dict[str, Any], search_words: Set[str],
+                          stemming: bool = False, max_distance: int = 0,
+                          compiled: Optional[Dict[str, Any]] = None) -> Dict[int, Dict[str, Any]]:
     """
     Search for whole words in each page of the OCR results.
     Only matches complete words, not parts of larger words.
@@ -54,33 +117,47 @@ def search_words_in_pages(ocr_results: Dict[str, Any], search_words: Set[str]) -
     Args:
         ocr_results: Dictionary containing OCR results
         search_words: Set of words to search for
+        stemming: Match on Hebrew stems (prefixes stripped, spelling normalized),
+                  so one base form finds all its prefixed/variant forms
+        max_distance: Also match tokens within this edit distance (0 = exact only),
+                      to tolerate OCR errors
+        compiled: Optional precompiled form of search_words (compile_search_words),
+                  so repeated searches skip building patterns and stem terms
         
     Returns:
         Dictionary mapping page numbers to search results containing:
         - matched: boolean indicating if any word was found
         - matched_words: list of words that were found on the page
+        - fuzzy_matches: (fuzzy mode only) list of {word, token, distance} for
+          words found only through an approximate match
     """
+    if max_distance > 0:
+        return search_fuzzy_in_pages(ocr_results, search_words, max_distance, stemming,
+                                     terms=compiled["terms"] if compiled else None)
+    
+    if stemming:
+        return search_stems_in_pages(ocr_results, search_words, terms=compiled["terms"] if compiled else None)
+    
     results = {}
     
-    # Normalize all search words
-    normalized_search_words = {normalize_text(word) for word in search_words}
+    # Whole-word patterns of the normalized search words
+    # This ensures we only match whole words, not parts of larger words
+    if compiled:
+        patterns = compiled["patterns"]
+    else:
+        patterns = [(word, re.compile(r'\b' + re.escape(word) + r'\b'))
+                    for word in {normalize_text(word) for word in search_words}]
     
     # Check each page for the presence of search words
     for page in ocr_results.get("pages", []):
         page_number = page.get("page_number")
-        page_text = page.get("text", "")
+        page_text = results_store.searchable_text(page)
         
         # Normalize page text
         normalized_page_text = normalize_text(page_text)
         
         # Find which specific words matched (only whole words)
-        matched_words = []
-        for word in normalized_search_words:
-            # Create a pattern that matches the word with word boundaries
-            # This ensures we only match whole words, not parts of larger words
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_page_text):
-                matched_words.append(word)
+        matched_words = [word for word, pattern in patterns if pattern.search(normalized_page_text)]
         
         # Check if any search word is in the page text
         word_found = len(matched_words) > 0
@@ -92,6 +169,114 @@ def search_words_in_pages(ocr_results: Dict[str, Any], search_words: Set[str]) -
     
     return results
 
+def search_stems_in_pages(ocr_results: Dict[str, Any], search_words: Set[str],
+                          terms: Optional[Dict[Tuple[str, ...], str]] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    Search for words in each page of the OCR results, matching on Hebrew stems.
+    
+    Variants the stemmer covers are collapsed first, so a representative
+    group with dozens of prefixed forms is matched as a handful of terms.
+    Matched words are reported in their configured (display) form.
+    
+    Args:
+        ocr_results: Dictionary containing OCR results
+        search_words: Set of words to search for
+        terms: Optional precomputed reduce_search_words(search_words)
+        
+    Returns:
+        Dictionary mapping page numbers to search results (same layout as search_words_in_pages)
+    """
+    if terms is None:
+        terms = reduce_search_words(search_words)
+    results = {}
+    
+    for page in ocr_results.get("pages", []):
+        matched_words = match_terms(tokenize(results_store.searchable_text(page)), terms)
+        results[page.get("page_number")] = {
+            "matched": len(matched_words) > 0,
+            "matched_words": matched_words
+        }
+    
+    return results
+
+def search_fuzzy_in_pages(ocr_results: Dict[str, Any], search_words: Set[str], max_distance: int,
+                          stemming: bool = False,
+                          terms: Optional[Dict[Tuple[str, ...], str]] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    Search for words in each page, also accepting tokens within an edit distance.
+    
+    A symmetric-deletion index is built once over the document's token
+    vocabulary, so each search word costs one index lookup instead of an
+    edit-distance comparison with every token of every page. Phrases and
+    words that are not a single token are matched exactly.
+    
+    Args:
+        ocr_results: Dictionary containing OCR results
+        search_words: Set of words to search for
+        max_distance: Maximum edit distance (short words get less, see fuzzy_index.allowed_distance)
+        stemming: Match on Hebrew stems as well
+        terms: Optional precomputed reduce_search_words(search_words), used when stemming
+        
+    Returns:
+        Dictionary mapping page numbers to search results (see search_words_in_pages)
+    """
+    pages = ocr_results.get("pages", [])
+    
+    # Split the search into single-token terms (fuzzy) and the rest (exact)
+    if stemming:
+        if terms is None:
+            terms = reduce_search_words(search_words)
+        fuzzy_terms = {key[0]: word for key, word in terms.items() if len(key) == 1}
+        exact_results = search_stems_in_pages(
+            ocr_results, {word for key, word in terms.items() if len(key) > 1})
+    else:
+        normalized_words = {normalize_text(word) for word in search_words}
+        fuzzy_terms = {word: word for word in normalized_words if TOKEN_PATTERN.fullmatch(word)}
+        exact_results = search_words_in_pages(
+            ocr_results, {word for word in normalized_words if word not in fuzzy_terms})
+    
+    # Vocabulary form -> {page number: token as it appears in the text}
+    vocabulary: Dict[str, Dict[int, str]] = {}
+    for page in pages:
+        page_number = page.get("page_number")
+        for token in tokenize(results_store.searchable_text(page)):
+            forms = stem_candidates(token) if stemming else {normalize_text(token)}
+            for form in forms:
+                vocabulary.setdefault(form, {}).setdefault(page_number, token)
+    
+    index = DeletionIndex(vocabulary.keys(), max_distance)
+    
+    results = {}
+    for page in pages:
+        page_number = page.get("page_number")
+        exact_result = exact_results.get(page_number, {})
+        results[page_number] = {
+            "matched": exact_result.get("matched", False),
+            "matched_words": list(exact_result.get("matched_words", [])),
+            "fuzzy_matches": []
+        }
+    
+    for term, word in fuzzy_terms.items():
+        exact_pages = set()
+        for form, distance in index.lookup(term, allowed_distance(term, max_distance)):
+            for page_number, token in vocabulary[form].items():
+                page_result = results[page_number]
+                # Lookups are sorted by distance, so exact hits come first
+                # and a page with an exact hit gets no fuzzy entry for the word
+                if distance == 0:
+                    exact_pages.add(page_number)
+                    if word not in page_result["matched_words"]:
+                        page_result["matched_words"].append(word)
+                elif page_number not in exact_pages:
+                    if word not in page_result["matched_words"]:
+                        page_result["matched_words"].append(word)
+                    if not any(match["word"] == word for match in page_result["fuzzy_matches"]):
+                        page_result["fuzzy_matches"].append(
+                            {"word": word, "token": token, "distance": distance})
+                page_result["matched"] = True
+    
+    return results
+
 def print_search_results(ocr_results: Dict[str, Any], search_results: Dict[int, Dict[str, Any]], 
                          search_words: Set[str]) -> None:
     """
@@ -119,7 +304,11 @@ def print_search_results(ocr_results: Dict[str, Any], search_results: Dict[int,
         page_info = page_data.get(page_num, {})
         has_annotations = page_info.get("has_annotations", False)
         contains_words = search_result.get("matched", False)
-        matched_words = search_result.get("matched_words", [])
+        
+        # Fuzzy hits are shown as word~token
+        fuzzy_tokens = {match["word"]: match["token"] for match in search_result.get("fuzzy_matches", [])}
+        matched_words = [f"{word}~{fuzzy_tokens[word]}" if word in fuzzy_tokens else word
+                         for word in search_result.get("matched_words", [])]
         
         print(f"{page_num:<12} {str(contains_words):<15} {str(has_annotations):<15} {', '.join(matched_words):<30}")
     
@@ -158,6 +347,8 @@ def save_results_to_json(ocr_results: Dict[str, Any], search_results: Dict[int,
         
         page["contains_search_words"] = contains_search_words
         page["matched_words"] = matched_words
+        if "fuzzy_matches" in search_result:
+            page["fuzzy_matches"] = search_result["fuzzy_matches"]
     
     # Save to JSON file
     try:
@@ -168,6 +359,270 @@ def save_results_to_json(ocr_results: Dict[str, Any], search_results: Dict[int,
         print(f"Error saving results to JSON: {str(e)}")
 
 
+def index_path_for(json_path: str) -> str:
+    """
+    Get the path of the word index that belongs to an OCR results file.
+    
+    Args:
+        json_path: Path to the OCR results JSON file
+        
+    Returns:
+        Path of the sidecar index file
+    """
+    for suffix in (RESULTS_FILE_SUFFIX, RESULTS_DB_SUFFIX):
+        if json_path.endswith(suffix):
+            return json_path[:-len(suffix)] + INDEX_FILE_SUFFIX
+    return os.path.splitext(json_path)[0] + ".index.json"
+
+
+def build_word_index(ocr_results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build an inverted index (normalized token -> page numbers) for OCR results.
+    
+    The index holds everything the corpus search needs, so a search over an
+    indexed document never has to parse the page texts again.
+    
+    Args:
+        ocr_results: Dictionary containing OCR results
+        
+    Returns:
+        Dictionary containing document info, page annotation flags and tokens
+    """
+    tokens: Dict[str, List[int]] = {}
+    pages: Dict[str, Dict[str, Any]] = {}
+    
+    for page in ocr_results.get("pages", []):
+        page_number = page.get("page_number")
+        pages[str(page_number)] = {"has_annotations": page.get("has_annotations", False)}
+        
+        for token in set(TOKEN_PATTERN.findall(normalize_text(results_store.searchable_text(page)))):
+            tokens.setdefault(token, []).append(page_number)
+    
+    return {
+        "version": WORD_INDEX_VERSION,
+        "document_name": ocr_results.get("document_name", "Unknown Document"),
+        "total_pages_in_document": ocr_results.get("total_pages_in_document", 0),
+        "pages": pages,
+        "tokens": tokens
+    }
+
+
+def load_word_index(json_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Load the precomputed word index of a results file if it is still valid.
+    
+    An index is only used when it has the current version and is not older
+    than the results file it was built from.
+    
+    Args:
+        json_path: Path to the OCR results JSON file
+        
+    Returns:
+        The word index, or None if there is no usable index
+    """
+    index_path = index_path_for(json_path)
+    try:
+        if os.path.getmtime(index_path) < os.path.getmtime(json_path):
+            return None
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if index.get("version") != WORD_INDEX_VERSION:
+        return None
+    return index
+
+
+def save_word_index(index: Dict[str, Any], json_path: str) -> None:
+    """
+    Save a word index next to the results file it was built from.
+    
+    Args:
+        index: Word index created by build_word_index
+        json_path: Path to the OCR results JSON file
+    """
+    try:
+        with open(index_path_for(json_path), 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+    except Exception as e:
+        print(f"Error saving word index for '{json_path}': {str(e)}", file=sys.stderr)
+
+
+def search_words_in_index(index: Dict[str, Any], search_words: Set[str]) -> Optional[Dict[int, Dict[str, Any]]]:
+    """
+    Search for whole words using a precomputed word index.
+    
+    Produces the same result as search_words_in_pages. Words that are not a
+    single token (phrases, hyphenated words) cannot be answered from the
+    index; None is returned for those so the caller can fall back to a
+    full-text search.
+    
+    Args:
+        index: Word index created by build_word_index
+        search_words: Set of words to search for
+        
+    Returns:
+        Dictionary mapping page numbers to search results, or None
+    """
+    normalized_search_words = {normalize_text(word) for word in search_words}
+    if not all(TOKEN_PATTERN.fullmatch(word) for word in normalized_search_words):
+        return None
+    
+    results = {int(page_number): {"matched": False, "matched_words": []}
+               for page_number in index.get("pages", {})}
+    
+    for word in normalized_search_words:
+        for page_number in index.get("tokens", {}).get(word, []):
+            page_result = results.setdefault(page_number, {"matched": False, "matched_words": []})
+            page_result["matched"] = True
+            page_result["matched_words"].append(word)
+    
+    return results
+
+
+def search_corpus_file(json_path: str, search_words: Set[str], annotated_only: bool = False,
+                       use_index: bool = True, build_index: bool = False,
+                       stemming: bool = False, max_distance: int = 0) -> List[Dict[str, Any]]:
+    """
+    Search a single results file of a corpus and return its matching pages.
+    
+    Runs in a worker process, so it only takes and returns picklable values.
+    
+    Args:
+        json_path: Path to the OCR results JSON file
+        search_words: Set of words to search for
+        annotated_only: Only report pages that also have highlights/annotations
+        use_index: Use the precomputed word index when a valid one exists
+        build_index: Write a word index for files that don't have a valid one
+        stemming: Match on Hebrew stems (the word index only holds exact
+                  tokens, so stem and fuzzy searches always read the page texts)
+        max_distance: Also match tokens within this edit distance
+        
+    Returns:
+        List of result rows, one per matching page
+    """
+    index = load_word_index(json_path) if use_index else None
+    exact_search = not stemming and max_distance == 0
+    search_results = search_words_in_index(index, search_words) if index and exact_search else None
+    
+    if search_results is None:
+        ocr_results = results_store.load_results(json_path)
+        search_results = search_words_in_pages(ocr_results, search_words, stemming, max_distance)
+        
+        if index is None:
+            index = build_word_index(ocr_results)
+            if build_index:
+                save_word_index(index, json_path)
+    
+    rows = []
+    for page_number, search_result in sorted(search_results.items()):
+        if not search_result.get("matched", False):
+            continue
+        
+        has_annotations = index["pages"].get(str(page_number), {}).get("has_annotations", False)
+        if annotated_only and not has_annotations:
+            continue
+        
+        rows.append({
+            "file": os.path.basename(json_path),
+            "document_name": index.get("document_name", "Unknown Document"),
+            "page_number": page_number,
+            "has_annotations": has_annotations,
+            "matched_words": sorted(search_result.get("matched_words", [])),
+            "fuzzy_matches": search_result.get("fuzzy_matches", [])
+        })
+    
+    return rows
+
+
+def search_corpus(corpus_dir: str, search_words: Set[str], annotated_only: bool = False,
+                  use_index: bool = True, build_index: bool = False,
+                  workers: Optional[int] = None, stemming: bool = False,
+                  max_distance: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Search every OCR results file in a directory in parallel processes.
+    
+    Rows are yielded as soon as the file they belong to has been searched,
+    so results can be streamed out while the rest of the corpus is processed.
+    
+    Args:
+        corpus_dir: Directory containing *_ocr_results.json / .sqlite files
+        search_words: Set of words to search for
+        annotated_only: Only report pages that also have highlights/annotations
+        use_index: Use precomputed word indexes when valid ones exist
+        build_index: Write word indexes for files that don't have a valid one
+        workers: Number of worker processes (default: number of CPUs)
+        stemming: Match on Hebrew stems
+        max_distance: Also match tokens within this edit distance
+        
+    Yields:
+        Result rows, one per matching page
+    """
+    db_paths = glob.glob(os.path.join(corpus_dir, f"*{RESULTS_DB_SUFFIX}"))
+    json_paths = glob.glob(os.path.join(corpus_dir, f"*{RESULTS_FILE_SUFFIX}"))
+    
+    # A document migrated to SQLite is searched once, from the store
+    migrated = {path[:-len(RESULTS_DB_SUFFIX)] for path in db_paths}
+    json_paths = sorted(db_paths + [path for path in json_paths
+                                    if path[:-len(RESULTS_FILE_SUFFIX)] not in migrated])
+    if not json_paths:
+        print(f"No '*{RESULTS_FILE_SUFFIX}' or '*{RESULTS_DB_SUFFIX}' files found in '{corpus_dir}'.",
+              file=sys.stderr)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(search_corpus_file, json_path, search_words,
+                            annotated_only, use_index, build_index, stemming, max_distance): json_path
+            for json_path in json_paths
+        }
+        for future in as_completed(futures):
+            try:
+                rows = future.result()
+            except Exception as e:
+                print(f"Error searching '{futures[future]}': {str(e)}", file=sys.stderr)
+                continue
+            yield from rows
+
+
+CORPUS_CSV_FIELDS = ["file", "document_name", "page_number", "has_annotations", "matched_words", "fuzzy_matches"]
+
+
+def write_corpus_results(rows: Iterator[Dict[str, Any]], stream: TextIO, output_format: str = "csv") -> int:
+    """
+    Stream corpus search result rows out as CSV or JSON Lines.
+    
+    Args:
+        rows: Result rows produced by search_corpus
+        stream: Text stream to write to
+        output_format: 'csv' or 'jsonl'
+        
+    Returns:
+        Number of rows written
+    """
+    writer = None
+    if output_format == "csv":
+        writer = csv.DictWriter(stream, fieldnames=CORPUS_CSV_FIELDS)
+        writer.writeheader()
+    
+    count = 0
+    for row in rows:
+        if writer:
+            writer.writerow({
+                **row,
+                "matched_words": ";".join(row["matched_words"]),
+                "fuzzy_matches": ";".join(f"{match['word']}~{match['token']}:{match['distance']}"
+                                          for match in row["fuzzy_matches"])
+            })
+        else:
+            stream.write(json.dumps(row, ensure_ascii=False) + "\n")
+        stream.flush()
+        count += 1
+    
+    return count
+
+
 def get_user_words() -> Set[str]:
     """
     Get a set of search words from the user via interactive input.
@@ -191,14 +646,26 @@ def get_user_words() -> Set[str]:
 def main() -> None:
     """Main function to parse arguments and process OCR results."""
     parser = argparse.ArgumentParser(description='Search for words in OCR JSON results')
-    parser.add_argument('--json-path', required=True, help='Path to the OCR results JSON file')
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument('--json-path', help='Path to the OCR results file (.json or .sqlite)')
+    source_group.add_argument('--corpus-dir', help='Directory of *_ocr_results.json/.sqlite files to search together')
     parser.add_argument('--words', nargs='*', help='Words to search for (optional, if not provided, will prompt user)')
-    parser.add_argument('--output', '-o', help='Output JSON file path (optional)')
+    parser.add_argument('--output', '-o', help='Output file path (optional; corpus mode writes to stdout by default)')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv',
+                        help='Output format for corpus mode (default: csv)')
+    parser.add_argument('--annotated-only', action='store_true',
+                        help='Corpus mode: only report matching pages that also have highlights')
+    parser.add_argument('--stem', action='store_true',
+                        help='Match on Hebrew stems (prefixes and spelling variants of each word are found too)')
+    parser.add_argument('--fuzzy', type=int, default=0, choices=[0, 1, 2],
+                        help='Also match words within this edit distance, to tolerate OCR errors (default: 0)')
+    parser.add_argument('--workers', type=int, help='Corpus mode: number of worker processes (default: CPU count)')
+    parser.add_argument('--no-index', action='store_true',
+                        help='Corpus mode: ignore precomputed word indexes and search the full text')
+    parser.add_argument('--build-index', action='store_true',
+                        help='Corpus mode: write a word index next to every file that lacks a valid one')
     args = parser.parse_args()
 
-    # Load OCR results
-    ocr_results = load_ocr_results(args.json_path)
-    
     # Get search words from command line or user input
     if args.words and len(args.words) > 0:
         search_words = set(args.words)
@@ -209,8 +676,24 @@ def main() -> None:
         print("Error: No search words provided.")
         sys.exit(1)
     
+    if args.corpus_dir:
+        rows = search_corpus(args.corpus_dir, search_words, args.annotated_only,
+                             use_index=not args.no_index, build_index=args.build_index,
+                             workers=args.workers, stemming=args.stem, max_distance=args.fuzzy)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8', newline='') as f:
+                count = write_corpus_results(rows, f, args.format)
+        else:
+            count = write_corpus_results(rows, sys.stdout, args.format)
+        print(f"{count} matching pages found.", file=sys.stderr)
+        return
+
+    # Load OCR results
+    ocr_results = load_ocr_results(args.json_path)
+    
     # Search for words in pages
-    search_results = search_words_in_pages(ocr_results, search_words)
+    search_results = search_words_in_pages(ocr_results, search_words, stemming=args.stem,
+                                           max_distance=args.fuzzy)
     
     # Print results
     print_search_results(ocr_results, search_results, search_words)
@@ -219,6 +702,5 @@ def main() -> None:
     if args.output:
         save_results_to_json(ocr_results, search_results, search_words, args.output)
 
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
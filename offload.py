@@ -0,0 +1,42 @@
+import sys
+from typing import Any, Callable
+
+from ocr_logging import hold_records, handle_records
+
+
+def green_threads() -> bool:
+    """Whether threads are eventlet greenlets (the app served by serve.py in eventlet mode)."""
+    patcher = sys.modules.get('eventlet.patcher')
+    return patcher is not None and patcher.is_monkey_patched('thread')
+
+
+def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Call a CPU-bound or blocking function without stalling the event loop.
+
+    Under eventlet every request, Socket.IO connection and background
+    "thread" is a greenlet of one OS thread, so a page highlight or a DOCX
+    conversion would freeze all of them until it is done. There the call
+    runs in eventlet's pool of real threads (tpool) while the calling
+    greenlet waits; otherwise the caller already has its own thread and
+    the function is simply called.
+
+    The function must not use the app's locks, Socket.IO or other green
+    primitives: it runs outside the event loop. The logging handlers' locks
+    are green too, so its log records are held back and handed to the
+    handlers by the calling greenlet once it returns (see hold_records).
+    """
+    if not green_threads():
+        return func(*args, **kwargs)
+    from eventlet import tpool
+
+    records = []
+
+    def call():
+        with hold_records(records):
+            return func(*args, **kwargs)
+
+    try:
+        return tpool.execute(call)
+    finally:
+        handle_records(records)
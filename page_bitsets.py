@@ -0,0 +1,276 @@
+from typing import Any, Dict, Iterable, List, Tuple
+
+import results_store
+from ocr_results_searcher import search_words_in_pages
+
+# Document metadata key the bitsets are stored under in the results store
+METADATA_KEY = 'page_bitsets'
+
+# Bump when the layout of the stored bitsets or the matching changes so they are rebuilt
+# (2: stems keep at least hebrew_tokenizer.MIN_STEM_LENGTH letters)
+BITSET_VERSION = 2
+
+# Match modes evaluated for every group ahead of time; fuzzy searches are run per request
+PRECOMPUTED_MODES = ('exact', 'stem')
+
+
+def to_hex(bits: int) -> str:
+    """Store a bitset as a hex string (bit i = i-th page of the document)."""
+    return format(bits, 'x')
+
+
+def from_hex(value: str) -> int:
+    """Read a bitset stored by to_hex."""
+    return int(value, 16)
+
+
+def bit_count(bits: int) -> int:
+    """Number of pages in a bitset."""
+    return bin(bits).count('1')
+
+
+def annotation_bits(pages: List[Dict[str, Any]]) -> int:
+    """Bitset of the pages that have annotations (highlights)."""
+    bits = 0
+    for position, page in enumerate(pages):
+        if page.get('has_annotations', False):
+            bits |= 1 << position
+    return bits
+
+
+def matched_bits(pages: List[Dict[str, Any]], search_results: Dict[int, Dict[str, Any]]) -> int:
+    """Bitset of the pages that search_words_in_pages found a word on."""
+    bits = 0
+    for position, page in enumerate(pages):
+        if search_results.get(page.get('page_number'), {}).get('matched', False):
+            bits |= 1 << position
+    return bits
+
+
+def filter_bits(filter_type: str, annotations: int, words: int, page_count: int) -> int:
+    """
+    Bitset of the pages a filter shows.
+
+    Args:
+        filter_type: 'highlights', 'words', 'both' or 'all'
+        annotations: Bitset of the pages with annotations
+        words: Bitset of the pages with a search word
+        page_count: Number of pages in the document
+
+    Returns:
+        Bitset of the pages to show
+    """
+    if filter_type == 'all':
+        return (1 << page_count) - 1
+    if filter_type == 'highlights':
+        return annotations
+    if filter_type == 'words':
+        return words
+    if filter_type == 'both':
+        return annotations | words
+    return 0
+
+
+def evaluate_group(ocr_results: Dict[str, Any], matcher: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Search one word group over the whole document in every precomputed mode.
+
+    Args:
+        ocr_results: Dictionary containing OCR results
+        matcher: Compiled search words of the group, with its 'digest'
+
+    Returns:
+        Dictionary with the group's digest and, per mode, the page bitset
+        ('bits') and the words matched on each page ('words', by page number)
+    """
+    pages = ocr_results.get('pages', [])
+    entry = {'digest': matcher['digest']}
+    for mode in PRECOMPUTED_MODES:
+        search_results = search_words_in_pages(ocr_results, set(matcher['words']), stemming=mode == 'stem',
+                                               compiled=matcher)
+        words = {}
+        for page in pages:
+            page_result = search_results.get(page.get('page_number'), {})
+            if page_result.get('matched', False):
+                words[str(page.get('page_number'))] = page_result['matched_words']
+        entry[mode] = {'bits': to_hex(matched_bits(pages, search_results)), 'words': words}
+    return entry
+
+
+def refresh_bitsets(ocr_results: Dict[str, Any],
+                    group_matchers: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+    """
+    Bring a document's bitsets up to date with its pages and the word configuration.
+
+    Only groups that are new or were edited (their digest changed) are
+    searched; removed groups are dropped. If the pages changed (or their
+    full-page text arrived), everything is rebuilt.
+
+    Args:
+        ocr_results: Dictionary containing OCR results (with any stored bitsets)
+        group_matchers: Compiled matcher of every configured group, by group id
+
+    Returns:
+        Tuple of (bitsets, whether they changed)
+    """
+    pages = ocr_results.get('pages', [])
+    page_numbers = [page.get('page_number') for page in pages]
+    full_ocr_pending = bool(ocr_results.get(results_store.FULL_OCR_PENDING_KEY, False))
+    bitsets = ocr_results.get(METADATA_KEY)
+    changed = False
+
+    # Bitsets of the highlighted text alone are rebuilt once the full-page text is stored
+    if (not bitsets or bitsets.get('version') != BITSET_VERSION
+            or bitsets.get('page_numbers') != page_numbers
+            or bitsets.get('full_ocr_pending', False) != full_ocr_pending):
+        bitsets = {
+            'version': BITSET_VERSION,
+            'page_numbers': page_numbers,
+            'full_ocr_pending': full_ocr_pending,
+            'annotations': to_hex(annotation_bits(pages)),
+            'groups': {}
+        }
+        changed = True
+
+    groups = dict(bitsets['groups'])
+    for gid, matcher in group_matchers.items():
+        entry = groups.get(gid)
+        if entry is None or entry.get('digest') != matcher['digest']:
+            groups[gid] = evaluate_group(ocr_results, matcher)
+            changed = True
+    for gid in [gid for gid in groups if gid not in group_matchers]:
+        del groups[gid]
+        changed = True
+
+    return dict(bitsets, groups=groups), changed
+
+
+def refresh_pages(ocr_results: Dict[str, Any], page_numbers: Iterable[int],
+                  group_matchers: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+    """
+    Update a document's bitsets after some of its pages were replaced (e.g. re-OCRed).
+
+    Only the replaced pages are searched again, for every group that is
+    already up to date; their bits and matched words are swapped in. Groups
+    that are new or were edited are then handled as in refresh_bitsets, and
+    bitsets that don't fit the document are rebuilt as a whole.
+
+    Args:
+        ocr_results: Dictionary containing OCR results (with any stored bitsets)
+        page_numbers: Numbers of the replaced pages
+        group_matchers: Compiled matcher of every configured group, by group id
+
+    Returns:
+        Tuple of (bitsets, whether they changed)
+    """
+    pages = ocr_results.get('pages', [])
+    bitsets = ocr_results.get(METADATA_KEY)
+    full_ocr_pending = bool(ocr_results.get(results_store.FULL_OCR_PENDING_KEY, False))
+    if (not bitsets or bitsets.get('version') != BITSET_VERSION
+            or bitsets.get('page_numbers') != [page.get('page_number') for page in pages]
+            or bitsets.get('full_ocr_pending', False) != full_ocr_pending):
+        return refresh_bitsets(ocr_results, group_matchers)
+
+    replaced = set(page_numbers)
+    positions = [position for position, page in enumerate(pages) if page.get('page_number') in replaced]
+    replaced_pages = [pages[position] for position in positions]
+    mask = 0
+    for position in positions:
+        mask |= 1 << position
+
+    def patch(bits: int, page_bits: int) -> str:
+        """Swap the bits of the replaced pages (page_bits is relative to replaced_pages)."""
+        bits &= ~mask
+        for i, position in enumerate(positions):
+            if page_bits & (1 << i):
+                bits |= 1 << position
+        return to_hex(bits)
+
+    subset = dict(ocr_results, pages=replaced_pages)
+    groups = {}
+    for gid, entry in bitsets['groups'].items():
+        matcher = group_matchers.get(gid)
+        if matcher is None or entry.get('digest') != matcher['digest']:
+            groups[gid] = entry  # Left to refresh_bitsets
+            continue
+        entry = dict(entry)
+        for mode in PRECOMPUTED_MODES:
+            search_results = search_words_in_pages(subset, set(matcher['words']), stemming=mode == 'stem',
+                                                   compiled=matcher)
+            words = {page: matched for page, matched in entry[mode]['words'].items() if int(page) not in replaced}
+            for page in replaced_pages:
+                page_result = search_results.get(page.get('page_number'), {})
+                if page_result.get('matched', False):
+                    words[str(page.get('page_number'))] = page_result['matched_words']
+            entry[mode] = {'bits': patch(from_hex(entry[mode]['bits']), matched_bits(replaced_pages, search_results)),
+                           'words': words}
+        groups[gid] = entry
+
+    annotations = patch(from_hex(bitsets['annotations']), annotation_bits(replaced_pages))
+    bitsets, _ = refresh_bitsets(dict(ocr_results, **{METADATA_KEY: dict(bitsets, annotations=annotations,
+                                                                          groups=groups)}),
+                                 group_matchers)
+    return bitsets, True
+
+
+def update_stored_page_bitsets(path: str, ocr_results: Dict[str, Any], page_numbers: Iterable[int],
+                               group_matchers: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Update a document's stored bitsets after some of its pages were replaced (see refresh_pages).
+
+    Args:
+        path: Path to the results file
+        ocr_results: The document's OCR results, with the new pages (not modified)
+        page_numbers: Numbers of the replaced pages
+        group_matchers: Compiled matcher of every configured group, by group id
+
+    Returns:
+        The up-to-date bitsets
+    """
+    bitsets, changed = refresh_pages(ocr_results, page_numbers, group_matchers)
+    if changed:
+        results_store.update_metadata(path, {METADATA_KEY: bitsets})
+    return bitsets
+
+
+def update_stored_bitsets(path: str, ocr_results: Dict[str, Any],
+                          group_matchers: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Refresh a document's bitsets and store them with its results if they changed.
+
+    Args:
+        path: Path to the results file
+        ocr_results: The document's OCR results (not modified)
+        group_matchers: Compiled matcher of every configured group, by group id
+
+    Returns:
+        The up-to-date bitsets
+    """
+    bitsets, changed = refresh_bitsets(ocr_results, group_matchers)
+    if changed:
+        results_store.update_metadata(path, {METADATA_KEY: bitsets})
+    return bitsets
+
+
+def combine_groups(bitsets: Dict[str, Any], group_ids: Iterable[str],
+                   mode: str) -> Tuple[int, Dict[int, List[str]]]:
+    """
+    Combine the precomputed results of some groups (pages matching any of them).
+
+    Args:
+        bitsets: Up-to-date bitsets of the document
+        group_ids: Ids of the selected groups
+        mode: 'exact' or 'stem'
+
+    Returns:
+        Tuple of (bitset of the pages with a match, matched words by page number)
+    """
+    bits = 0
+    matched_words: Dict[int, List[str]] = {}
+    for gid in dict.fromkeys(group_ids):
+        group_result = bitsets['groups'][gid][mode]
+        bits |= from_hex(group_result['bits'])
+        for page_number, words in group_result['words'].items():
+            page_words = matched_words.setdefault(int(page_number), [])
+            page_words.extend(word for word in words if word not in page_words)
+    return bits, matched_words
@@ -0,0 +1,150 @@
+import os
+from typing import List, Optional, Tuple
+
+import fitz
+from PIL import Image
+
+
+class PdfDocument:
+    """
+    A PDF opened once per job and shared by every step of the pipeline.
+
+    Wraps a PyMuPDF document and provides the page count, annotation
+    metadata and page rendering (with or without annotations), so uploading,
+    annotation scanning, highlight removal and OCR rendering no longer parse
+    the file separately with PyPDF2, PyMuPDF and pdf2image.
+
+    Page numbers are 1-based, as everywhere else in the app.
+    """
+
+    def __init__(self, pdf_path: str):
+        """
+        Open a PDF.
+
+        Args:
+            pdf_path: Path to the PDF file
+
+        Raises:
+            FileNotFoundError: If the file does not exist
+        """
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+        self.path = pdf_path
+        self._doc = fitz.open(pdf_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    @property
+    def page_count(self) -> int:
+        """Number of pages in the document."""
+        return len(self._doc)
+
+    @property
+    def closed(self) -> bool:
+        """Whether the document has been closed."""
+        return self._doc.is_closed
+
+    def _page(self, page_number: int):
+        """Get a PyMuPDF page by 1-based page number."""
+        if page_number < 1 or page_number > self.page_count:
+            raise ValueError(f"Invalid page number: {page_number}. PDF has {self.page_count} pages.")
+        return self._doc[page_number - 1]
+
+    def annotation_types(self, page_number: int) -> List[str]:
+        """
+        Get the annotation types on a page (e.g. ["Highlight", "Text"]).
+
+        Args:
+            page_number: Page number (1-based)
+
+        Returns:
+            List of annotation type names, empty for pages without annotations
+        """
+        return [annot.type[1] for annot in self._page(page_number).annots()]
+
+    def highlight_regions(self, page_number: int) -> List[List[Tuple[float, float, float, float]]]:
+        """
+        Get the highlighted areas of a page, one list per highlight annotation.
+
+        A highlight spanning several lines has one quad per line; each quad is
+        returned as its own rectangle, so the text around a multi-line
+        highlight is not included.
+
+        Args:
+            page_number: Page number (1-based)
+
+        Returns:
+            For each highlight annotation, its (x0, y0, x1, y1) rectangles in PDF points
+        """
+        regions = []
+        for annot in self._page(page_number).annots(types=[fitz.PDF_ANNOT_HIGHLIGHT]):
+            vertices = annot.vertices or []
+            rects = [tuple(fitz.Quad(vertices[i:i + 4]).rect) for i in range(0, len(vertices) - 3, 4)]
+            regions.append(rects or [tuple(annot.rect)])
+        return regions
+
+    def render_region(self, page_number: int, rect: Tuple[float, float, float, float], dpi: int = 300,
+                      annots: bool = False) -> Optional[Image.Image]:
+        """
+        Render part of a page to an RGB image.
+
+        Args:
+            page_number: Page number (1-based)
+            rect: (x0, y0, x1, y1) area in PDF points
+            dpi: Resolution of the image
+            annots: Draw annotations; False (the default) gives the clean text for OCR
+
+        Returns:
+            PIL image of the area, or None if it lies outside the page
+        """
+        page = self._page(page_number)
+        clip = fitz.Rect(rect) & page.rect
+        if clip.is_empty:
+            return None
+        pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), clip=clip, annots=annots)
+        return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+    def render_size(self, page_number: int, dpi: int = 300) -> Tuple[int, int]:
+        """
+        Get the pixel size of a page rendered at a resolution, without rendering it.
+
+        Args:
+            page_number: Page number (1-based)
+            dpi: Resolution of the image
+
+        Returns:
+            Tuple of (width, height) in pixels
+        """
+        irect = (self._page(page_number).rect * fitz.Matrix(dpi / 72, dpi / 72)).irect
+        return irect.width, irect.height
+
+    def render(self, page_number: int, dpi: int = 300, annots: bool = True) -> Image.Image:
+        """
+        Render a page to an RGB image.
+
+        Args:
+            page_number: Page number (1-based)
+            dpi: Resolution of the image
+            annots: Draw annotations (highlights); False gives the clean page for OCR
+
+        Returns:
+            PIL image of the page
+        """
+        pix = self._page(page_number).get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), annots=annots)
+        return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+    def close(self) -> None:
+        """Close the document (safe to call more than once)."""
+        if not self._doc.is_closed:
+            self._doc.close()
+
+
+def count_pages(pdf_path: str) -> int:
+    """Get the page count of a PDF without keeping it open."""
+    with PdfDocument(pdf_path) as document:
+        return document.page_count
@@ -1,36 +1,109 @@
 import os
 import json
+import time
+import queue
+import threading
+from contextlib import contextmanager
 import pytesseract
-from pdf2image import convert_from_path
 import argparse
 from tqdm import tqdm
 import logging
-from PyPDF2 import PdfReader
 import fitz
 from PIL import Image
+from results_store import ResultsWriter
+from memory_budget import MemoryBudget, DEFAULT_JOB_BUDGET_MB
+from blank_pages import BLANK_CHECK_DPI, DEFAULT_BLANK_THRESHOLDS, is_blank_page, thresholds_with
+from ocr_logging import setup_logging, log_context
+from pdf_document import PdfDocument
 
-# Configure logging - INFO to file, WARNING and ERROR to console
-# File handler for all logs (INFO and above)
-file_handler = logging.FileHandler("ocr_process.log")
-file_handler.setLevel(logging.INFO)
+# Handlers are added by ocr_logging.setup_logging (app factory or main), not at import time
+logger = logging.getLogger(__name__)
 
-# Console handler only for WARNING and ERROR
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.WARNING)
+# Processing stages timed for every page, in pipeline order
+TIMING_STAGES = ("render", "annotation_scan", "blank_check", "annotation_removal", "ocr", "image_write")
 
-# Format for both handlers
-log_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(log_format)
-console_handler.setFormatter(log_format)
+# Percentiles reported in the document timing summary
+TIMING_PERCENTILES = (50, 90, 99)
 
-# Configure the root logger
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+# Pages rendered ahead of OCR by default, so rendering overlaps with Tesseract
+DEFAULT_PAGES_IN_FLIGHT = 2
+
+# Seconds between checks whether a waiting render thread should stop
+RENDER_WAIT_INTERVAL = 0.5
+
+# Tesseract settings for whole pages: sparse text, which suits mixed right-to-left and left-to-right text
+PAGE_OCR_CONFIG = '--psm 4 --oem 3'
+
+# Tesseract settings for highlighted regions, each of which is a single line of text
+HIGHLIGHT_OCR_CONFIG = '--psm 7 --oem 3'
+
+# Tesseract settings for whole pages selectable by name, e.g. to re-OCR pages that came out badly
+OCR_PROFILES = {
+    'default': PAGE_OCR_CONFIG,
+    'auto': '--psm 3 --oem 3',          # Automatic page segmentation, for multi-column layouts
+    'single_block': '--psm 6 --oem 3',  # One uniform block of text, for dense forms and tables
+    'sparse': '--psm 11 --oem 3'        # Scattered text in no particular order, for stamps and labels
+}
+
+# Points added around a highlighted line, so glyphs sticking out of the highlight are not cut off
+HIGHLIGHT_MARGIN_POINTS = 2
+
+@contextmanager
+def stage_timer(timings, stage):
+    """
+    Time a block and add the elapsed seconds to timings[stage].
+    
+    Args:
+        timings: Dictionary of stage name to seconds for the current page
+        stage: Stage name (one of TIMING_STAGES)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
 
-# Prevent double logging
-logger.propagate = False
+def percentile(values, percent):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(-(-percent * len(ordered) // 100)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def summarize_timings(page_results, wall_seconds=None):
+    """
+    Aggregate per-page stage timings into document-level totals and percentiles.
+    
+    Args:
+        page_results: Page results carrying a "timings" dictionary
+        wall_seconds: Wall-clock time of the whole run, if known
+    
+    Returns:
+        Dictionary with per-stage total/mean/p50/p90/p99 seconds and overall throughput
+    """
+    page_timings = [page["timings"] for page in page_results if page.get("timings")]
+    summary = {"pages_timed": len(page_timings), "stages": {}}
+    
+    for stage in TIMING_STAGES + ("total",):
+        values = [timings.get(stage, 0.0) for timings in page_timings]
+        stage_summary = {
+            "total": round(sum(values), 4),
+            "mean": round(sum(values) / len(values), 4) if values else 0.0
+        }
+        for percent in TIMING_PERCENTILES:
+            stage_summary[f"p{percent}"] = round(percentile(values, percent), 4)
+        summary["stages"][stage] = stage_summary
+    
+    if wall_seconds is not None:
+        summary["wall_seconds"] = round(wall_seconds, 4)
+        summary["pages_per_second"] = round(len(page_timings) / wall_seconds, 4) if wall_seconds > 0 else 0.0
+    
+    return summary
+
+def format_timings(timings):
+    """Format a page's stage timings as 'stage=seconds' pairs for the log."""
+    return " ".join(f"{stage}={timings[stage]:.3f}s" for stage in TIMING_STAGES + ("total",) if stage in timings)
 
 def setup_tesseract_for_multilingual():
     """Configure Tesseract to work with Hebrew and English."""
@@ -41,22 +114,22 @@ def setup_tesseract_for_multilingual():
     pytesseract.pytesseract.tesseract_cmd = r'tesseract'  # Update path if necessary
     return 'heb+eng'  # Hebrew and English language codes
 
-def perform_ocr_on_image(image, lang):
+def perform_ocr_on_image(image, lang, config=PAGE_OCR_CONFIG):
     """
     Perform OCR on a single image.
     
     Args:
         image: Image to be processed
         lang: Language setting for OCR
+        config: Tesseract options (PAGE_OCR_CONFIG for whole pages)
     
     Returns:
         Extracted text from the image
     """
     try:
-        # Set page segmentation mode to 4 for sparse text with OSD
-        # This works better with mixed right-to-left and left-to-right text
-        # Set OCR engine mode to 3 for default, based on what is available
-        text = pytesseract.image_to_string(image, lang=lang, config='--psm 4 --oem 3')
+        # Page segmentation mode 4 (sparse text) works better with mixed right-to-left
+        # and left-to-right text; OCR engine mode 3 uses whatever is available
+        text = pytesseract.image_to_string(image, lang=lang, config=config)
         
         # Process text to handle mixed language directions
         processed_text = text.strip()
@@ -148,7 +221,187 @@ def remove_highlights_from_page(pdf_path, page_number, output_dir=None, dpi=300)
     except Exception as e:
         raise Exception(f"Error processing PDF: {str(e)}")
 
-def process_pdf(pdf_path, output_path=None, page_numbers=None, dpi=300, image_output_dir=None, progress_callback=None):
+def ocr_highlighted_regions(document, page_num, lang, dpi=300):
+    """
+    OCR only the highlighted areas of a page.
+    
+    Each highlighted line is rendered on its own, without the highlight
+    colour, and read as a single line of text.
+    
+    Args:
+        document: PdfDocument of the job
+        page_num: Page number (1-based)
+        lang: Language setting for OCR
+        dpi: DPI resolution of the rendered regions
+    
+    Returns:
+        List with one {"rect", "text"} dictionary per highlight annotation, rect
+        being the (x0, y0, x1, y1) bounds of its lines in PDF points
+    """
+    highlights = []
+    for rects in document.highlight_regions(page_num):
+        lines = []
+        for x0, y0, x1, y1 in rects:
+            margin = HIGHLIGHT_MARGIN_POINTS
+            region = document.render_region(page_num, (x0 - margin, y0 - margin, x1 + margin, y1 + margin), dpi=dpi)
+            if region is None:
+                continue
+            with region:
+                line = perform_ocr_on_image(region, lang, config=HIGHLIGHT_OCR_CONFIG)
+            if line:
+                lines.append(line)
+        bounds = [min(rect[0] for rect in rects), min(rect[1] for rect in rects),
+                  max(rect[2] for rect in rects), max(rect[3] for rect in rects)]
+        highlights.append({"rect": [round(value, 1) for value in bounds], "text": " ".join(lines)})
+    return highlights
+
+def extract_highlighted_text(document, pages_to_process, lang, dpi=300):
+    """
+    First pass over a document: OCR the highlighted areas of every page.
+    
+    This reads a few lines per highlighted page instead of whole pages, so
+    the highlighted text is known within seconds of the upload, long before
+    full-page OCR is done.
+    
+    Args:
+        document: PdfDocument of the job
+        pages_to_process: Page numbers of the job, in order
+        lang: Language setting for OCR
+        dpi: DPI resolution of the rendered regions
+    
+    Returns:
+        List of (position, page) pairs for the pages with highlights, position
+        being the page's index in pages_to_process and page an early page
+        result with "highlighted_text" and "highlights" (and no "text" yet)
+    """
+    preview = []
+    for position, page_num in enumerate(pages_to_process):
+        try:
+            highlights = ocr_highlighted_regions(document, page_num, lang, dpi)
+            if not highlights:
+                continue
+            preview.append((position, {
+                "page_number": page_num,
+                "has_annotations": True,
+                "annotation_types": document.annotation_types(page_num),
+                "text": "",
+                "highlighted_text": "\n".join(highlight["text"] for highlight in highlights if highlight["text"]),
+                "highlights": highlights
+            }))
+        except Exception as e:
+            # The full pass reports the page's error
+            logger.error(f"Error reading highlighted text of page {page_num}: {str(e)}")
+    return preview
+
+def wait_unless_stopped(acquire, stop):
+    """
+    Wait for a semaphore-like resource, giving up when stop is set.
+    
+    Args:
+        acquire: Function taking a timeout in seconds and returning True once acquired
+        stop: Event set when the job is ending
+    
+    Returns:
+        True if the resource was acquired, False if the job is ending
+    """
+    while not stop.is_set():
+        if acquire(RENDER_WAIT_INTERVAL):
+            return True
+    return False
+
+def render_pages(document, pages_to_process, dpi, render_clean, slots, memory_budget, rendered, stop,
+                 blank_thresholds=None):
+    """
+    Render pages ahead of OCR (runs in its own thread).
+    
+    Each page takes one of the in-flight slots and, with a memory budget,
+    reserves the estimated size of its images before it is rendered; both
+    are given back by release_rendered_page once the page is done. While
+    this runs, it is the only user of the document.
+    
+    With blank_thresholds, pages without annotations are first rendered at
+    BLANK_CHECK_DPI and classified with is_blank_page; blank pages get a
+    "blank" entry with their ink statistics and are only rendered at full
+    resolution when their image is saved (render_clean).
+    
+    Args:
+        document: PdfDocument of the job
+        pages_to_process: Page numbers to render, in order
+        dpi: DPI resolution for the image conversion
+        render_clean: Also render annotated pages without their annotations (set
+                      when page images are saved)
+        slots: Semaphore limiting the pages in flight
+        memory_budget: Optional MemoryBudget for the rendered images
+        rendered: Queue receiving one dictionary per page, then None
+        stop: Event set when the job is ending
+        blank_thresholds: Thresholds of is_blank_page, None to OCR every page
+    """
+    try:
+        for page_num in pages_to_process:
+            if not wait_unless_stopped(lambda timeout: slots.acquire(timeout=timeout), stop):
+                return
+            
+            rendered_page = {"page_number": page_num, "timings": {}, "images": {}, "reserved": 0}
+            timings = rendered_page["timings"]
+            render_start = time.perf_counter()
+            try:
+                # Check for highlights/annotations on this page
+                with stage_timer(timings, "annotation_scan"):
+                    annotation_types = document.annotation_types(page_num)
+                rendered_page["annotation_types"] = annotation_types
+                with_clean_image = render_clean and len(annotation_types) > 0
+                
+                # Separator sheets and empty back sides are recognized on a small render and not OCRed
+                if blank_thresholds is not None and not annotation_types:
+                    with stage_timer(timings, "blank_check"):
+                        with document.render(page_num, dpi=BLANK_CHECK_DPI, annots=False) as small_image:
+                            blank, statistics = is_blank_page(small_image, blank_thresholds)
+                    if blank:
+                        rendered_page["blank"] = statistics
+                        if not render_clean:
+                            rendered_page["render_seconds"] = time.perf_counter() - render_start
+                            rendered.put(rendered_page)
+                            continue
+                
+                if memory_budget is not None:
+                    width, height = document.render_size(page_num, dpi)
+                    nbytes = width * height * 3 * (2 if with_clean_image else 1)
+                    if not wait_unless_stopped(lambda timeout: memory_budget.acquire(nbytes, timeout), stop):
+                        slots.release()
+                        return
+                    rendered_page["reserved"] = nbytes
+                
+                # The page as displayed (with highlights), and the clean version for OCR
+                with stage_timer(timings, "render"):
+                    rendered_page["images"]["page"] = document.render(page_num, dpi=dpi)
+                if with_clean_image:
+                    try:
+                        with stage_timer(timings, "annotation_removal"):
+                            rendered_page["images"]["clean"] = document.render(page_num, dpi=dpi, annots=False)
+                    except Exception as e:
+                        rendered_page["clean_error"] = str(e)
+            
+            except Exception as e:
+                rendered_page["error"] = e
+            
+            rendered_page["render_seconds"] = time.perf_counter() - render_start
+            rendered.put(rendered_page)
+    finally:
+        rendered.put(None)
+
+def release_rendered_page(rendered_page, slots, memory_budget):
+    """Close a rendered page's images and give back its slot and memory reservation."""
+    for image in rendered_page["images"].values():
+        image.close()
+    rendered_page["images"].clear()
+    if rendered_page["reserved"]:
+        memory_budget.release(rendered_page["reserved"])
+    slots.release()
+
+def process_pdf(pdf_path, output_path=None, page_numbers=None, dpi=300, image_output_dir=None, progress_callback=None,
+                document=None, pages_in_flight=DEFAULT_PAGES_IN_FLIGHT, memory_budget=None,
+                highlight_first_pass=True, highlights_callback=None, detect_blank_pages=True,
+                blank_thresholds=None, ocr_profile='default'):
     """
     Process a PDF document with mixed Hebrew and English text and save results to JSON.
     Uses a single loop to process each page - check for highlights, convert to image, and perform OCR.
@@ -161,10 +414,43 @@ def process_pdf(pdf_path, output_path=None, page_numbers=None, dpi=300, image_ou
         dpi: DPI resolution for the image conversion
         image_output_dir: Directory to save page images
         progress_callback: Optional callback function to report progress
-                          Function signature: progress_callback(current_page, total_pages, status, message=None, error=None)
+                          Function signature: progress_callback(current_page, total_pages, status, message=None, error=None, timing=None)
+                          where timing holds the stage timings of the last finished page
+        document: Optional PdfDocument already opened for pdf_path (e.g. by the upload
+                  that counted its pages); it is used for every page and left open
+        pages_in_flight: Pages rendered ahead of OCR at most (1 renders each page after
+                         the previous one is done)
+        memory_budget: Optional MemoryBudget limiting the memory of the rendered pages in
+                       flight; pages wait for their estimated size to fit
+        highlight_first_pass: OCR the highlighted areas of all pages before the full pages
+                              (see extract_highlighted_text); pages with highlights get
+                              "highlighted_text" and "highlights"
+        highlights_callback: Optional function called with the output path and the early
+                             page results once the first pass is stored, e.g. to index them
+        detect_blank_pages: Skip OCR for blank pages (see blank_pages.is_blank_page); they
+                            get "blank": True and empty text
+        blank_thresholds: Optional dictionary overriding some of DEFAULT_BLANK_THRESHOLDS
+        ocr_profile: Name of the Tesseract settings for whole pages (see OCR_PROFILES)
+    
+    The PDF is parsed once: the same document handle provides the page count,
+    the annotations and all page renderings. Pages are rendered in a background
+    thread while earlier pages are OCRed, each page's images are closed as soon
+    as it is done, and '.sqlite' results are written in batches as pages finish
+    (see ResultsWriter), so memory stays flat however long the document is.
+    With the first pass, a '.sqlite' store holds the highlighted text of the
+    pages (marked as full_ocr_pending) before the first page is rendered.
+    Every page result gets a "timings" dictionary (seconds per stage in
+    TIMING_STAGES, plus "total"), and the document gets a "timing_summary".
     """
     # Validate input
-    if not os.path.exists(pdf_path):
+    if ocr_profile not in OCR_PROFILES:
+        logger.error(f"Unknown OCR profile: {ocr_profile}")
+        if progress_callback:
+            progress_callback(0, 0, 'error', message='Unknown OCR profile',
+                              error=f"Unknown OCR profile: {ocr_profile}. Use one of: {', '.join(OCR_PROFILES)}")
+        return False
+    ocr_config = OCR_PROFILES[ocr_profile]
+    if document is None and not os.path.exists(pdf_path):
         logger.error(f"PDF file not found: {pdf_path}")
         if progress_callback:
             progress_callback(0, 0, 'error', message='PDF file not found', error=f"PDF file not found: {pdf_path}")
@@ -188,14 +474,16 @@ def process_pdf(pdf_path, output_path=None, page_numbers=None, dpi=300, image_ou
     # Setup for multilingual OCR (Hebrew + English)
     lang = setup_tesseract_for_multilingual()
     
+    owns_document = document is None
+    writer = None
     try:
-        # Open the PDF with PyMuPDF for annotations and with PyPDF2 for total page count
+        # Open the PDF once for the page count, annotations and rendering
         if progress_callback:
             progress_callback(0, 0, 'initializing', message='Opening PDF document...')
-            
-        pdf_doc = fitz.open(pdf_path)
-        pdf_reader = PdfReader(pdf_path)
-        total_pages_in_document = len(pdf_reader.pages)
+        
+        if owns_document:
+            document = PdfDocument(pdf_path)
+        total_pages_in_document = document.page_count
         
         # Determine which pages to process
         if page_numbers:
@@ -209,140 +497,210 @@ def process_pdf(pdf_path, output_path=None, page_numbers=None, dpi=300, image_ou
         if progress_callback:
             progress_callback(0, len(pages_to_process), 'processing', message='Starting PDF processing...')
         
-        results = []
+        writer = ResultsWriter(output_path)
+        page_timings = []
+        blank_pages = []
+        run_start = time.perf_counter()
+        last_timings = None
         
-        # Single loop to process all selected pages
-        for i, page_num in enumerate(tqdm(pages_to_process, desc="Processing pages")):
-            page_result = {"page_number": page_num}
-            
-            # Report progress
+        # Fast first pass: the highlighted text is stored (and searchable) before the full pages are OCRed
+        highlighted_pages = {}
+        highlight_pass_seconds = None
+        if highlight_first_pass:
             if progress_callback:
-                progress_message = f"Processing page {page_num} of {len(pages_to_process)}..."
-                progress_callback(i, len(pages_to_process), 'processing', message=progress_message)
-            
-            try:
-                # Step 1: Check for highlights/annotations on this page
-                # PyMuPDF uses 0-based indexing
-                fitz_page = pdf_doc[page_num - 1]
-                annotations = fitz_page.annots()
-                
-                has_annotations = annotations is not None and len(list(annotations)) > 0
-                annotation_types = []
-                
-                if has_annotations:
-                    for annot in annotations:
-                        annotation_types.append(annot.type[1])
-                    logger.info(f"Page {page_num} has annotations")
-                
-                page_result["has_annotations"] = has_annotations
-                page_result["annotation_types"] = annotation_types
-                
-                # Save image paths for both regular and clean versions
-                original_image_path = None
-                clean_image_path = None
-                
-                # Step 2: Handle page differently based on whether it has highlights
-                if has_annotations and image_output_dir:
-                    # Step 2a: First, convert the page with highlights to image (for viewing)
-                    images_with_highlights = convert_from_path(
-                        pdf_path, 
-                        dpi=dpi, 
-                        first_page=page_num, 
-                        last_page=page_num
-                    )
+                progress_callback(0, len(pages_to_process), 'processing', message='Reading highlighted text...')
+            preview = extract_highlighted_text(document, pages_to_process, lang, dpi)
+            highlight_pass_seconds = time.perf_counter() - run_start
+            highlighted_pages = {page["page_number"]: page for _, page in preview}
+            logger.info(f"Read the highlighted text of {len(preview)} pages in {highlight_pass_seconds:.3f}s")
+            if preview:
+                writer.write_preview(preview, {
+                    "document_name": os.path.basename(pdf_path),
+                    "total_pages_in_document": total_pages_in_document
+                })
+                if highlights_callback:
+                    highlights_callback(output_path, [page for _, page in preview])
+                if progress_callback:
+                    progress_callback(0, len(pages_to_process), 'processing',
+                                      message=f'Highlighted text of {len(preview)} pages is ready, reading all pages...')
+        
+        # Pages are rendered ahead in a background thread, at most pages_in_flight at a time
+        slots = threading.Semaphore(max(1, pages_in_flight))
+        rendered = queue.Queue()
+        stop = threading.Event()
+        render_thread = threading.Thread(
+            target=render_pages,
+            args=(document, pages_to_process, dpi, bool(image_output_dir), slots, memory_budget, rendered, stop,
+                  thresholds_with(blank_thresholds) if detect_blank_pages else None),
+            daemon=True
+        )
+        render_thread.start()
+        rendering_done = False
+        
+        try:
+            # Single loop to process all selected pages
+            for i, page_num in enumerate(tqdm(pages_to_process, desc="Processing pages")):
+                # Records logged while the page is processed are tagged with its number
+                with log_context(page=page_num):
+                    page_result = {"page_number": page_num}
+                    
+                    # Report progress
+                    if progress_callback:
+                        progress_message = f"Processing page {page_num} of {len(pages_to_process)}..."
+                        progress_callback(i, len(pages_to_process), 'processing', message=progress_message,
+                                          timing=last_timings)
+                    
+                    rendered_page = rendered.get()
+                    if rendered_page is None:
+                        rendering_done = True
+                        raise RuntimeError("Rendering stopped before all pages were processed")
+                    timings = rendered_page["timings"]
+                    page_start = time.perf_counter()
                     
-                    if images_with_highlights:
-                        # Save the original image with highlights
-                        original_image_filename = f"page_{page_num}.png"
-                        original_image_path = os.path.join(image_output_dir, original_image_filename)
-                        images_with_highlights[0].save(original_image_path, "PNG")
-                        page_result["image_path"] = original_image_path
-                        page_result["highlighted_image_path"] = original_image_path
+                    try:
+                        if "error" in rendered_page:
+                            raise rendered_page["error"]
                         
-                        # Step 2b: Now, remove highlights and save clean version (for OCR)
-                        try:
-                            clean_image_path, removed_count = remove_highlights_from_page(
-                                pdf_path, 
-                                page_num, 
-                                output_dir=clean_images_dir, 
-                                dpi=dpi
-                            )
-                            page_result["clean_image_path"] = clean_image_path
-                            page_result["removed_highlights_count"] = removed_count
+                        annotation_types = rendered_page["annotation_types"]
+                        has_annotations = len(annotation_types) > 0
+                        if has_annotations:
+                            logger.debug("Page has annotations: %s", annotation_types)
+                        
+                        page_result["has_annotations"] = has_annotations
+                        page_result["annotation_types"] = annotation_types
+                        if page_num in highlighted_pages:
+                            page_result["highlighted_text"] = highlighted_pages[page_num]["highlighted_text"]
+                            page_result["highlights"] = highlighted_pages[page_num]["highlights"]
+                        image = rendered_page["images"].get("page")
+                        
+                        # Handle page differently based on whether it has highlights
+                        if has_annotations and image_output_dir:
+                            # Save the original image with highlights (for viewing)
+                            original_image_path = os.path.join(image_output_dir, f"page_{page_num}.png")
+                            with stage_timer(timings, "image_write"):
+                                image.save(original_image_path, "PNG")
+                            page_result["image_path"] = original_image_path
+                            page_result["highlighted_image_path"] = original_image_path
                             
-                            # Step 2c: Perform OCR on the clean image
-                            clean_image = Image.open(clean_image_path)
-                            page_result["text"] = perform_ocr_on_image(clean_image, lang)
+                            # Save the clean version (without annotations) and OCR it
+                            try:
+                                if "clean_error" in rendered_page:
+                                    raise RuntimeError(rendered_page["clean_error"])
+                                clean_image = rendered_page["images"]["clean"]
+                                with stage_timer(timings, "annotation_removal"):
+                                    clean_image_path = os.path.join(clean_images_dir, f"page{page_num}_no_highlights.png")
+                                    clean_image.save(clean_image_path, "PNG")
+                                page_result["clean_image_path"] = clean_image_path
+                                page_result["removed_highlights_count"] = len(annotation_types)
+                                
+                                with stage_timer(timings, "ocr"):
+                                    page_result["text"] = perform_ocr_on_image(clean_image, lang, ocr_config)
+                                
+                            except Exception as e:
+                                logger.error("Error removing highlights: %s", e)
+                                # Fallback: Perform OCR on the original image with highlights
+                                with stage_timer(timings, "ocr"):
+                                    page_result["text"] = perform_ocr_on_image(image, lang, ocr_config)
+                                
+                        else:
+                            # Regular processing for pages without highlights
+                            if image_output_dir:
+                                image_path = os.path.join(image_output_dir, f"page_{page_num}.png")
+                                with stage_timer(timings, "image_write"):
+                                    image.save(image_path, "PNG")
+                                page_result["image_path"] = image_path
                             
-                        except Exception as e:
-                            logger.error(f"Error removing highlights from page {page_num}: {str(e)}")
-                            # Fallback: Perform OCR on the original image with highlights
-                            page_result["text"] = perform_ocr_on_image(images_with_highlights[0], lang)
-                    else:
-                        logger.warning(f"No image generated for page {page_num}")
+                            if "blank" in rendered_page:
+                                # Nothing to read on a blank page
+                                logger.info("Page is blank, skipping OCR: %s", rendered_page['blank'])
+                                page_result["blank"] = True
+                                page_result["blank_check"] = rendered_page["blank"]
+                                page_result["text"] = ""
+                                blank_pages.append(page_num)
+                            else:
+                                # Perform OCR on the image
+                                with stage_timer(timings, "ocr"):
+                                    page_result["text"] = perform_ocr_on_image(image, lang, ocr_config)
+                        
+                    except Exception as e:
+                        logger.error("Error processing page: %s", e)
                         page_result["text"] = ""
+                        page_result["error"] = str(e)
                         
-                else:
-                    # Step 3: Regular processing for pages without highlights
-                    images = convert_from_path(
-                        pdf_path, 
-                        dpi=dpi, 
-                        first_page=page_num, 
-                        last_page=page_num
-                    )
+                        # Report error
+                        if progress_callback:
+                            progress_callback(i, len(pages_to_process), 'error', 
+                                             error=f"Error processing page {page_num}: {str(e)}")
+                    finally:
+                        # Release the page's images right away instead of when the next page replaces them
+                        image = clean_image = None
+                        release_rendered_page(rendered_page, slots, memory_budget)
                     
-                    if images:
-                        # Save the image directly to the output directory
-                        if image_output_dir:
-                            image_filename = f"page_{page_num}.png"
-                            image_path = os.path.join(image_output_dir, image_filename)
-                            images[0].save(image_path, "PNG")
-                            page_result["image_path"] = image_path
-                        
-                        # Perform OCR on the image
-                        page_result["text"] = perform_ocr_on_image(images[0], lang)
-                    else:
-                        logger.warning(f"No image generated for page {page_num}")
-                        page_result["text"] = ""
-                
-                results.append(page_result)
-                
-            except Exception as e:
-                logger.error(f"Error processing page {page_num}: {str(e)}")
-                page_result["text"] = ""
-                page_result["error"] = str(e)
-                results.append(page_result)
-                
-                # Report error
-                if progress_callback:
-                    progress_callback(i, len(pages_to_process), 'error', 
-                                     error=f"Error processing page {page_num}: {str(e)}")
+                    # Time spent on the page itself, not waiting for it to be rendered
+                    timings["total"] = rendered_page["render_seconds"] + time.perf_counter() - page_start
+                    page_result["timings"] = {stage: round(seconds, 4) for stage, seconds in timings.items()}
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Page timings: %s", format_timings(timings))
+                    last_timings = page_result["timings"]
+                    page_timings.append({"timings": last_timings})
+                    writer.add_page(page_result)
+        
+        finally:
+            # Stop rendering and release the pages rendered ahead that were not processed
+            stop.set()
+            while not rendering_done:
+                rendered_page = rendered.get()
+                if rendered_page is None:
+                    rendering_done = True
+                else:
+                    release_rendered_page(rendered_page, slots, memory_budget)
+            render_thread.join()
+        
+        # Close the PDF document unless the caller passed it in
+        if owns_document:
+            document.close()
         
-        # Close the PDF document
-        pdf_doc.close()
+        timing_summary = summarize_timings(page_timings, time.perf_counter() - run_start)
+        if highlight_pass_seconds is not None:
+            timing_summary["highlight_pass_seconds"] = round(highlight_pass_seconds, 4)
+        logger.info(f"Document timings: {json.dumps(timing_summary['stages'])}")
         
-        # Create structured output
+        # Document-level fields, written with the last pages
         document_results = {
             "document_name": os.path.basename(pdf_path),
             "total_pages_in_document": total_pages_in_document,
             "pages_processed": len(pages_to_process),
             "page_numbers_processed": pages_to_process,
             "language": "Hebrew and English",
-            "pages": results
+            "ocr_profile": ocr_profile,
+            "blank_pages_skipped": len(blank_pages),
+            "blank_page_numbers": blank_pages,
+            "timing_summary": timing_summary
         }
+        if blank_pages:
+            logger.info(f"Skipped OCR of {len(blank_pages)} blank pages: {blank_pages}")
         
         # Report completed status
         if progress_callback:
+            completed_message = 'PDF processing completed successfully.'
+            if blank_pages:
+                completed_message += f' {len(blank_pages)} blank pages were not OCRed.'
             progress_callback(len(pages_to_process), len(pages_to_process), 'completed', 
-                             message='PDF processing completed successfully.')
+                             message=completed_message, timing=last_timings)
         
-        # Save results
-        success = save_to_json(document_results, output_path)
+        # Save results (SQLite store for '.sqlite' paths, JSON otherwise)
+        success = writer.close(document_results)
+        if success:
+            logger.info(f"Results saved to {output_path}")
         
         return success
     
     except Exception as e:
         logger.error(f"Error processing PDF: {str(e)}")
+        if writer is not None:
+            writer.abort()
+        if document is not None and owns_document:
+            document.close()
         # Report error
         if progress_callback:
             progress_callback(0, 0, 'error', error=f"Error processing PDF: {str(e)}")
@@ -350,13 +708,31 @@ def process_pdf(pdf_path, output_path=None, page_numbers=None, dpi=300, image_ou
 
 def main():
     """Main function to parse arguments and process PDF."""
+    setup_logging(name=logger.name)
+    
     parser = argparse.ArgumentParser(description='Process PDF with Hebrew and English text using OCR')
     parser.add_argument('--pdf-path', help='Path to the PDF file')
-    parser.add_argument('--output', '-o', help='Output JSON file path')
+    parser.add_argument('--output', '-o', help='Output file path (.json, or .sqlite for the SQLite results store)')
     parser.add_argument('--start-page', type=int, help='First page to process (starts from 1)')
     parser.add_argument('--end-page', type=int, help='Last page to process')
     parser.add_argument('--dpi', type=int, default=300, help='DPI resolution for image conversion (default: 300)')
     parser.add_argument('--image-dir', help='Directory to save page images')
+    parser.add_argument('--pages-in-flight', type=int, default=DEFAULT_PAGES_IN_FLIGHT,
+                        help=f'Pages rendered ahead of OCR at most (default: {DEFAULT_PAGES_IN_FLIGHT})')
+    parser.add_argument('--memory-budget-mb', type=float, default=DEFAULT_JOB_BUDGET_MB,
+                        help=f'Memory for rendered pages in flight, in MB (default: {DEFAULT_JOB_BUDGET_MB})')
+    parser.add_argument('--no-highlight-pass', action='store_true',
+                        help='Skip the first pass that reads only the highlighted text')
+    parser.add_argument('--no-blank-detection', action='store_true', help='OCR blank pages too')
+    parser.add_argument('--blank-max-ink-ratio', type=float,
+                        help=f"Share of ink a blank page may have (default: {DEFAULT_BLANK_THRESHOLDS['max_ink_ratio']})")
+    parser.add_argument('--blank-max-components', type=int,
+                        help=f"Ink blobs a blank page may have (default: {DEFAULT_BLANK_THRESHOLDS['max_components']})")
+    parser.add_argument('--blank-max-body-components', type=int,
+                        help=f"Ink blobs a blank page may have inside its margins "
+                             f"(default: {DEFAULT_BLANK_THRESHOLDS['max_body_components']})")
+    parser.add_argument('--ocr-profile', choices=OCR_PROFILES, default='default',
+                        help='Tesseract settings for whole pages (default: default)')
     args = parser.parse_args()
 
     # Process specific page range if provided
@@ -368,7 +744,15 @@ def main():
             # If only start page is provided or end page is invalid
             page_numbers = [args.start_page]
     
-    success = process_pdf(args.pdf_path, args.output, page_numbers, args.dpi, args.image_dir)
+    success = process_pdf(args.pdf_path, args.output, page_numbers, args.dpi, args.image_dir,
+                          pages_in_flight=args.pages_in_flight,
+                          memory_budget=MemoryBudget.from_megabytes(args.memory_budget_mb),
+                          highlight_first_pass=not args.no_highlight_pass,
+                          detect_blank_pages=not args.no_blank_detection,
+                          blank_thresholds={'max_ink_ratio': args.blank_max_ink_ratio,
+                                            'max_components': args.blank_max_components,
+                                            'max_body_components': args.blank_max_body_components},
+                          ocr_profile=args.ocr_profile)
     
     if success:
         logger.info("Processing completed successfully")
@@ -0,0 +1,220 @@
+import os
+import io
+import re
+import time
+import uuid
+import pstats
+import cProfile
+import logging
+import functools
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import current_app, request
+
+logger = logging.getLogger(__name__)
+
+# Request header and form field that ask for a single request or job to be profiled
+PROFILE_HEADER = 'X-Profile'
+PROFILE_FIELD = 'profile'
+
+# Response header carrying the id of the profile written for a request
+PROFILE_ID_HEADER = 'X-Profile-Id'
+
+# Number of functions listed in the text summary written next to each profile
+SUMMARY_LIMIT = 60
+
+# Profile ids are used as file names, so only these characters are accepted
+PROFILE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+# Only one cProfile profiler can be active at a time (Python 3.12+ enforces this)
+_profiler_lock = threading.Lock()
+
+
+def _truthy(value: Optional[str]) -> bool:
+    """Interpret a header, form or environment value as a boolean flag."""
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def profiling_enabled_by_env() -> bool:
+    """Check the MCA_PROFILING environment variable (used as the config default)."""
+    return _truthy(os.environ.get('MCA_PROFILING', '0'))
+
+
+def profiling_requested() -> bool:
+    """
+    Check whether the current request should be profiled.
+
+    Profiling happens when the PROFILING_ENABLED config flag is set, or when
+    the request carries an "X-Profile: 1" header or a "profile=1" form field.
+
+    Returns:
+        True if the request (or the job it starts) should be profiled
+    """
+    if current_app.config.get('PROFILING_ENABLED'):
+        return True
+    if _truthy(request.headers.get(PROFILE_HEADER)):
+        return True
+    return _truthy(request.form.get(PROFILE_FIELD)) if request.form else False
+
+
+def profile_path(profiles_folder: str, profile_id: str, extension: str = '.prof') -> str:
+    """
+    Get the path of a profile artifact.
+
+    Args:
+        profiles_folder: Folder holding the profiles
+        profile_id: Profile id (job id or generated request profile id)
+        extension: '.prof' for pstats data, '.txt' for the text summary
+
+    Returns:
+        Path of the artifact
+
+    Raises:
+        ValueError: If the profile id contains characters not allowed in file names
+    """
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        raise ValueError(f"Invalid profile id: {profile_id}")
+    return os.path.join(profiles_folder, profile_id + extension)
+
+
+def write_profile(profiler: cProfile.Profile, profiles_folder: str, profile_id: str,
+                  wall_seconds: float) -> str:
+    """
+    Write a profiler's stats (.prof, loadable with pstats or snakeviz) and a text summary (.txt).
+
+    Args:
+        profiler: The finished profiler
+        profiles_folder: Folder to write the artifacts to
+        profile_id: Id the artifacts are named after
+        wall_seconds: Wall-clock duration of the profiled call
+
+    Returns:
+        Path of the .prof file
+    """
+    os.makedirs(profiles_folder, exist_ok=True)
+    stats_path = profile_path(profiles_folder, profile_id)
+    profiler.dump_stats(stats_path)
+
+    summary = io.StringIO()
+    summary.write(f"Profile {profile_id} - wall time {wall_seconds:.3f}s\n\n")
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats('cumulative').print_stats(SUMMARY_LIMIT)
+    with open(profile_path(profiles_folder, profile_id, '.txt'), 'w', encoding='utf-8') as f:
+        f.write(summary.getvalue())
+
+    return stats_path
+
+
+def reserve_profiler(profile_id: str) -> bool:
+    """
+    Reserve the profiler for a profile, e.g. one a job's thread takes later.
+
+    Only one profile runs at a time. A reservation is handed to profile_call
+    (reserved=True), which releases it, or given back with release_profiler.
+
+    Args:
+        profile_id: Id of the profile, for the log if it is skipped
+
+    Returns:
+        True if the profiler was reserved, False if another profile is running
+    """
+    if not _profiler_lock.acquire(blocking=False):
+        logger.warning("Profile %s skipped: another profile is running", profile_id)
+        return False
+    return True
+
+
+def release_profiler() -> None:
+    """Give back a reservation of reserve_profiler that was not handed to profile_call."""
+    _profiler_lock.release()
+
+
+def profile_call(profiles_folder: str, profile_id: str, func: Callable, *args, reserved: bool = False,
+                 **kwargs) -> Tuple[Any, bool]:
+    """
+    Run a function under cProfile and write its profile artifacts.
+
+    Args:
+        profiles_folder: Folder to write the artifacts to
+        profile_id: Id the artifacts are named after (e.g. the job id)
+        func: Function to run
+        *args, **kwargs: Arguments for the function
+        reserved: The caller reserved the profiler with reserve_profiler
+
+    Returns:
+        Tuple of (whatever the function returns, whether it was profiled)
+
+    If another profile is already running, the function runs unprofiled.
+    """
+    if not reserved and not reserve_profiler(profile_id):
+        return func(*args, **kwargs), False
+
+    try:
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            return profiler.runcall(func, *args, **kwargs), True
+        finally:
+            try:
+                write_profile(profiler, profiles_folder, profile_id, time.perf_counter() - start)
+            except Exception as e:
+                logger.error("Error writing profile %s: %s", profile_id, e)
+    finally:
+        release_profiler()
+
+
+def profiled_route(name: str) -> Callable:
+    """
+    Decorator that profiles a Flask view when profiling is requested.
+
+    Without a request for profiling the view is called directly. A profiled
+    response carries the profile id in the X-Profile-Id header; it is left
+    out if the view ran unprofiled because another profile was running.
+
+    Args:
+        name: Short route name used in the profile id
+
+    Returns:
+        The decorator
+    """
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not profiling_requested():
+                return view(*args, **kwargs)
+
+            profile_id = f"{name}_{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:8]}"
+            result, profiled = profile_call(current_app.config['PROFILES_FOLDER'], profile_id, view, *args, **kwargs)
+            response = current_app.make_response(result)
+            if profiled:
+                response.headers[PROFILE_ID_HEADER] = profile_id
+            return response
+        return wrapper
+    return decorator
+
+
+def list_profiles(profiles_folder: str) -> List[Dict[str, Any]]:
+    """
+    List the profiles in a folder, newest first.
+
+    Args:
+        profiles_folder: Folder holding the profiles
+
+    Returns:
+        List of dictionaries with profile_id, size and created (timestamp)
+    """
+    if not os.path.isdir(profiles_folder):
+        return []
+
+    profiles = []
+    for filename in os.listdir(profiles_folder):
+        if not filename.endswith('.prof'):
+            continue
+        path = os.path.join(profiles_folder, filename)
+        profiles.append({
+            'profile_id': filename[:-len('.prof')],
+            'size': os.path.getsize(path),
+            'created': os.path.getmtime(path)
+        })
+    return sorted(profiles, key=lambda profile: profile['created'], reverse=True)
@@ -1,21 +1,31 @@
 import threading
 import time
+import logging
 from flask_socketio import SocketIO
 from flask import current_app
 
+logger = logging.getLogger(__name__)
+
 # Global dict to store progress for each session
 processing_status = {}
 socketio = None
 
-def init_socketio(app):
-    """Initialize SocketIO with the Flask app."""
+def init_socketio(app, async_mode='threading'):
+    """
+    Initialize SocketIO with the Flask app.
+    
+    Args:
+        app: The Flask app
+        async_mode: 'threading' (development server) or 'eventlet' (serve.py,
+            after eventlet's monkey patching)
+    """
     global socketio
     # Configure SocketIO with correct CORS settings and async mode
     socketio = SocketIO(app, 
                        cors_allowed_origins="*",    # Allow connections from any origin
-                       async_mode='threading',      # Use threading mode for better compatibility
-                       logger=True,                # Enable logging to help debug connection issues
-                       engineio_logger=True)       # Log the engineio events too
+                       async_mode=async_mode,       # Threading for compatibility, eventlet for serving many viewers
+                       logger=logging.getLogger('socketio'),          # Levels set with the app's log levels
+                       engineio_logger=logging.getLogger('engineio')) # (warnings only by default)
     return socketio
 
 def start_progress_tracking(session_id, total_pages):
@@ -32,13 +42,48 @@ def start_progress_tracking(session_id, total_pages):
         'percentage': 0,
         'status': 'initializing',
         'message': 'Processing PDF...',
-        'errors': []
+        'errors': [],
+        'started_at': time.time(),
+        'processing_started_at': None,
+        'pages_per_second': None,
+        'eta_seconds': None,
+        'last_page_timing': None,
+        'stage_totals': {}
     }
     # Start background thread to clean up old sessions
     cleanup_thread = threading.Thread(target=cleanup_old_sessions, daemon=True)
     cleanup_thread.start()
 
-def update_progress(session_id, current_page, status='processing', message=None, error=None):
+def update_throughput(status_data, current_page, timing=None):
+    """
+    Update throughput and ETA of a session from the pages finished so far.
+    
+    Throughput is measured from the first 'processing' update, so the time
+    spent opening the PDF does not count against the pages.
+    
+    Args:
+        status_data: Progress dictionary of the session
+        current_page: Number of pages finished
+        timing: Stage timings (seconds) of the page that just finished, if any
+    """
+    now = time.time()
+    if status_data.get('processing_started_at') is None:
+        status_data['processing_started_at'] = now
+    
+    if timing:
+        status_data['last_page_timing'] = timing
+        stage_totals = status_data.setdefault('stage_totals', {})
+        for stage, seconds in timing.items():
+            stage_totals[stage] = round(stage_totals.get(stage, 0.0) + seconds, 4)
+    
+    elapsed = now - status_data['processing_started_at']
+    if current_page > 0 and elapsed > 0:
+        pages_per_second = current_page / elapsed
+        remaining_pages = max(status_data['total_pages'] - current_page, 0)
+        status_data['pages_per_second'] = round(pages_per_second, 4)
+        status_data['eta_seconds'] = round(remaining_pages / pages_per_second, 1)
+
+def update_progress(session_id, current_page, status='processing', message=None, error=None, timing=None):
     """
     Update progress for a session.
     
@@ -48,6 +93,7 @@ def update_progress(session_id, current_page, status='processing', message=None,
         status: Status string ('initializing', 'processing', 'completed', 'error')
         message: Optional status message
         error: Optional error message
+        timing: Optional stage timings of the last finished page, used for throughput and ETA
     """
     if session_id in processing_status:
         status_data = processing_status[session_id]
@@ -58,6 +104,10 @@ def update_progress(session_id, current_page, status='processing', message=None,
         if status_data['total_pages'] > 0:
             status_data['percentage'] = int((current_page / status_data['total_pages']) * 100)
         
+        # Throughput and ETA from real page times
+        if status in ('processing', 'completed'):
+            update_throughput(status_data, current_page, timing)
+        
         # Update message if provided
         if message:
             status_data['message'] = message
@@ -67,8 +117,9 @@ def update_progress(session_id, current_page, status='processing', message=None,
             status_data['errors'].append(error)
             status_data['status'] = 'error'
         
-        # Log the update (for debugging)
-        print(f"Progress update for {session_id}: {current_page}/{status_data['total_pages']} ({status_data['percentage']}%) - {status}")
+        # Log the update (for debugging; arguments are only formatted when DEBUG is enabled)
+        logger.debug("Progress update: %s/%s (%s%%) - %s", current_page, status_data['total_pages'],
+                     status_data['percentage'], status, extra={'job_id': session_id})
         
         # Emit update via SocketIO if available
         if socketio:
@@ -79,9 +130,26 @@ def update_progress(session_id, current_page, status='processing', message=None,
                     'session_id': session_id,
                     'data': status_data
                 })
-                print(f"SocketIO event emitted: progress_update for {session_id}")
+                logger.debug("SocketIO event emitted: progress_update", extra={'job_id': session_id})
             except Exception as e:
-                print(f"Error emitting SocketIO event: {str(e)}")
+                logger.error("Error emitting SocketIO event: %s", e, extra={'job_id': session_id})
+
+def emit_event(event, payload):
+    """
+    Emit an event to the clients over the progress Socket.IO channel.
+    
+    Used for updates of other background jobs (e.g. notes exports), which
+    have their own event name so the OCR progress display ignores them.
+    
+    Args:
+        event: Event name
+        payload: JSON-serializable event data
+    """
+    if socketio:
+        try:
+            socketio.emit(event, payload)
+        except Exception as e:
+            logger.error("Error emitting SocketIO event %s: %s", event, e)
 
 def get_progress(session_id):
     """
@@ -95,6 +163,15 @@ def get_progress(session_id):
     """
     return processing_status.get(session_id)
 
+def list_progress():
+    """
+    Get the progress of all tracked sessions.
+    
+    Returns:
+        List of progress dictionaries
+    """
+    return list(processing_status.values())
+
 def complete_progress(session_id, success=True):
     """
     Mark a session as completed.
@@ -107,9 +184,11 @@ def complete_progress(session_id, success=True):
         status_data = processing_status[session_id]
         status_data['status'] = 'completed' if success else 'error'
         status_data['percentage'] = 100 if success else status_data['percentage']
+        if success:
+            status_data['eta_seconds'] = 0
         
         # Log completion
-        print(f"Processing completed for {session_id}: {'success' if success else 'failure'}")
+        logger.info("Processing completed: %s", 'success' if success else 'failure', extra={'job_id': session_id})
         
         # Emit final update
         if socketio:
@@ -119,9 +198,9 @@ def complete_progress(session_id, success=True):
                     'session_id': session_id,
                     'data': status_data
                 })
-                print(f"Final SocketIO event emitted for {session_id}")
+                logger.debug("Final SocketIO event emitted", extra={'job_id': session_id})
             except Exception as e:
-                print(f"Error emitting final SocketIO event: {str(e)}")
+                logger.error("Error emitting final SocketIO event: %s", e, extra={'job_id': session_id})
 
 def cleanup_old_sessions():
     """Clean up old sessions after 1 hour to prevent memory leaks."""
@@ -0,0 +1,357 @@
+import os
+import re
+import sys
+import time
+import uuid
+import shutil
+import argparse
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import results_store
+import fulltext_index
+import page_bitsets
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Suffix of the results a re-OCR writes before they are merged; unlike '_ocr_results.sqlite',
+# it is not picked up by the full-text index or the results globs
+REOCR_SUFFIX = ".reocr.sqlite"
+
+# DPI range accepted for re-OCR
+MIN_DPI = 72
+MAX_DPI = 1200
+
+
+def source_pdf_path(source_folder: str, result_id: str) -> str:
+    """Where the uploaded PDF of a result is kept for re-OCR."""
+    return os.path.join(source_folder, f"{result_id}.pdf")
+
+
+def keep_source_pdf(pdf_path: str, source_folder: str, result_id: str) -> str:
+    """
+    Move an uploaded PDF to the source PDF folder, so pages of its result can be re-OCRed later.
+
+    Returns:
+        The new path of the PDF
+    """
+    os.makedirs(source_folder, exist_ok=True)
+    kept_path = source_pdf_path(source_folder, result_id)
+    shutil.move(pdf_path, kept_path)
+    return kept_path
+
+
+def find_results_path(results_folder: str, result_id: str) -> Optional[str]:
+    """Find the stored results of a result id in a results folder (None if there are none)."""
+    for document_id, path in fulltext_index.find_results_files(results_folder).items():
+        if document_id.startswith(f"{result_id}_"):
+            return path
+    return None
+
+
+def reocr_part_path(results_path: str) -> str:
+    """Where the re-OCRed pages of a result are written before they are merged into it."""
+    return os.path.splitext(results_path)[0] + REOCR_SUFFIX
+
+
+def reocr_staging_folder(images_folder: str, result_id: str, run_id: str) -> str:
+    """Where a re-OCR writes the new images of a result's pages until they are merged into it."""
+    return os.path.join(images_folder, result_id, f"reocr_{run_id}")
+
+
+def _move_staged_images(page: Dict[str, Any], staging_folder: str, document_images_folder: str) -> None:
+    """Move a re-OCRed page's images from the staging folder over the result's, updating the page's paths."""
+    for key in ("image_path", "highlighted_image_path", "clean_image_path"):
+        staged_path = page.get(key)
+        if not staged_path or os.path.commonpath([staged_path, staging_folder]) != staging_folder:
+            continue
+        target_path = os.path.join(document_images_folder, os.path.relpath(staged_path, staging_folder))
+        # highlighted_image_path is the same file as image_path, moved already
+        if os.path.exists(staged_path):
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            os.replace(staged_path, target_path)
+        page[key] = target_path
+
+
+def parse_pages(pages: Union[str, Iterable[int], None]) -> List[int]:
+    """
+    Parse page numbers from '3,7-9' or a list of numbers, sorted and without duplicates.
+
+    Raises:
+        ValueError: If the pages are missing or invalid
+    """
+    if pages is None or pages == "" or pages == []:
+        raise ValueError("No pages given")
+    if isinstance(pages, str):
+        numbers = set()
+        for part in pages.split(","):
+            match = re.fullmatch(r"\s*(\d+)\s*(?:-\s*(\d+)\s*)?", part)
+            if not match:
+                raise ValueError(f"Invalid page range: '{part.strip()}'")
+            start = int(match.group(1))
+            end = int(match.group(2) or start)
+            if end < start:
+                raise ValueError(f"Invalid page range: '{part.strip()}'")
+            numbers.update(range(start, end + 1))
+        pages = numbers
+    elif isinstance(pages, (list, tuple, set)):
+        if not all(isinstance(page, int) and not isinstance(page, bool) for page in pages):
+            raise ValueError("Page numbers must be integers")
+    else:
+        raise ValueError("Pages must be a list of numbers or a string like '3,7-9'")
+
+    if any(page < 1 for page in pages):
+        raise ValueError("Page numbers start at 1")
+    return sorted(set(pages))
+
+
+def validate_request(results_path: str, pages: Union[str, Iterable[int], None], dpi: Any = 300,
+                     ocr_profile: str = "default") -> tuple:
+    """
+    Check the pages and settings of a re-OCR against a stored result.
+
+    Only pages the result already holds can be re-OCRed.
+
+    Returns:
+        Tuple of (page numbers, dpi, ocr profile)
+
+    Raises:
+        ValueError: If a page is not in the result or a setting is invalid
+    """
+    # Imported here: the OCR pipeline pulls in fitz, cv2, numpy and the Tesseract wrapper
+    from pdf_ocr_processor import OCR_PROFILES
+
+    page_numbers = parse_pages(pages)
+    if isinstance(dpi, bool) or not isinstance(dpi, (int, str)) or not str(dpi).isdigit():
+        raise ValueError(f"Invalid DPI: {dpi}")
+    dpi = int(dpi)
+    if not MIN_DPI <= dpi <= MAX_DPI:
+        raise ValueError(f"DPI must be between {MIN_DPI} and {MAX_DPI}, got {dpi}")
+    if ocr_profile not in OCR_PROFILES:
+        raise ValueError(f"Unknown OCR profile: {ocr_profile}. Use one of: {', '.join(OCR_PROFILES)}")
+
+    stored_pages = results_store.load_metadata(results_path).get("page_numbers_processed")
+    if stored_pages is None:
+        stored_pages = [page["page_number"] for page in results_store.load_results(results_path)["pages"]]
+    missing = [page for page in page_numbers if page not in stored_pages]
+    if missing:
+        raise ValueError(f"Pages not in the result: {', '.join(map(str, missing))}")
+    return page_numbers, dpi, ocr_profile
+
+
+def reocr_summary(replaced: List[int], failed: List[int]) -> str:
+    """Describe the outcome of a re-OCR for its progress message and the CLI."""
+    summary = f"Re-OCRed {len(replaced)} pages."
+    if failed:
+        summary += f" Pages {', '.join(map(str, failed))} could not be read again and were kept as they were."
+    return summary
+
+
+def merge_reocr_results(results_path: str, part_path: str, result_id: str, dpi: int, ocr_profile: str,
+                        index_path: Optional[str] = None,
+                        group_matchers: Optional[Dict[str, Dict[str, Any]]] = None,
+                        images_folder: Optional[str] = None,
+                        staging_folder: Optional[str] = None) -> Tuple[List[int], List[int]]:
+    """
+    Merge re-OCRed pages into a stored result and refresh what was derived from them.
+
+    The pages replace the stored ones as a whole (see results_store.replace_pages);
+    the blank page list and the re-OCR history of the document are updated.
+    Pages process_pdf could not read (stored with an 'error') are not merged,
+    so the stored page keeps its text.
+
+    The new page images are moved from the staging folder over the result's
+    right before the pages are replaced: until then the stored word boxes
+    still match the images they are drawn on. The staging folder is deleted,
+    also if the merge fails.
+    The full-text index, the word group bitsets and the cached highlighted
+    images are refreshed for the replaced pages only. The part is deleted.
+
+    Args:
+        results_path: Path of the stored result
+        part_path: Results of the re-OCR, as written by process_pdf
+        result_id: Result id the app serves the pages' images under
+        dpi: DPI the pages were rendered at
+        ocr_profile: OCR profile the pages were read with
+        index_path: Full-text index to refresh (None skips it)
+        group_matchers: Compiled matchers of the configured word groups (None skips the bitsets)
+        images_folder: Base images folder holding the result's images (None skips them)
+        staging_folder: Folder the re-OCR wrote the page images to (see reocr_staging_folder)
+
+    Returns:
+        Tuple of (page numbers that were replaced, page numbers that failed and were kept)
+    """
+    try:
+        return _merge_reocr_results(results_path, part_path, result_id, dpi, ocr_profile, index_path,
+                                    group_matchers, images_folder, staging_folder)
+    finally:
+        if staging_folder and os.path.isdir(staging_folder):
+            shutil.rmtree(staging_folder)
+
+
+def _merge_reocr_results(results_path: str, part_path: str, result_id: str, dpi: int, ocr_profile: str,
+                         index_path: Optional[str], group_matchers: Optional[Dict[str, Dict[str, Any]]],
+                         images_folder: Optional[str], staging_folder: Optional[str]) -> Tuple[List[int], List[int]]:
+    """Merge re-OCRed pages into a stored result (see merge_reocr_results)."""
+    part = results_store.load_results(part_path)
+    reocr_info = {"dpi": dpi, "ocr_profile": ocr_profile, "reocr_at": time.time()}
+    pages = []
+    failed = []
+    for page in part.get("pages", []):
+        page_number = page["page_number"]
+        if "error" in page:
+            failed.append(page_number)
+            continue
+        if "image_path" in page:
+            page["image_url"] = f"/page-images/{result_id}/{page_number}"
+            page.pop("clean_image_url", None)
+            if page.get("has_annotations", False) and "clean_image_path" in page:
+                page["clean_image_url"] = f"/clean-page-images/{result_id}/{page_number}"
+        else:
+            # No new images were written: the page keeps showing the old ones
+            stored_page = results_store.load_page(results_path, page_number) or {}
+            for key in ("image_path", "image_url", "clean_image_path", "clean_image_url"):
+                if key in stored_page:
+                    page[key] = stored_page[key]
+        page["reocr"] = reocr_info
+        pages.append(page)
+
+    if staging_folder and images_folder:
+        for page in pages:
+            _move_staged_images(page, staging_folder, os.path.join(images_folder, result_id))
+    replaced = results_store.replace_pages(results_path, pages) if pages else []
+
+    if replaced:
+        metadata = results_store.load_metadata(results_path)
+        blank_pages = [page for page in metadata.get("blank_page_numbers", []) if page not in replaced]
+        blank_pages += [page for page in part.get("blank_page_numbers", []) if page in replaced]
+        results_store.update_metadata(results_path, {
+            "blank_page_numbers": sorted(blank_pages),
+            "blank_pages_skipped": len(blank_pages),
+            "reocr_history": metadata.get("reocr_history", []) + [dict(reocr_info, pages=replaced)]
+        })
+
+        if index_path:
+            fulltext_index.index_pages(index_path, results_path, replaced)
+        if group_matchers is not None:
+            page_bitsets.update_stored_page_bitsets(results_path, results_store.load_results(results_path),
+                                                    replaced, group_matchers)
+        if images_folder:
+            from word_highlighter import clear_highlight_cache
+            clear_highlight_cache(result_id, replaced, images_folder)
+
+    if os.path.exists(part_path):
+        os.remove(part_path)
+    return replaced, failed
+
+
+def reocr_pages(results_path: str, pdf_path: str, result_id: str, page_numbers: List[int], dpi: int = 300,
+                ocr_profile: str = "default", images_folder: Optional[str] = None,
+                progress_callback: Optional[Callable] = None, index_path: Optional[str] = None,
+                group_matchers: Optional[Dict[str, Dict[str, Any]]] = None, run_id: Optional[str] = None,
+                **options) -> Optional[Tuple[List[int], List[int]]]:
+    """
+    Run OCR again on some pages of a stored result and merge them into it.
+
+    The stored result, and its page images, are only changed once all pages
+    are read, so they stay usable (and unchanged if the re-OCR fails) while
+    the pages are processed. Blank page detection is off: the pages were
+    chosen to be read, and one wrongly taken for blank would be skipped again.
+
+    Args:
+        results_path: Path of the stored result
+        pdf_path: The result's PDF (see keep_source_pdf)
+        result_id: Result id the app serves the pages' images under
+        page_numbers: Pages to re-OCR (see validate_request)
+        dpi: DPI to render the pages at
+        ocr_profile: Tesseract settings for the pages (see pdf_ocr_processor.OCR_PROFILES)
+        images_folder: Base images folder; the new page images replace those in its result_id folder
+        progress_callback: Optional progress callback, as for process_pdf
+        index_path: Full-text index to refresh (None skips it)
+        group_matchers: Compiled matchers of the configured word groups (None skips the bitsets)
+        run_id: Name of the re-OCR's staging folder (see reocr_staging_folder; random by default)
+        **options: Further keyword arguments for process_pdf (pages in flight, memory budget, ...)
+
+    Returns:
+        Tuple of (page numbers that were replaced, page numbers that failed and were kept),
+        or None if the PDF could not be processed
+    """
+    from pdf_ocr_processor import process_pdf
+
+    part_path = reocr_part_path(results_path)
+    staging_folder = None
+    if images_folder:
+        staging_folder = reocr_staging_folder(images_folder, result_id, run_id or uuid.uuid4().hex[:8])
+    try:
+        success = process_pdf(pdf_path, part_path, page_numbers, dpi=dpi, image_output_dir=staging_folder,
+                              progress_callback=progress_callback, ocr_profile=ocr_profile,
+                              detect_blank_pages=False, **options)
+        if not success:
+            return None
+        return merge_reocr_results(results_path, part_path, result_id, dpi, ocr_profile, index_path=index_path,
+                                   group_matchers=group_matchers, images_folder=images_folder,
+                                   staging_folder=staging_folder)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        if staging_folder and os.path.isdir(staging_folder):
+            shutil.rmtree(staging_folder)
+
+
+def main() -> None:
+    """Command line interface for re-OCRing pages of a stored result."""
+    from search_words_registry import SearchWordRegistry
+    from ocr_logging import setup_logging
+    from pdf_ocr_processor import OCR_PROFILES
+
+    parser = argparse.ArgumentParser(description='Re-OCR some pages of a processed PDF and merge them into its results')
+    parser.add_argument('result_id', help='Result id of the processed PDF')
+    parser.add_argument('--pages', required=True, help="Pages to re-OCR, e.g. '3,7-9'")
+    parser.add_argument('--dpi', type=int, default=300, help='DPI to render the pages at (default: 300)')
+    parser.add_argument('--ocr-profile', choices=OCR_PROFILES, default='default',
+                        help='Tesseract settings for the pages (default: default)')
+    parser.add_argument('--results-folder', default=os.path.join(BASE_DIR, 'results'),
+                        help='Folder of the stored results (default: results)')
+    parser.add_argument('--images-folder', default=os.path.join(BASE_DIR, 'temp_images'),
+                        help='Folder of the page images (default: temp_images)')
+    parser.add_argument('--pdf-path', help='PDF of the result (default: the one kept in results/source_pdfs)')
+    args = parser.parse_args()
+
+    setup_logging(name='pdf_ocr_processor')
+
+    results_path = find_results_path(args.results_folder, args.result_id)
+    if results_path is None:
+        print(f"No results found for {args.result_id} in {args.results_folder}", file=sys.stderr)
+        sys.exit(1)
+
+    pdf_path = args.pdf_path or source_pdf_path(os.path.join(args.results_folder, 'source_pdfs'), args.result_id)
+    if not os.path.exists(pdf_path):
+        print(f"PDF not found: {pdf_path} (pass it with --pdf-path)", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        page_numbers, dpi, ocr_profile = validate_request(results_path, args.pages, args.dpi, args.ocr_profile)
+    except ValueError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    registry = SearchWordRegistry(os.path.join(BASE_DIR, 'search_words.json'),
+                                  os.path.join(BASE_DIR, 'search_words.template.json'))
+    outcome = reocr_pages(results_path, pdf_path, args.result_id, page_numbers, dpi=dpi, ocr_profile=ocr_profile,
+                          images_folder=args.images_folder,
+                          index_path=os.path.join(args.results_folder, fulltext_index.DEFAULT_INDEX_FILENAME),
+                          group_matchers=registry.group_matchers())
+    if outcome is None:
+        print(f"Re-OCR of pages {args.pages} failed", file=sys.stderr)
+        sys.exit(1)
+    replaced, failed = outcome
+    if replaced:
+        print(f"Re-OCRed pages {', '.join(map(str, replaced))} of {os.path.basename(results_path)} "
+              f"at {dpi} DPI ({ocr_profile} profile)")
+    if failed:
+        print(f"Pages {', '.join(map(str, failed))} could not be read again and were kept as they were",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
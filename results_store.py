@@ -0,0 +1,691 @@
+import os
+import sys
+import json
+import glob
+import sqlite3
+import argparse
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+# File extensions of the two supported result formats
+JSON_SUFFIX = ".json"
+SQLITE_SUFFIX = ".sqlite"
+
+# Journal modes results databases can be opened in (see set_journal_mode)
+JOURNAL_MODES = ("WAL", "DELETE")
+_journal_mode = "WAL"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    page_number INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL DEFAULT '',
+    has_annotations INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS word_boxes (
+    page_number INTEGER NOT NULL,
+    lang TEXT NOT NULL,
+    boxes TEXT NOT NULL,
+    PRIMARY KEY (page_number, lang)
+);
+"""
+
+# Page fields stored in their own columns rather than in the JSON blob
+PAGE_COLUMNS = ("page_number", "text", "has_annotations")
+
+# Document field set while only the highlighted text of the pages is stored
+FULL_OCR_PENDING_KEY = "full_ocr_pending"
+
+
+def is_sqlite_path(path: str) -> bool:
+    """Check whether a results path refers to the SQLite backend."""
+    return path.lower().endswith(SQLITE_SUFFIX)
+
+
+def resolve_results_path(path: str) -> str:
+    """
+    Find the stored results for a path, whichever format they were saved in.
+
+    Results migrated from JSON to SQLite (or exported back) keep the same
+    base name, so a '.json' path falls back to its '.sqlite' sibling and the
+    other way around.
+
+    Args:
+        path: Path to a results file in either format
+
+    Returns:
+        The existing path, or the given path if neither format exists
+    """
+    if os.path.exists(path):
+        return path
+
+    base, ext = os.path.splitext(path)
+    for candidate_ext in (SQLITE_SUFFIX, JSON_SUFFIX):
+        if candidate_ext != ext.lower() and os.path.exists(base + candidate_ext):
+            return base + candidate_ext
+
+    return path
+
+
+def searchable_text(page: Dict[str, Any]) -> str:
+    """
+    Get the text a page is searched by.
+
+    This is the page's OCR text, or the text of its highlights
+    ('highlighted_text') while full-page OCR has not reached the page yet.
+    """
+    return page.get("text", "") or page.get("highlighted_text", "") or ""
+
+
+def set_journal_mode(mode: str) -> None:
+    """
+    Set the journal mode this process opens results databases in.
+
+    WAL (the default) lets the web app read pages while a processing thread
+    is still writing them, but its shared-memory index only works between
+    processes on one machine. Stores on storage shared with queue workers
+    are opened in rollback-journal mode ('DELETE') instead, like the task
+    queue; readers then wait for a batch of pages to be committed.
+
+    Raises:
+        ValueError: If the mode is not one of JOURNAL_MODES
+    """
+    global _journal_mode
+    if mode.upper() not in JOURNAL_MODES:
+        raise ValueError(f"Unknown journal mode: {mode}. Use one of: {', '.join(JOURNAL_MODES)}")
+    _journal_mode = mode.upper()
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """
+    Open a results database in the journal mode set by set_journal_mode, creating the schema if needed.
+
+    A database in the other mode is switched to it once no other connection
+    has it open; until then it is used in the mode it is in.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute(f"PRAGMA journal_mode={_journal_mode}")
+    except sqlite3.OperationalError:
+        # Leaving WAL needs the database to itself; a reader still has it open
+        pass
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _page_to_row(page: Dict[str, Any], position: int) -> tuple:
+    """Split a page dictionary into column values and the JSON data blob."""
+    data = {key: value for key, value in page.items() if key not in PAGE_COLUMNS}
+    return (
+        page.get("page_number"),
+        position,
+        page.get("text", "") or "",
+        1 if page.get("has_annotations", False) else 0,
+        json.dumps(data, ensure_ascii=False)
+    )
+
+
+def _row_to_page(row: tuple) -> Dict[str, Any]:
+    """Rebuild a page dictionary from a (page_number, text, has_annotations, data) row."""
+    page_number, text, has_annotations, data = row
+    page = {"page_number": page_number, "has_annotations": bool(has_annotations)}
+    page.update(json.loads(data))
+    page["text"] = text
+    return page
+
+
+def _write_pages(conn: sqlite3.Connection, pages: Iterable[Dict[str, Any]], start_position: int = 0) -> None:
+    """Insert or replace whole pages."""
+    conn.executemany(
+        "INSERT OR REPLACE INTO pages (page_number, position, text, has_annotations, data) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (_page_to_row(page, start_position + i) for i, page in enumerate(pages))
+    )
+
+
+def _write_metadata(conn: sqlite3.Connection, metadata: Dict[str, Any]) -> None:
+    """Insert or replace document-level metadata values."""
+    conn.executemany(
+        "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
+        ((key, json.dumps(value, ensure_ascii=False)) for key, value in metadata.items())
+    )
+
+
+def save_results_sqlite(results: Dict[str, Any], db_path: str) -> None:
+    """
+    Write a complete results document to a SQLite file, replacing its contents.
+
+    Args:
+        results: Document results as produced by process_pdf
+        db_path: Path of the SQLite file
+    """
+    with closing(connect(db_path)) as conn:
+        with conn:
+            conn.execute("DELETE FROM metadata")
+            conn.execute("DELETE FROM pages")
+            conn.execute("DELETE FROM word_boxes")
+            _write_metadata(conn, {key: value for key, value in results.items() if key != "pages"})
+            _write_pages(conn, results.get("pages", []))
+
+
+def load_results_sqlite(db_path: str) -> Dict[str, Any]:
+    """
+    Load a complete results document from a SQLite file.
+
+    Args:
+        db_path: Path of the SQLite file
+
+    Returns:
+        Dictionary in the same layout as the JSON results
+    """
+    with closing(connect(db_path)) as conn:
+        results = load_metadata_from(conn)
+        results["pages"] = [
+            _row_to_page(row) for row in conn.execute(
+                "SELECT page_number, text, has_annotations, data FROM pages ORDER BY position"
+            )
+        ]
+    return results
+
+
+def load_metadata_from(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Read the document-level metadata from an open results database."""
+    return {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM metadata")}
+
+
+def save_results(results: Dict[str, Any], path: str) -> bool:
+    """
+    Save results in the format implied by the path's extension.
+
+    Args:
+        results: Document results as produced by process_pdf
+        path: '.sqlite' for the SQLite backend, anything else for JSON
+
+    Returns:
+        True if the results were saved, False otherwise
+    """
+    try:
+        if is_sqlite_path(path):
+            save_results_sqlite(results, path)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        return True
+    except Exception as e:
+        print(f"Error saving results to '{path}': {str(e)}", file=sys.stderr)
+        return False
+
+
+class ResultsWriter:
+    """
+    Write a results document page by page while it is being processed.
+
+    With the SQLite backend, pages are written in batches of flush_every
+    pages as they finish, so a job does not keep every page in memory; the
+    document-level fields are written when the writer is closed. JSON files
+    can only be written whole, so their pages are kept until then.
+    """
+
+    def __init__(self, path: str, flush_every: int = 25):
+        """
+        Start a results document, replacing any previous contents.
+
+        Args:
+            path: '.sqlite' for the SQLite backend, anything else for JSON
+            flush_every: Pages buffered before they are written
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.pages_written = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._conn = None
+        if is_sqlite_path(path):
+            self._conn = connect(path)
+            with self._conn:
+                self._conn.execute("DELETE FROM metadata")
+                self._conn.execute("DELETE FROM pages")
+                self._conn.execute("DELETE FROM word_boxes")
+
+    def write_preview(self, pages: List[Tuple[int, Dict[str, Any]]], metadata: Dict[str, Any]) -> None:
+        """
+        Write early versions of some pages before the document is processed (SQLite only).
+
+        Readers see the pages, and the document fields marked with
+        FULL_OCR_PENDING_KEY, right away; add_page replaces each of them with
+        its full result later. JSON files are only written when the writer
+        is closed, so there this does nothing.
+
+        Args:
+            pages: (position, page) pairs, position being the page's index in the document results
+            metadata: Document fields known so far
+        """
+        if self._conn is None:
+            return
+        with self._conn:
+            for position, page in pages:
+                _write_pages(self._conn, [page], start_position=position)
+            _write_metadata(self._conn, dict(metadata, **{FULL_OCR_PENDING_KEY: True}))
+
+    def add_page(self, page: Dict[str, Any]) -> None:
+        """Add the next page of the document."""
+        self._pending.append(page)
+        if self._conn is not None and len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered pages (SQLite only)."""
+        if self._conn is None or not self._pending:
+            return
+        with self._conn:
+            _write_pages(self._conn, self._pending, start_position=self.pages_written)
+        self.pages_written += len(self._pending)
+        self._pending = []
+
+    def close(self, metadata: Dict[str, Any]) -> bool:
+        """
+        Write the remaining pages and the document-level fields.
+
+        Args:
+            metadata: Document fields (everything except 'pages')
+
+        Returns:
+            True if the results were saved, False otherwise
+        """
+        if self._conn is None:
+            return save_results(dict(metadata, pages=self._pending), self.path)
+        try:
+            self.flush()
+            with self._conn:
+                self._conn.execute("DELETE FROM metadata WHERE key = ?", (FULL_OCR_PENDING_KEY,))
+                _write_metadata(self._conn, metadata)
+            return True
+        except Exception as e:
+            print(f"Error saving results to '{self.path}': {str(e)}", file=sys.stderr)
+            return False
+        finally:
+            self._conn.close()
+            self._conn = None
+
+    def abort(self) -> None:
+        """Discard the document, e.g. after the job failed."""
+        self._pending = []
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            for suffix in ("", "-journal", "-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """
+    Load a complete results document from either backend.
+
+    Args:
+        path: Path to a results file ('.sqlite' or '.json')
+
+    Returns:
+        Dictionary containing the OCR results
+
+    Raises:
+        FileNotFoundError: If no results exist for the path
+    """
+    path = resolve_results_path(path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Results not found: {path}")
+
+    if is_sqlite_path(path):
+        return load_results_sqlite(path)
+
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def file_signature(path: str) -> Tuple:
+    """
+    Get a signature that changes whenever a results file is written.
+
+    For SQLite stores the write-ahead log is included, since writes land
+    there before the main file changes.
+
+    Args:
+        path: Path to a results file
+
+    Returns:
+        Tuple of (mtime_ns, size) pairs for the file and its WAL
+    """
+    signature = []
+    for file_path in (path, path + "-wal") if is_sqlite_path(path) else (path,):
+        try:
+            stat = os.stat(file_path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class ResultsCache:
+    """
+    Small LRU cache of loaded results documents.
+
+    Entries are validated against the file signature on every lookup, so a
+    document updated on disk is reloaded. Cached documents are shared between
+    callers and must not be modified.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Tuple, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        Load a results document through the cache.
+
+        Args:
+            path: Path to a results file ('.sqlite' or '.json')
+
+        Returns:
+            Tuple of (results, cache_hit)
+        """
+        path = resolve_results_path(path)
+        signature = file_signature(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                return entry[1], True
+
+        results = load_results(path)
+
+        with self._lock:
+            self._entries[path] = (signature, results)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return results, False
+
+    def clear(self) -> None:
+        """Drop all cached documents."""
+        with self._lock:
+            self._entries.clear()
+
+
+def load_metadata(path: str) -> Dict[str, Any]:
+    """
+    Load only the document-level fields (everything except 'pages').
+
+    Args:
+        path: Path to a results file ('.sqlite' or '.json')
+
+    Returns:
+        Dictionary of document metadata
+    """
+    path = resolve_results_path(path)
+    if is_sqlite_path(path):
+        with closing(connect(path)) as conn:
+            return load_metadata_from(conn)
+
+    results = load_results(path)
+    results.pop("pages", None)
+    return results
+
+
+def load_page(path: str, page_number: int) -> Optional[Dict[str, Any]]:
+    """
+    Load a single page without reading the rest of the document.
+
+    Args:
+        path: Path to a results file ('.sqlite' or '.json')
+        page_number: Page number to load (1-based)
+
+    Returns:
+        The page dictionary, or None if the page was not processed
+    """
+    path = resolve_results_path(path)
+    if is_sqlite_path(path):
+        with closing(connect(path)) as conn:
+            row = conn.execute(
+                "SELECT page_number, text, has_annotations, data FROM pages WHERE page_number = ?",
+                (page_number,)
+            ).fetchone()
+        return _row_to_page(row) if row else None
+
+    for page in load_results(path).get("pages", []):
+        if page.get("page_number") == page_number:
+            return page
+    return None
+
+
+def update_pages(path: str, page_updates: List[Dict[str, Any]]) -> None:
+    """
+    Merge field updates into existing pages, keyed by 'page_number'.
+
+    With the SQLite backend only the affected rows are rewritten; JSON files
+    are read and written as a whole.
+
+    Args:
+        path: Path to a results file ('.sqlite' or '.json')
+        page_updates: Dictionaries with 'page_number' plus the fields to set
+    """
+    path = resolve_results_path(path)
+    updates_by_page = {update["page_number"]: update for update in page_updates}
+
+    if not is_sqlite_path(path):
+        results = load_results(path)
+        for page in results.get("pages", []):
+            page.update(updates_by_page.get(page.get("page_number"), {}))
+        save_results(results, path)
+        return
+
+    with closing(connect(path)) as conn:
+        with conn:
+            for page_number, update in updates_by_page.items():
+                row = conn.execute(
+                    "SELECT page_number, text, has_annotations, data, position FROM pages WHERE page_number = ?",
+                    (page_number,)
+                ).fetchone()
+                if row is None:
+                    continue
+                page = _row_to_page(row[:4])
+                page.update(update)
+                _write_pages(conn, [page], start_position=row[4])
+
+
+def replace_pages(path: str, pages: List[Dict[str, Any]]) -> List[int]:
+    """
+    Replace whole pages, keyed by 'page_number', e.g. with the results of re-OCRing them.
+
+    Unlike update_pages, fields of the old page that the new one lacks are
+    dropped, and so are the word boxes stored for the replaced pages, since
+    they were extracted from the old page images. Pages keep their position
+    in the document; pages not in the document are ignored.
+
+    Args:
+        path: Path to a results file ('.sqlite' or '.json')
+        pages: Complete page dictionaries
+
+    Returns:
+        Page numbers that were replaced
+    """
+    path = resolve_results_path(path)
+    pages_by_number = {page["page_number"]: page for page in pages}
+
+    if not is_sqlite_path(path):
+        results = load_results(path)
+        stored_pages = results.get("pages", [])
+        replaced = []
+        for i, page in enumerate(stored_pages):
+            if page.get("page_number") in pages_by_number:
+                stored_pages[i] = pages_by_number[page["page_number"]]
+                replaced.append(page["page_number"])
+        save_results(results, path)
+        return replaced
+
+    replaced = []
+    with closing(connect(path)) as conn:
+        with conn:
+            for page_number, page in pages_by_number.items():
+                row = conn.execute("SELECT position FROM pages WHERE page_number = ?", (page_number,)).fetchone()
+                if row is None:
+                    continue
+                _write_pages(conn, [page], start_position=row[0])
+                conn.execute("DELETE FROM word_boxes WHERE page_number = ?", (page_number,))
+                replaced.append(page_number)
+    return replaced
+
+
+def update_metadata(path: str, metadata: Dict[str, Any]) -> None:
+    """
+    Set document-level fields without touching the pages.
+
+    Args:
+        path: Path to a results file ('.sqlite' or '.json')
+        metadata: Fields to set
+    """
+    path = resolve_results_path(path)
+    if not is_sqlite_path(path):
+        results = load_results(path)
+        results.update(metadata)
+        save_results(results, path)
+        return
+
+    with closing(connect(path)) as conn:
+        with conn:
+            _write_metadata(conn, metadata)
+
+
+def save_word_boxes(path: str, page_number: int, boxes: List[Dict[str, Any]], lang: str = 'heb+eng') -> None:
+    """
+    Store the word bounding boxes extracted for a page.
+
+    Word boxes are only kept by the SQLite backend; for JSON results this
+    is a no-op.
+
+    Args:
+        path: Path to a results file
+        page_number: Page number the boxes belong to
+        boxes: Word data as returned by word_highlighter.extract_word_bounding_boxes
+        lang: OCR language setting the boxes were extracted with
+    """
+    path = resolve_results_path(path)
+    if not is_sqlite_path(path) or not os.path.exists(path):
+        return
+
+    with closing(connect(path)) as conn:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO word_boxes (page_number, lang, boxes) VALUES (?, ?, ?)",
+                (page_number, lang, json.dumps(boxes, ensure_ascii=False))
+            )
+
+
+def load_word_boxes(path: str, page_number: int, lang: str = 'heb+eng') -> Optional[List[Dict[str, Any]]]:
+    """
+    Load previously stored word bounding boxes for a page.
+
+    Args:
+        path: Path to a results file
+        page_number: Page number to load boxes for
+        lang: OCR language setting the boxes were extracted with
+
+    Returns:
+        List of word data, or None if no boxes are stored
+    """
+    path = resolve_results_path(path)
+    if not is_sqlite_path(path) or not os.path.exists(path):
+        return None
+
+    with closing(connect(path)) as conn:
+        row = conn.execute(
+            "SELECT boxes FROM word_boxes WHERE page_number = ? AND lang = ?",
+            (page_number, lang)
+        ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def export_json(db_path: str, json_path: str) -> bool:
+    """Export a SQLite results file to the JSON format."""
+    return save_results(load_results_sqlite(db_path), json_path)
+
+
+def import_json(json_path: str, db_path: str) -> bool:
+    """Import a JSON results file into the SQLite format."""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        results = json.load(f)
+    return save_results(results, db_path)
+
+
+def migrate_results_folder(results_folder: str, delete_json: bool = False) -> int:
+    """
+    Convert every '*_ocr_results.json' file in a folder to SQLite.
+
+    Files that already have a SQLite sibling are skipped.
+
+    Args:
+        results_folder: Folder containing the JSON results
+        delete_json: Remove each JSON file after a successful conversion
+
+    Returns:
+        Number of files converted
+    """
+    converted = 0
+    for json_path in sorted(glob.glob(os.path.join(results_folder, "*_ocr_results.json"))):
+        db_path = os.path.splitext(json_path)[0] + SQLITE_SUFFIX
+        if os.path.exists(db_path):
+            print(f"Skipping {json_path}: {os.path.basename(db_path)} already exists")
+            continue
+
+        try:
+            if import_json(json_path, db_path):
+                converted += 1
+                print(f"Converted {json_path} -> {db_path}")
+                if delete_json:
+                    os.remove(json_path)
+        except Exception as e:
+            print(f"Error converting {json_path}: {str(e)}", file=sys.stderr)
+            if os.path.exists(db_path):
+                os.remove(db_path)
+
+    return converted
+
+
+def main() -> None:
+    """Command line interface for migrating and converting stored results."""
+    parser = argparse.ArgumentParser(description='Manage stored OCR results')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help='Convert all JSON results in a folder to SQLite')
+    migrate_parser.add_argument('results_folder', nargs='?', default='results', help='Results folder (default: results)')
+    migrate_parser.add_argument('--delete-json', action='store_true', help='Remove JSON files after conversion')
+
+    export_parser = subparsers.add_parser('export', help='Export a SQLite results file to JSON')
+    export_parser.add_argument('db_path', help='Path to the SQLite results file')
+    export_parser.add_argument('json_path', help='Path of the JSON file to write')
+
+    import_parser = subparsers.add_parser('import', help='Import a JSON results file into SQLite')
+    import_parser.add_argument('json_path', help='Path to the JSON results file')
+    import_parser.add_argument('db_path', help='Path of the SQLite file to write')
+
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        converted = migrate_results_folder(args.results_folder, args.delete_json)
+        print(f"Converted {converted} results file(s).")
+    elif args.command == 'export':
+        sys.exit(0 if export_json(args.db_path, args.json_path) else 1)
+    elif args.command == 'import':
+        sys.exit(0 if import_json(args.json_path, args.db_path) else 1)
+
+
+if __name__ == "__main__":
+    main()
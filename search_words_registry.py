@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from ocr_results_searcher import compile_search_words, merge_compiled_search_words
+
+# Seconds between checks of the configuration files for changes
+CHECK_INTERVAL = 1.0
+
+# Combined matchers of group selections kept per configuration
+MAX_CACHED_SELECTIONS = 32
+
+# Used when neither the user file nor the template can be read
+DEFAULT_WORD_GROUPS = [
+    {"word": "גב", "representative_group": ["גב"]},
+    {"word": "יד", "representative_group": ["יד"]}
+]
+
+
+def group_id(word: str) -> str:
+    """Stable id of a search word group, derived from its word so it survives reloads."""
+    return hashlib.sha1(word.encode('utf-8')).hexdigest()[:12]
+
+
+def words_digest(words) -> str:
+    """Digest of a group's words, which changes whenever the group is edited."""
+    return hashlib.sha1(json.dumps(sorted(words), ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def _compile_group(words) -> Dict[str, Any]:
+    """Compiled matcher of a group, with the digest of its words."""
+    return dict(compile_search_words(words), digest=words_digest(words))
+
+
+class SearchWordRegistry:
+    """
+    Search word groups loaded from search_words.json, reloaded when the file changes.
+
+    The groups are read once and each group's matcher is compiled once
+    (whole-word patterns and stem terms, see compile_search_words). The files
+    are checked at most every CHECK_INTERVAL seconds; a changed modification
+    time or size reloads them. The user file takes precedence over the
+    template, as before.
+    """
+
+    def __init__(self, user_path: str, template_path: str, check_interval: float = CHECK_INTERVAL):
+        """
+        Create a registry.
+
+        Args:
+            user_path: Path of the user's search words file (search_words.json)
+            template_path: Path of the template used when the user file is missing or invalid
+            check_interval: Seconds between checks of the files for changes
+        """
+        self.user_path = user_path
+        self.template_path = template_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature = None
+        self._last_check = 0.0
+        self._groups: List[Dict[str, Any]] = []
+        self._compiled: Dict[str, Dict[str, Any]] = {}
+        self._selections: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+
+    def _file_signature(self) -> Tuple:
+        """Modification time and size of both files (None for missing files)."""
+        signature = []
+        for path in (self.user_path, self.template_path):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _read_groups(self) -> List[Dict[str, Any]]:
+        """Read the word groups, with fallback to the template and then to the defaults."""
+        # Try to load user-specific file first
+        if os.path.exists(self.user_path):
+            try:
+                with open(self.user_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Error loading user search words: {str(e)}")
+
+        # Fall back to template file
+        try:
+            with open(self.template_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading template search words: {str(e)}")
+            return DEFAULT_WORD_GROUPS
+
+    def _refresh(self) -> None:
+        """Reload and recompile the groups if the files changed since the last load."""
+        now = time.monotonic()
+        if self._signature is not None and now - self._last_check < self.check_interval:
+            return
+
+        with self._lock:
+            self._last_check = now
+            signature = self._file_signature()
+            if signature == self._signature:
+                return
+
+            groups = []
+            compiled = {}
+            for group in self._read_groups():
+                words = set(group.get('representative_group') or [group['word']])
+                gid = group_id(group['word'])
+                if gid in compiled:
+                    # The same word configured twice: merge its variants into the first group
+                    words |= compiled[gid]['words']
+                else:
+                    groups.append(dict(group, id=gid))
+                compiled[gid] = _compile_group(words)
+
+            self._groups = groups
+            self._compiled = compiled
+            self._selections = {}
+            self._signature = signature
+
+    def groups(self) -> List[Dict[str, Any]]:
+        """
+        Get the configured word groups.
+
+        Returns:
+            List of groups as configured ('word', 'representative_group'), each with its 'id'
+        """
+        self._refresh()
+        return self._groups
+
+    def group_matchers(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the compiled matcher of every configured group.
+
+        Returns:
+            Dictionary of group id -> compiled search words (see compile_search_words),
+            each with the 'digest' of the group's words
+        """
+        self._refresh()
+        return self._compiled
+
+    def compiled(self, group_ids: List[str]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        """
+        Get the combined compiled matcher of some groups.
+
+        Args:
+            group_ids: Ids of the selected groups
+
+        Returns:
+            Tuple of (compiled search words of the known groups, or None if there
+            are none, and the ids that are not configured)
+        """
+        self._refresh()
+        compiled = self._compiled
+        selections = self._selections
+        known = tuple(sorted({gid for gid in group_ids if gid in compiled}))
+        unknown = [gid for gid in group_ids if gid not in compiled]
+        if not known:
+            return None, unknown
+        if len(known) == 1:
+            return compiled[known[0]], unknown
+
+        # The UI usually sends the same selection again, so merged matchers are kept
+        merged = selections.get(known)
+        if merged is None:
+            merged = merge_compiled_search_words([compiled[gid] for gid in known])
+            if len(selections) >= MAX_CACHED_SELECTIONS:
+                selections.clear()
+            selections[known] = merged
+        return merged, unknown
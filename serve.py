@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Production server for the app.
+
+`python app.py` runs Flask's development server with one OS thread per
+request, so large page image downloads, long /publish-notes conversions
+and the Socket.IO connection of every open viewer each hold a thread.
+In the default eventlet mode they are greenlets of a cooperative event
+loop instead; OCR runs in worker.py processes on the task queue and the
+remaining CPU-bound work (page highlighting, DOCX conversion, indexing)
+in eventlet's thread pool (see offload.run_blocking):
+
+    python serve.py                          # eventlet, one local OCR worker
+    python serve.py --ocr-workers 0          # OCR workers run on other machines
+    python serve.py --mode threading         # threaded server, for comparison
+"""
+
+import os
+import sys
+import signal
+import argparse
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Async backends of the web and Socket.IO layer
+SERVER_MODES = ('eventlet', 'threading')
+
+
+def start_ocr_workers(count, queue_folder, log_file=None):
+    """
+    Start local worker.py processes on the app's task queue.
+
+    Returns:
+        List of the worker processes
+    """
+    command = [sys.executable, os.path.join(BASE_DIR, 'worker.py'), '--queue-folder', queue_folder]
+    if log_file:
+        command += ['--log-file', log_file]
+    return [subprocess.Popen(command) for _ in range(count)]
+
+
+def stop_ocr_workers(workers):
+    """Stop worker processes; interrupted workers give their tasks back to the queue."""
+    for process in workers:
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)
+    for process in workers:
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run_server(mode='eventlet', host='0.0.0.0', port=5001, config=None, ocr_workers=1):
+    """
+    Create the app and serve it until interrupted.
+
+    Args:
+        mode: 'eventlet' or 'threading'
+        host: Interface to listen on
+        port: Port to listen on
+        config: Optional dictionary of config values passed to create_app
+        ocr_workers: Local worker.py processes to start when OCR is queued
+    """
+    if mode not in SERVER_MODES:
+        raise ValueError(f"Unknown server mode: {mode}. Use one of: {', '.join(SERVER_MODES)}")
+    if mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+
+    # Imported after the monkey patching, so the app's threads, locks and sockets are green
+    import app as mca_app
+    import fulltext_index
+
+    config = dict(config or {})
+    config['ASYNC_MODE'] = mode
+    config.setdefault('SERVER_NAME', None)  # Answer on whatever host name the viewers use
+    app = mca_app.create_app(config)
+    mca_app.ensure_user_search_words_file()
+    # Pick up results added or removed while the app was not running
+    fulltext_index.update_index(app.config['FULLTEXT_INDEX_PATH'], app.config['RESULTS_FOLDER'])
+
+    workers = []
+    if app.config['OCR_BACKEND'] == 'queue' and ocr_workers > 0:
+        workers = start_ocr_workers(ocr_workers, app.config['OCR_QUEUE_FOLDER'], app.config['LOG_FILE'])
+
+    print(f"Serving on http://{host}:{port} ({mode} mode, OCR backend: {app.config['OCR_BACKEND']}, "
+          f"{len(workers)} local OCR workers)")
+    try:
+        if mode == 'eventlet':
+            mca_app.socketio.run(app, host=host, port=port, log_output=False)
+        else:
+            mca_app.socketio.run(app, host=host, port=port, allow_unsafe_werkzeug=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_ocr_workers(workers)
+
+
+def main():
+    """Command line interface of the production server."""
+    parser = argparse.ArgumentParser(description='Serve the PDF OCR and Analysis Tool')
+    parser.add_argument('--mode', choices=SERVER_MODES, default='eventlet',
+                        help='Async backend of the web and Socket.IO layer (default: eventlet)')
+    parser.add_argument('--host', default='0.0.0.0', help='Interface to listen on (default: 0.0.0.0)')
+    parser.add_argument('--port', type=int, default=5001, help='Port to listen on (default: 5001)')
+    parser.add_argument('--ocr-workers', type=int, default=1,
+                        help='Local OCR worker processes to start when jobs are queued (default: 1)')
+    args = parser.parse_args()
+
+    run_server(args.mode, args.host, args.port, ocr_workers=args.ocr_workers)
+
+
+if __name__ == '__main__':
+    main()
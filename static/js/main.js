@@ -27,6 +27,8 @@ $(document).ready(function() {
     });
     
     // Handle download JSON button
+    $('#reocrBlankPagesBtn').on('click', reocrBlankPages);
+    
     $('#downloadJsonBtn').on('click', function() {
         if (currentResultId && currentFilename) {
             window.location.href = `/download-json/${currentResultId}/${currentFilename}`;
@@ -192,8 +194,18 @@ function validatePageRange() {
     }
 }
 
+// Files larger than this are sent as resumable chunks (single requests are capped at 16 MB)
+const CHUNKED_UPLOAD_THRESHOLD = 15 * 1024 * 1024;
+
+// Attempts per chunk before giving up on an interrupted connection
+const CHUNK_RETRIES = 5;
+
+// Largest file hashed in the browser for the server-side checksum verification
+const MAX_HASHED_UPLOAD_SIZE = 1024 * 1024 * 1024;
+
 function uploadPDF() {
     const formData = new FormData($('#pdfUploadForm')[0]);
+    const file = $('#pdfFile')[0].files[0];
     
     // Display processing status
     $('#uploadButton').prop('disabled', true);
@@ -213,6 +225,12 @@ function uploadPDF() {
     // Reset results
     resetResults();
     
+    // Large files go through the resumable chunked upload
+    if (file && file.size > CHUNKED_UPLOAD_THRESHOLD) {
+        uploadPDFInChunks(file).then(handleUploadResponse).catch(handleUploadFailure);
+        return;
+    }
+    
     // Submit the form data
     $.ajax({
         url: '/upload-pdf',
@@ -220,35 +238,151 @@ function uploadPDF() {
         data: formData,
         processData: false,
         contentType: false,
-        success: function(response) {
-            if (response.success) {
-                // Store the result information
-                currentResultId = response.result_id;
-                currentFilename = response.original_filename;
-                
-                // Update the total pages count
-                $('#totalPages').text(`of ${response.total_pages} pages`);
-                
-                // Note: We don't need to call getOCRResults() immediately here,
-                // as we'll wait for the WebSocket to notify us when processing is complete
-            } else {
-                showError('Failed to process PDF: ' + (response.error || 'Unknown error'));
-                $('#processingStatus').addClass('d-none');
-                $('#uploadButton').prop('disabled', false);
-            }
-        },
+        success: handleUploadResponse,
         error: function(xhr) {
             let errorMsg = 'Failed to upload PDF';
             if (xhr.responseJSON && xhr.responseJSON.error) {
                 errorMsg += ': ' + xhr.responseJSON.error;
             }
-            showError(errorMsg);
-            $('#processingStatus').addClass('d-none');
-            $('#uploadButton').prop('disabled', false);
+            handleUploadFailure(new Error(errorMsg));
         }
     });
 }
 
+// Handle the server's answer once a PDF is uploaded and processing has started
+function handleUploadResponse(response) {
+    if (response.success) {
+        // Store the result information
+        currentResultId = response.result_id;
+        currentFilename = response.original_filename;
+        
+        // Update the total pages count
+        $('#totalPages').text(`of ${response.total_pages} pages`);
+        
+        // Note: We don't need to call getOCRResults() immediately here,
+        // as we'll wait for the WebSocket to notify us when processing is complete
+    } else {
+        handleUploadFailure(new Error('Failed to process PDF: ' + (response.error || 'Unknown error')));
+    }
+}
+
+function handleUploadFailure(error) {
+    showError(error.message || String(error));
+    $('#processingStatus').addClass('d-none');
+    $('#uploadButton').prop('disabled', false);
+}
+
+// Hex SHA-256 of a file, or null where the browser cannot compute it (non-HTTPS origins, huge files)
+async function computeFileSha256(file) {
+    if (!(window.crypto && window.crypto.subtle) || file.size > MAX_HASHED_UPLOAD_SIZE) {
+        return null;
+    }
+    const digest = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+// Parse a JSON response, turning HTTP errors into exceptions that carry the server's data
+async function parseUploadResponse(response) {
+    const data = await response.json().catch(() => ({}));
+    if (!response.ok) {
+        const error = new Error(data.error || `Upload failed (HTTP ${response.status})`);
+        error.status = response.status;
+        error.data = data;
+        throw error;
+    }
+    return data;
+}
+
+// Send a PDF in chunks, resuming an earlier interrupted upload of the same file
+async function uploadPDFInChunks(file) {
+    const resumeKey = `chunkedUpload:${file.name}:${file.size}:${file.lastModified}`;
+    
+    $('#statusMessage').text('Preparing upload...');
+    const sha256 = await computeFileSha256(file);
+    
+    // Resume from the server's state when this browser started the upload before
+    let upload = null;
+    const storedUploadId = localStorage.getItem(resumeKey);
+    if (storedUploadId) {
+        upload = await fetch(`/uploads/${storedUploadId}`).then(parseUploadResponse).catch(() => null);
+    }
+    if (!upload) {
+        upload = await fetch('/uploads', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({
+                filename: file.name,
+                size: file.size,
+                sha256: sha256,
+                startPage: parseInt($('#startPage').val()) || null,
+                endPage: parseInt($('#endPage').val()) || null
+            })
+        }).then(parseUploadResponse);
+    }
+    localStorage.setItem(resumeKey, upload.upload_id);
+    
+    let offset = upload.received_bytes;
+    let failures = 0;
+    while (offset < file.size) {
+        const percentage = Math.floor((offset / file.size) * 100);
+        $('#progressBar').css('width', percentage + '%').attr('aria-valuenow', percentage);
+        $('#progressPercentage').text(percentage + '%');
+        $('#statusMessage').text(`Uploading... ${formatBytes(offset)} of ${formatBytes(file.size)}`);
+        
+        try {
+            const chunk = file.slice(offset, offset + upload.chunk_size);
+            const result = await fetch(`/uploads/${upload.upload_id}?offset=${offset}`, {
+                method: 'PUT',
+                headers: {'Content-Type': 'application/octet-stream'},
+                body: chunk
+            }).then(parseUploadResponse);
+            offset = result.received_bytes;
+            failures = 0;
+        } catch (error) {
+            if (error.status === 409 && error.data && error.data.received_bytes !== undefined) {
+                // The server has a different amount of data than we assumed: continue from there
+                offset = error.data.received_bytes;
+                continue;
+            }
+            if (error.status && error.status < 500) {
+                throw error;
+            }
+            failures += 1;
+            if (failures > CHUNK_RETRIES) {
+                throw new Error('Upload interrupted. Select the same file and upload again to resume.');
+            }
+            $('#statusMessage').text('Connection problem, retrying...');
+            await new Promise(resolve => setTimeout(resolve, 1000 * Math.pow(2, failures - 1)));
+        }
+    }
+    
+    $('#statusMessage').text('Verifying upload...');
+    try {
+        const response = await fetch(`/uploads/${upload.upload_id}/complete`, {method: 'POST'})
+            .then(parseUploadResponse);
+        localStorage.removeItem(resumeKey);
+        $('#statusMessage').text('Processing PDF...');
+        return response;
+    } catch (error) {
+        if (error.status === 422 || error.status === 404) {
+            // Checksum mismatch: the server discarded the upload, start over next time
+            localStorage.removeItem(resumeKey);
+        }
+        throw error;
+    }
+}
+
+// Format a byte count as e.g. "12.5 MB"
+function formatBytes(bytes) {
+    if (bytes >= 1024 * 1024 * 1024) {
+        return (bytes / (1024 * 1024 * 1024)).toFixed(1) + ' GB';
+    }
+    if (bytes >= 1024 * 1024) {
+        return (bytes / (1024 * 1024)).toFixed(1) + ' MB';
+    }
+    return Math.round(bytes / 1024) + ' KB';
+}
+
 // Get OCR results for the processed PDF
 function getOCRResults() {
     if (!currentResultId || !currentFilename) {
@@ -264,7 +398,7 @@ function getOCRResults() {
             ocrResults = response;
             
             // Store result path for future use
-            currentResultPath = `results/${currentResultId}_${currentFilename.replace(/\.[^/.]+$/, '')}_ocr_results.json`;
+            currentResultPath = `results/${currentResultId}_${currentFilename.replace(/\.[^/.]+$/, '')}_ocr_results.sqlite`;
             
             // Enable search form and download button
             $('#searchForm').removeClass('d-none');
@@ -300,21 +434,11 @@ function searchAndFilterResults() {
     
     // Get selected words from the dropdown
     const selectedOptions = $('#searchWordsSelect option:selected');
-    const searchWords = [];
-    const searchWordGroups = [];
     
-    // Collect all selected words and their representative groups
-    selectedOptions.each(function() {
-        const word = $(this).val();
-        searchWords.push(word);
-        
-        // Get the representative group for this word
-        const representativeGroup = JSON.parse($(this).attr('data-representative-group'));
-        searchWordGroups.push(...representativeGroup);
-    });
-    
-    // Use Set to remove duplicates, then convert back to array
-    const uniqueSearchWords = [...new Set(searchWordGroups)];
+    // Send the ids of the selected word groups; the server expands them with its precompiled matchers
+    const groupIds = selectedOptions.map(function() {
+        return $(this).attr('data-group-id');
+    }).get();
     
     // Get filter type
     const filterType = $('input[name="filterType"]:checked').val();
@@ -322,8 +446,12 @@ function searchAndFilterResults() {
     // Prepare request data
     const requestData = {
         resultPath: currentResultPath,
-        searchWords: uniqueSearchWords,
-        filterType: filterType
+        resultId: currentResultId,
+        currentPage: currentPageNumber,
+        groupIds: groupIds,
+        filterType: filterType,
+        matchMode: $('#stemMatching').prop('checked') ? 'stem' : 'exact',
+        fuzzyDistance: parseInt($('#fuzzyDistance').val()) || 0
     };
     
     $.ajax({
@@ -391,6 +519,18 @@ function displayResults() {
         );
     }
     
+    // Pages skipped as blank are not in most filters; list them, so one that does hold text can be re-OCRed
+    const blankPages = (ocrResults && ocrResults.blank_page_numbers) || [];
+    if (blankPages.length > 0) {
+        $('#blankPagesText').text(
+            `${blankPages.length} pages were skipped as blank and not OCRed: ${blankPages.join(', ')}.`
+        );
+        $('#reocrBlankPagesBtn').prop('disabled', false).removeClass('d-none');
+        $('#blankPagesNotice').removeClass('d-none');
+    } else {
+        $('#blankPagesNotice').addClass('d-none');
+    }
+    
     // Clear existing page list
     $('#pageList').empty();
     
@@ -400,6 +540,9 @@ function displayResults() {
         const hasAnnotations = page.has_annotations;
         const containsSearchWords = page.contains_search_words;
         const matchedWords = page.matched_words || [];
+        const fuzzyMatches = page.fuzzy_matches || [];
+        // A page whose every matched word was found only approximately
+        const onlyFuzzy = containsSearchWords && fuzzyMatches.length === matchedWords.length;
         
         // Determine if this is a matching page
         const isMatchingPage = hasAnnotations || containsSearchWords;
@@ -433,7 +576,10 @@ function displayResults() {
                                 ''}
                             </span>` : 
                             ''}
-                        ${containsSearchWords ? '<span class="badge bg-success">Matched Words</span>' : ''}
+                        ${containsSearchWords ? (onlyFuzzy ?
+                            '<span class="badge bg-secondary" title="Matched with OCR error tolerance">Fuzzy Match</span>' :
+                            '<span class="badge bg-success">Matched Words</span>') : ''}
+                        ${page.blank ? '<span class="badge bg-light text-dark" title="Skipped as blank, not OCRed">Blank</span>' : ''}
                     </div>
                 </div>
             `);
@@ -525,6 +671,16 @@ function displayPageContent(pageNumber) {
     // Find the page in the appropriate array
     const page = pagesArray.find(p => p.page_number === pageNumber);
     
+    // Highlighted images around this page are pre-warmed first
+    if (filteredResults.search_information.prewarm_pages && currentResultId) {
+        $.ajax({
+            url: `/prewarm-highlights/${currentResultId}`,
+            type: 'POST',
+            contentType: 'application/json',
+            data: JSON.stringify({ currentPage: pageNumber })
+        });
+    }
+    
     if (page) {
         // Update page header
         $('#pageHeader').text(`Page ${pageNumber}`);
@@ -537,18 +693,26 @@ function displayPageContent(pageNumber) {
         if (page.contains_search_words) {
             badges += '<span class="badge bg-success ms-2">Matched Words</span>';
         }
+        if (page.blank) {
+            badges += '<span class="badge bg-light text-dark ms-2" title="Skipped as blank, not OCRed">Blank</span>';
+        }
         $('#pageHeader').append(badges);
         
-        // Display matched words if any
+        // Display matched words if any (fuzzy hits as "word (≈token, distance N)")
         if (page.matched_words && page.matched_words.length > 0) {
-            const matchedWordsStr = page.matched_words.join(', ');
+            const fuzzyMatches = page.fuzzy_matches || [];
+            const matchedWordsStr = page.matched_words.map(word => {
+                const fuzzy = fuzzyMatches.find(match => match.word === word);
+                return fuzzy ? `${word} (≈${fuzzy.token}, distance ${fuzzy.distance})` : word;
+            }).join(', ');
             $('#matchedWords').text(`Matched Words: ${matchedWordsStr}`).removeClass('d-none');
         } else {
             $('#matchedWords').addClass('d-none');
         }
         
-        // Prepare page content (text)
-        const pageText = page.text || 'No text content available for this page.';
+        // Prepare page content (text), or the highlighted text while the full page is still being read
+        const pageText = page.text || page.highlighted_text ||
+            (page.blank ? 'Blank page (not OCRed).' : 'No text content available for this page.');
         
         // Reset clean image state when navigating to a new page
         showingCleanImage = false;
@@ -676,8 +840,8 @@ function publishNotes() {
     $publishBtn.html('<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Exporting...');
     $publishBtn.prop('disabled', true);
     
-    // Use the server-side endpoint to generate and download the docx file
-    fetch('/publish-notes', {
+    // Export in a background job on the server, then download the finished document
+    fetch('/export-notes', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
@@ -688,27 +852,26 @@ function publishNotes() {
         if (!response.ok) {
             throw new Error('Failed to export notes to DOCX');
         }
-        return response.blob();
+        return response.json();
     })
-    .then(blob => {
-        // Create a timestamp for the filename
-        const timestamp = new Date().toISOString().replace(/[:.]/g, '-').substring(0, 19);
-        const downloadFilename = `notes_${currentFilename}_${timestamp}.docx`;
-        
-        // Create a download link and trigger download
-        const url = URL.createObjectURL(blob);
+    .then(job => waitForExport(job, percentage => {
+        $publishBtn.html(`<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Exporting... ${percentage}%`);
+    }))
+    .then(job => {
+        // Trigger the download of the exported file
         const downloadLink = document.createElement('a');
-        downloadLink.href = url;
-        downloadLink.download = downloadFilename;
+        downloadLink.href = job.download_url;
+        downloadLink.download = job.filename;
         document.body.appendChild(downloadLink);
         downloadLink.click();
         document.body.removeChild(downloadLink);
         
-        // Clean up
-        URL.revokeObjectURL(url);
-        
         // Show success message
-        alert('Notes exported to DOCX successfully!');
+        if (job.format === 'docx') {
+            alert('Notes exported to DOCX successfully!');
+        } else {
+            alert('DOCX export failed, the notes were downloaded as a text file instead.');
+        }
     })
     .catch(error => {
         console.error('Error publishing notes:', error);
@@ -721,6 +884,84 @@ function publishNotes() {
     });
 }
 
+// Re-OCR the pages skipped as blank; the progress panel follows the job and reloads the results when it is done
+function reocrBlankPages() {
+    const blankPages = (ocrResults && ocrResults.blank_page_numbers) || [];
+    if (!currentResultId || blankPages.length === 0) {
+        return;
+    }
+    
+    $('#reocrBlankPagesBtn').prop('disabled', true);
+    $.ajax({
+        url: `/reocr/${currentResultId}`,
+        type: 'POST',
+        contentType: 'application/json',
+        data: JSON.stringify({ pages: blankPages }),
+        success: function() {
+            $('#blankPagesText').text(`Re-OCRing pages ${blankPages.join(', ')}...`);
+            $('#reocrBlankPagesBtn').addClass('d-none');
+        },
+        error: function(xhr) {
+            let errorMsg = 'Failed to re-OCR the blank pages';
+            if (xhr.responseJSON && xhr.responseJSON.error) {
+                errorMsg += ': ' + xhr.responseJSON.error;
+            }
+            showError(errorMsg);
+            $('#reocrBlankPagesBtn').prop('disabled', false);
+        }
+    });
+}
+
+// Wait until a notes export job has finished, from export_update events or by polling its status
+function waitForExport(job, onProgress) {
+    return new Promise((resolve, reject) => {
+        let pollTimer = null;
+        let finished = false;
+        
+        function handleUpdate(update) {
+            if (finished || update.job_id !== job.job_id) {
+                return;
+            }
+            const state = update.data;
+            if (state.status === 'completed' || state.status === 'error') {
+                finished = true;
+                if (socket) {
+                    socket.off('export_update', handleUpdate);
+                }
+                clearTimeout(pollTimer);
+                if (state.status === 'completed') {
+                    resolve(state);
+                } else {
+                    reject(new Error(state.error || 'Export failed'));
+                }
+            } else if (onProgress) {
+                onProgress(state.percentage || 0);
+            }
+        }
+        
+        // Poll as well, in case a Socket.IO event is missed or the socket is not connected
+        function poll() {
+            fetch(`/export-notes/${job.job_id}`)
+                .then(response => response.json())
+                .then(state => handleUpdate({ job_id: job.job_id, data: state }))
+                .catch(error => console.error('Error checking export status:', error))
+                .finally(() => {
+                    if (!finished) {
+                        pollTimer = setTimeout(poll, 1000);
+                    }
+                });
+        }
+        
+        if (socket) {
+            socket.on('export_update', handleUpdate);
+        }
+        handleUpdate({ job_id: job.job_id, data: job });
+        if (!finished) {
+            pollTimer = setTimeout(poll, 1000);
+        }
+    });
+}
+
 // Function to update the Publish Notes button text and icon
 function updatePublishButtonText() {
     $('#publishNotesBtn').html('<i class="bi bi-file-earmark-word"></i> Export Notes to DOCX');
@@ -1133,6 +1374,15 @@ function updateProgressUI(progressData) {
         $('#statusMessage').text(progressData.message);
     }
     
+    // Show the estimated time left, based on the measured page throughput
+    if (progressData.status === 'processing' && progressData.eta_seconds != null && progressData.pages_per_second) {
+        $('#progressEta').text(`About ${formatDuration(progressData.eta_seconds)} remaining ` +
+                               `(${(progressData.pages_per_second * 60).toFixed(1)} pages/min)`)
+                         .removeClass('d-none');
+    } else {
+        $('#progressEta').addClass('d-none');
+    }
+    
     // Handle errors
     if (progressData.errors && progressData.errors.length > 0) {
         $('#processingError').removeClass('d-none');
@@ -1177,6 +1427,21 @@ function updateProgressUI(progressData) {
     }
 }
 
+// Format a number of seconds as e.g. "1h 5m", "3m 20s" or "45s"
+function formatDuration(seconds) {
+    seconds = Math.max(0, Math.round(seconds));
+    const hours = Math.floor(seconds / 3600);
+    const minutes = Math.floor((seconds % 3600) / 60);
+    const secs = seconds % 60;
+    if (hours > 0) {
+        return `${hours}h ${minutes}m`;
+    }
+    if (minutes > 0) {
+        return `${minutes}m ${secs}s`;
+    }
+    return `${secs}s`;
+}
+
 function handleProcessingError(error) {
     console.error('Processing error:', error);
     
@@ -1388,7 +1653,7 @@ function populateSearchWords() {
         const option = $('<option>')
             .val(wordGroup.word)
             .text(wordGroup.word)
-            .attr('data-representative-group', JSON.stringify(wordGroup.representative_group));
+            .attr('data-group-id', wordGroup.id);
         
         $('#searchWordsSelect').append(option);
     });
@@ -1449,7 +1714,9 @@ function toggleWordHighlights() {
     if ($toggleBtn.attr('data-showing-highlights') !== 'true') {
         // Switch to highlighted image
         const wordsParam = searchWords.join(',');
-        const highlightedUrl = `/highlighted-page-images/${currentResultId}/${currentPageNumber}?words=${encodeURIComponent(wordsParam)}`;
+        const stemParam = filteredResults.search_information.match_mode === 'stem' ? '&stem=1' : '';
+        const fuzzyParam = filteredResults.search_information.max_distance ? `&fuzzy=${filteredResults.search_information.max_distance}` : '';
+        const highlightedUrl = `/highlighted-page-images/${currentResultId}/${currentPageNumber}?words=${encodeURIComponent(wordsParam)}${stemParam}${fuzzyParam}`;
         
         $image.attr('src', highlightedUrl);
         $toggleBtn.attr('data-showing-highlights', 'true');
@@ -0,0 +1,353 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import closing, contextmanager
+from typing import Any, Dict, List, Optional
+
+# File name of the queue database inside the queue folder
+QUEUE_FILENAME = "tasks.sqlite"
+
+# Pages OCRed by one task by default
+DEFAULT_TASK_PAGES = 25
+
+# Seconds a leased task stays assigned without a heartbeat before another worker may take it
+DEFAULT_LEASE_SECONDS = 120
+
+# Leases of a task (including ones lost to crashed workers) before it is given up
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    document_name TEXT NOT NULL,
+    pdf_path TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    images_folder TEXT,
+    total_pages INTEGER NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES jobs (job_id),
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    page_numbers TEXT NOT NULL DEFAULT '[]',
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    lease_expires REAL,
+    pages_done INTEGER NOT NULL DEFAULT 0,
+    result_path TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_by_status ON tasks (status, job_id, position);
+CREATE INDEX IF NOT EXISTS tasks_by_job ON tasks (job_id);
+"""
+
+# Task kinds: OCR of a page range, and merging the job's page ranges once they are all done
+PAGES_TASK = "pages"
+FINALIZE_TASK = "finalize"
+
+# Task states; a job's finalize task waits until its page tasks are done
+WAITING, QUEUED, LEASED, DONE, FAILED = "waiting", "queued", "leased", "done", "failed"
+
+
+class LeaseLost(Exception):
+    """Raised when a worker's lease on a task expired and the task may be running elsewhere."""
+
+
+class TaskQueue:
+    """
+    Durable OCR job queue in a folder on storage shared by the app and the workers.
+
+    A job is split into tasks of up to DEFAULT_TASK_PAGES pages and a final
+    task merging their results. Workers lease one task at a time and renew
+    the lease with heartbeats; a task whose lease runs out (its worker
+    crashed or lost the storage) is handed to the next worker that asks,
+    until it has been tried max_attempts times. The queue is a SQLite
+    database in rollback-journal mode, as WAL needs shared memory and does
+    not work across machines; every change is a short transaction.
+
+    The folder also holds the PDFs of the queued jobs ('pdfs') and the
+    results of the finished page ranges until they are merged ('parts').
+    Paths stored in a job are used as they are, so every machine must see
+    the shared storage at the same path.
+    """
+
+    def __init__(self, folder: str, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """
+        Open (or create) the queue in a folder.
+
+        Args:
+            folder: Queue folder on shared storage
+            lease_seconds: Seconds a lease lasts without a heartbeat
+            max_attempts: Leases of a task before it fails for good
+        """
+        self.folder = folder
+        self.path = os.path.join(folder, QUEUE_FILENAME)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        for subfolder in ("pdfs", "parts"):
+            os.makedirs(os.path.join(folder, subfolder), exist_ok=True)
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        """Open a connection and hold the write lock for one transaction."""
+        with closing(sqlite3.connect(self.path, timeout=30, isolation_level=None)) as conn:
+            conn.row_factory = sqlite3.Row
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def pdf_path_for(self, job_id: str) -> str:
+        """Where a job's PDF is kept while the job is queued."""
+        return os.path.join(self.folder, "pdfs", f"{job_id}.pdf")
+
+    def part_path_for(self, job_id: str, task_id: int, attempt: int) -> str:
+        """
+        Where a page task writes its results until the job is finalized.
+
+        Every attempt gets its own file, so a worker that lost its lease but
+        is still running cannot overwrite the results of the next attempt.
+        """
+        return os.path.join(self.folder, "parts", f"{job_id}_{task_id}_{attempt}.sqlite")
+
+    def enqueue_job(self, job_id: str, document_name: str, pdf_path: str, output_path: str,
+                    page_numbers: List[int], images_folder: Optional[str] = None,
+                    options: Optional[Dict[str, Any]] = None, task_pages: int = DEFAULT_TASK_PAGES) -> int:
+        """
+        Queue a job, split into page-range tasks.
+
+        Args:
+            job_id: Unique id of the job (the app's result id)
+            document_name: Name of the uploaded document
+            pdf_path: PDF to process, on the shared storage
+            output_path: '.sqlite' results store to write
+            page_numbers: Pages to process, in order
+            images_folder: Folder for the page images (None saves no images)
+            options: Keyword arguments for process_pdf (dpi, blank page detection, ...)
+            task_pages: Pages per task
+
+        Returns:
+            Number of page tasks
+        """
+        if not output_path.lower().endswith(".sqlite"):
+            raise ValueError(f"Queued jobs write SQLite results, got {output_path}")
+        now = time.time()
+        task_pages = max(1, task_pages)
+        ranges = [page_numbers[start:start + task_pages] for start in range(0, len(page_numbers), task_pages)]
+
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, document_name, pdf_path, output_path, images_folder, total_pages, "
+                "options, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, document_name, pdf_path, output_path, images_folder, len(page_numbers),
+                 json.dumps(options or {}), now)
+            )
+            conn.executemany(
+                "INSERT INTO tasks (job_id, kind, position, page_numbers, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(job_id, PAGES_TASK, index * task_pages, json.dumps(pages), QUEUED, now)
+                 for index, pages in enumerate(ranges)]
+                + [(job_id, FINALIZE_TASK, len(page_numbers), "[]", WAITING if ranges else QUEUED, now)]
+            )
+        return len(ranges)
+
+    def lease(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Take the next task: a queued one, or one whose worker stopped renewing its lease.
+
+        Args:
+            worker_id: Name of the worker (host and process)
+
+        Returns:
+            The task with its job's fields, or None if there is nothing to do
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT tasks.*, jobs.document_name, jobs.pdf_path, jobs.output_path, jobs.images_folder, "
+                    "jobs.total_pages, jobs.options, jobs.started_at FROM tasks JOIN jobs USING (job_id) "
+                    "WHERE tasks.status = ? OR (tasks.status = ? AND tasks.lease_expires < ?) "
+                    "ORDER BY jobs.created_at, tasks.position LIMIT 1",
+                    (QUEUED, LEASED, now)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                if row["attempts"] >= self.max_attempts:
+                    # Its workers kept crashing: give the task, and with it the job, up
+                    conn.execute("UPDATE tasks SET status = ?, error = ?, updated_at = ? WHERE task_id = ?",
+                                 (FAILED, row["error"] or "Lease expired too often", now, row["task_id"]))
+                    self._fail_waiting(conn, row["job_id"], now)
+                    continue
+
+                conn.execute(
+                    "UPDATE tasks SET status = ?, attempts = attempts + 1, worker_id = ?, lease_expires = ?, "
+                    "pages_done = 0, updated_at = ? WHERE task_id = ?",
+                    (LEASED, worker_id, now + self.lease_seconds, now, row["task_id"])
+                )
+                if row["started_at"] is None:
+                    conn.execute("UPDATE jobs SET started_at = ? WHERE job_id = ?", (now, row["job_id"]))
+
+                task = dict(row)
+                task["page_numbers"] = json.loads(task["page_numbers"])
+                task["options"] = json.loads(task["options"])
+                task["attempts"] += 1
+                task["started_at"] = task["started_at"] or now
+                return task
+
+    def heartbeat(self, task_id: int, worker_id: str, pages_done: Optional[int] = None) -> bool:
+        """
+        Renew a lease, optionally reporting the pages finished so far.
+
+        Returns:
+            False if the lease is not the worker's anymore (it expired and was taken)
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires = ?, pages_done = COALESCE(?, pages_done), updated_at = ? "
+                "WHERE task_id = ? AND worker_id = ? AND status = ?",
+                (now + self.lease_seconds, pages_done, now, task_id, worker_id, LEASED)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, task_id: int, worker_id: str, result_path: Optional[str] = None) -> None:
+        """
+        Mark a leased task as done; the last page task of a job queues its finalize task.
+
+        Args:
+            task_id: Task that is done
+            worker_id: Worker holding the lease
+            result_path: Results of a page task, merged by the finalize task
+
+        Raises:
+            LeaseLost: If the lease expired and the task was taken by another worker
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT job_id, kind, page_numbers FROM tasks WHERE task_id = ? AND worker_id = ? "
+                               "AND status = ?", (task_id, worker_id, LEASED)).fetchone()
+            if row is None:
+                raise LeaseLost(f"Task {task_id} is not leased by {worker_id}")
+            conn.execute(
+                "UPDATE tasks SET status = ?, pages_done = ?, result_path = ?, lease_expires = NULL, error = NULL, "
+                "updated_at = ? WHERE task_id = ?",
+                (DONE, len(json.loads(row["page_numbers"])), result_path, now, task_id)
+            )
+            if row["kind"] == FINALIZE_TASK:
+                conn.execute("UPDATE jobs SET finished_at = ? WHERE job_id = ?", (now, row["job_id"]))
+                return
+            remaining = conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE job_id = ? AND kind = ? AND status != ?",
+                (row["job_id"], PAGES_TASK, DONE)
+            ).fetchone()[0]
+            if remaining == 0:
+                conn.execute("UPDATE tasks SET status = ?, updated_at = ? WHERE job_id = ? AND kind = ? "
+                             "AND status = ?", (QUEUED, now, row["job_id"], FINALIZE_TASK, WAITING))
+
+    def fail(self, task_id: int, worker_id: str, error: str, retry: bool = True) -> None:
+        """
+        Give back a leased task after an error.
+
+        The task is queued again until it has been tried max_attempts times;
+        then it, and with it the job, fails.
+
+        Args:
+            task_id: Task to give back
+            worker_id: Worker holding the lease
+            error: Error message, kept with the task
+            retry: Queue the task again (subject to max_attempts)
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT job_id, attempts FROM tasks WHERE task_id = ? AND worker_id = ? "
+                               "AND status = ?", (task_id, worker_id, LEASED)).fetchone()
+            if row is None:
+                return
+            status = QUEUED if retry and row["attempts"] < self.max_attempts else FAILED
+            conn.execute("UPDATE tasks SET status = ?, error = ?, lease_expires = NULL, pages_done = 0, "
+                         "updated_at = ? WHERE task_id = ?", (status, error, now, task_id))
+            if status == FAILED:
+                self._fail_waiting(conn, row["job_id"], now)
+
+    def release(self, task_id: int, worker_id: str) -> None:
+        """Give back a leased task without counting the attempt, e.g. when a worker is stopped."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = ?, attempts = MAX(attempts - 1, 0), worker_id = NULL, "
+                "lease_expires = NULL, pages_done = 0, updated_at = ? WHERE task_id = ? AND worker_id = ? "
+                "AND status = ?", (QUEUED, now, task_id, worker_id, LEASED)
+            )
+
+    def _fail_waiting(self, conn: sqlite3.Connection, job_id: str, now: float) -> None:
+        """Give up the rest of a job once one of its tasks failed: its results could never be merged."""
+        conn.execute("UPDATE tasks SET status = ?, error = ?, updated_at = ? WHERE job_id = ? AND status IN (?, ?)",
+                     (FAILED, "Another task of the job failed", now, job_id, WAITING, QUEUED))
+        conn.execute("UPDATE jobs SET finished_at = ? WHERE job_id = ?", (now, job_id))
+
+    def job_progress(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Aggregate a job's progress from the states of its tasks.
+
+        Returns:
+            Dictionary with 'status' ('queued', 'processing', 'finalizing',
+            'completed' or 'error'), 'total_pages', 'pages_done', the number
+            of tasks per state ('tasks') and the first task 'error', or None
+            for an unknown job
+        """
+        with self._transaction() as conn:
+            job = conn.execute("SELECT total_pages FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            tasks = conn.execute("SELECT kind, status, pages_done, error FROM tasks WHERE job_id = ? "
+                                 "ORDER BY position", (job_id,)).fetchall()
+
+        counts: Dict[str, int] = {}
+        for task in tasks:
+            counts[task["status"]] = counts.get(task["status"], 0) + 1
+        finalize = next(task for task in tasks if task["kind"] == FINALIZE_TASK)
+        errors = [task["error"] for task in tasks if task["status"] == FAILED and task["error"]]
+
+        if counts.get(FAILED):
+            status = "error"
+        elif finalize["status"] == DONE:
+            status = "completed"
+        elif finalize["status"] in (QUEUED, LEASED):
+            status = "finalizing"
+        elif counts.get(LEASED) or counts.get(DONE):
+            status = "processing"
+        else:
+            status = "queued"
+
+        return {
+            "status": status,
+            "total_pages": job["total_pages"],
+            "pages_done": sum(task["pages_done"] for task in tasks if task["kind"] == PAGES_TASK),
+            "tasks": counts,
+            "error": errors[0] if errors else None
+        }
+
+    def page_tasks(self, job_id: str) -> List[Dict[str, Any]]:
+        """A job's page tasks in page order, with their ids, page numbers and result paths."""
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT task_id, position, page_numbers, status, result_path FROM tasks "
+                                "WHERE job_id = ? AND kind = ? "
+                                "ORDER BY position", (job_id, PAGES_TASK)).fetchall()
+        return [dict(row, page_numbers=json.loads(row["page_numbers"])) for row in rows]
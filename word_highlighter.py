@@ -1,12 +1,34 @@
 import os
 import json
+import shutil
+import hashlib
+import logging
+import threading
 import pytesseract
-from PIL import Image, ImageDraw
+from PIL import Image
 import cv2
 import numpy as np
 from typing import List, Dict, Any, Tuple, Set
 import re
 
+import results_store
+from hebrew_tokenizer import tokenize, reduce_search_words, match_terms, stem_candidates, STEMMER_VERSION
+from fuzzy_index import DeletionIndex, allowed_distance
+
+logger = logging.getLogger(__name__)
+
+# Padding in pixels around highlighted words
+HIGHLIGHT_PADDING = 2
+
+# zlib level of the highlighted PNGs: they are cache files, so speed matters more than size
+PNG_COMPRESSION_LEVEL = 1
+
+# Encoder options of the highlighted PNGs. Without row filters, encoding a page
+# is several times faster and barely larger; older OpenCV versions lack the option
+PNG_ENCODE_PARAMS = [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION_LEVEL]
+if hasattr(cv2, 'IMWRITE_PNG_FILTER'):
+    PNG_ENCODE_PARAMS += [cv2.IMWRITE_PNG_FILTER, cv2.IMWRITE_PNG_FILTER_NONE]
+
 def normalize_text_for_highlighting(text: str) -> str:
     """
     Normalize text for highlighting comparison.
@@ -61,20 +83,67 @@ def extract_word_bounding_boxes(image_path: str, lang: str = 'heb+eng') -> List[
         return words_data
         
     except Exception as e:
-        print(f"Error extracting word bounding boxes from {image_path}: {str(e)}")
+        logger.error("Error extracting word bounding boxes from %s: %s", image_path, e)
         return []
 
-def find_matching_words(words_data: List[Dict[str, Any]], search_words: Set[str]) -> List[Dict[str, Any]]:
+def find_fuzzy_matching_words(words_data: List[Dict[str, Any]], search_words: Set[str],
+                              max_distance: int, stemming: bool = False) -> List[Dict[str, Any]]:
+    """
+    Find words within an edit distance of the search words, same as ocr_results_searcher.
+    
+    Args:
+        words_data: List of word data with bounding boxes
+        search_words: Set of search words
+        max_distance: Maximum edit distance
+        stemming: Match on Hebrew stems as well
+        
+    Returns:
+        List of matching word data
+    """
+    if stemming:
+        terms = [key[0] for key in reduce_search_words(search_words) if len(key) == 1]
+    else:
+        terms = [normalize_text_for_highlighting(word) for word in search_words]
+    
+    # Vocabulary form -> indexes of the boxes containing it
+    vocabulary = {}
+    for i, word_info in enumerate(words_data):
+        for token in tokenize(word_info['text']):
+            forms = stem_candidates(token) if stemming else {normalize_text_for_highlighting(token)}
+            for form in forms:
+                vocabulary.setdefault(form, set()).add(i)
+    
+    index = DeletionIndex(vocabulary.keys(), max_distance)
+    
+    matching_indexes = set()
+    for term in terms:
+        for form, _ in index.lookup(term, allowed_distance(term, max_distance)):
+            matching_indexes.update(vocabulary[form])
+    
+    return [words_data[i] for i in sorted(matching_indexes)]
+
+def find_matching_words(words_data: List[Dict[str, Any]], search_words: Set[str],
+                        stemming: bool = False, max_distance: int = 0) -> List[Dict[str, Any]]:
     """
     Find words that match the search criteria using whole word matching.
     
     Args:
         words_data: List of word data with bounding boxes
         search_words: Set of normalized search words
+        stemming: Match on Hebrew stems, same as ocr_results_searcher
+        max_distance: Also match words within this edit distance (0 = exact only)
         
     Returns:
         List of matching word data
     """
+    if max_distance > 0:
+        return find_fuzzy_matching_words(words_data, search_words, max_distance, stemming)
+    
+    if stemming:
+        terms = reduce_search_words(search_words)
+        return [word_info for word_info in words_data
+                if match_terms(tokenize(word_info['text']), terms)]
+    
     matching_words = []
     
     # Normalize search words
@@ -94,11 +163,95 @@ def find_matching_words(words_data: List[Dict[str, Any]], search_words: Set[str]
     
     return matching_words
 
+def read_image_bgr(image_path: str) -> np.ndarray:
+    """Read an image as a writable BGR array (also for paths cv2.imread cannot open)."""
+    image = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Cannot read image: {image_path}")
+    return image
+
+def write_png(image: np.ndarray, output_path: str) -> None:
+    """Write a BGR array as PNG with fast compression, whatever the file extension."""
+    success, encoded = cv2.imencode('.png', image, PNG_ENCODE_PARAMS)
+    if not success:
+        raise ValueError("PNG encoding failed")
+    with open(output_path, 'wb') as f:
+        f.write(encoded.tobytes())
+
+def highlight_boxes(matching_words: List[Dict[str, Any]], width: int, height: int,
+                    padding: int = HIGHLIGHT_PADDING) -> List[Tuple[int, int, int, int]]:
+    """
+    Padded pixel boxes of the words to highlight, clipped to the image.
+    
+    Returns:
+        List of (left, top, right, bottom) boxes, right and bottom exclusive
+    """
+    boxes = []
+    for word_info in matching_words:
+        left = max(0, word_info['left'] - padding)
+        top = max(0, word_info['top'] - padding)
+        # Rectangles used to be drawn inclusive of their right and bottom edge
+        right = min(width, word_info['right'] + padding + 1)
+        bottom = min(height, word_info['bottom'] + padding + 1)
+        if left < right and top < bottom:
+            boxes.append((left, top, right, bottom))
+    return boxes
+
+def group_overlapping_boxes(boxes: List[Tuple[int, int, int, int]]) -> List[List[Tuple[int, int, int, int]]]:
+    """Group boxes that overlap (directly or through others), so each pixel is blended once."""
+    groups = []
+    for box in boxes:
+        merged = [box]
+        for group in groups[:]:
+            if any(box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]
+                   for other in group):
+                groups.remove(group)
+                merged.extend(group)
+        groups.append(merged)
+    return groups
+
+def blend_highlights(image: np.ndarray, boxes: List[Tuple[int, int, int, int]],
+                     color_bgr: Tuple[int, int, int], alpha: int) -> None:
+    """
+    Blend a translucent color over boxes of a BGR image, in place.
+    
+    Only the pixels inside the boxes are touched; overlapping boxes are
+    blended once, as when they were drawn on a shared overlay.
+    
+    Args:
+        image: BGR image array, modified in place
+        boxes: (left, top, right, bottom) boxes, right and bottom exclusive
+        color_bgr: Highlight color in BGR order
+        alpha: Opacity of the highlight (0-255)
+    """
+    color_term = np.array(color_bgr, dtype=np.uint16) * alpha + 127
+    for group in group_overlapping_boxes(boxes):
+        left = min(box[0] for box in group)
+        top = min(box[1] for box in group)
+        right = max(box[2] for box in group)
+        bottom = max(box[3] for box in group)
+        region = image[top:bottom, left:right]
+        
+        if len(group) == 1:
+            blended = (region.astype(np.uint16) * (255 - alpha) + color_term) // 255
+            region[...] = blended.astype(np.uint8)
+            continue
+        
+        mask = np.zeros(region.shape[:2], dtype=bool)
+        for box in group:
+            mask[box[1] - top:box[3] - top, box[0] - left:box[2] - left] = True
+        pixels = region[mask].astype(np.uint16)
+        region[mask] = ((pixels * (255 - alpha) + color_term) // 255).astype(np.uint8)
+
 def draw_highlights_on_image(image_path: str, matching_words: List[Dict[str, Any]], 
                            output_path: str, highlight_color: Tuple[int, int, int, int] = (255, 20, 147, 160)) -> bool:
     """
     Draw pink highlights over matching words on the image.
     
+    The highlight is blended into the word boxes of the page array in
+    place, so no full-page overlay or RGBA copy is allocated, and the PNG
+    is written with fast compression.
+    
     Args:
         image_path: Path to the source image
         matching_words: List of word data to highlight
@@ -109,49 +262,22 @@ def draw_highlights_on_image(image_path: str, matching_words: List[Dict[str, Any
         True if successful, False otherwise
     """
     try:
-        # Load the image
-        image = Image.open(image_path).convert('RGBA')
-        
-        # Create a transparent overlay
-        overlay = Image.new('RGBA', image.size, (255, 255, 255, 0))
-        draw = ImageDraw.Draw(overlay)
-        
-        # Draw highlights for each matching word
-        for word_info in matching_words:
-            left = word_info['left']
-            top = word_info['top']
-            right = word_info['right']
-            bottom = word_info['bottom']
-            
-            # Add some padding around the word
-            padding = 2
-            highlight_box = (
-                max(0, left - padding),
-                max(0, top - padding),
-                min(image.width, right + padding),
-                min(image.height, bottom + padding)
-            )
-            
-            # Draw the highlight rectangle
-            draw.rectangle(highlight_box, fill=highlight_color)
-        
-        # Composite the overlay onto the original image
-        highlighted_image = Image.alpha_composite(image, overlay)
+        image = read_image_bgr(image_path)
+        red, green, blue, alpha = highlight_color
         
-        # Convert back to RGB for saving as PNG/JPEG
-        final_image = highlighted_image.convert('RGB')
-        
-        # Save the highlighted image
-        final_image.save(output_path, 'PNG', quality=95)
+        boxes = highlight_boxes(matching_words, image.shape[1], image.shape[0])
+        blend_highlights(image, boxes, (blue, green, red), alpha)
         
+        write_png(image, output_path)
         return True
         
     except Exception as e:
-        print(f"Error creating highlighted image: {str(e)}")
+        logger.error("Error creating highlighted image: %s", e)
         return False
 
 def create_highlighted_image(image_path: str, search_words: Set[str], output_path: str, 
-                           lang: str = 'heb+eng') -> Tuple[bool, int]:
+                           lang: str = 'heb+eng', words_data: List[Dict[str, Any]] = None,
+                           stemming: bool = False, max_distance: int = 0) -> Tuple[bool, int]:
     """
     Create a highlighted version of an image with search words marked.
     
@@ -160,25 +286,31 @@ def create_highlighted_image(image_path: str, search_words: Set[str], output_pat
         search_words: Set of words to search for and highlight
         output_path: Path where to save the highlighted image
         lang: OCR language setting
+        words_data: Previously extracted word bounding boxes (optional, extracted if None)
+        stemming: Match on Hebrew stems
+        max_distance: Also highlight words within this edit distance
         
     Returns:
         Tuple of (success_boolean, number_of_highlights)
     """
     try:
         # Extract word bounding boxes from the image
-        words_data = extract_word_bounding_boxes(image_path, lang)
+        if words_data is None:
+            words_data = extract_word_bounding_boxes(image_path, lang)
         
         if not words_data:
-            print(f"No words extracted from image: {image_path}")
+            logger.warning("No words extracted from image: %s", image_path)
             return False, 0
         
         # Find matching words
-        matching_words = find_matching_words(words_data, search_words)
+        matching_words = find_matching_words(words_data, search_words, stemming, max_distance)
         
         if not matching_words:
             # If no matches, just copy the original image
-            original_image = Image.open(image_path)
-            original_image.save(output_path, 'PNG')
+            if image_path.lower().endswith('.png'):
+                shutil.copyfile(image_path, output_path)
+            else:
+                write_png(read_image_bgr(image_path), output_path)
             return True, 0
         
         # Create highlighted image
@@ -187,11 +319,61 @@ def create_highlighted_image(image_path: str, search_words: Set[str], output_pat
         return success, len(matching_words)
         
     except Exception as e:
-        print(f"Error in create_highlighted_image: {str(e)}")
+        logger.error("Error in create_highlighted_image: %s", e)
         return False, 0
 
+def get_word_boxes(image_path: str, page_number: int, result_path: str = None,
+                   lang: str = 'heb+eng') -> List[Dict[str, Any]]:
+    """
+    Get the word bounding boxes of a page, reusing the ones kept in the results store.
+    
+    Boxes extracted here are saved back to the store, so Tesseract only runs
+    once per page no matter how many different searches are highlighted.
+    
+    Args:
+        image_path: Path to the page image
+        page_number: Page number of the image
+        result_path: Path to the document's results (optional)
+        lang: Language setting for OCR
+        
+    Returns:
+        List of dictionaries containing word data with bounding boxes
+    """
+    if result_path:
+        stored_boxes = results_store.load_word_boxes(result_path, page_number, lang)
+        if stored_boxes is not None:
+            return stored_boxes
+    
+    words_data = extract_word_bounding_boxes(image_path, lang)
+    
+    if result_path and words_data:
+        results_store.save_word_boxes(result_path, page_number, words_data, lang)
+    
+    return words_data
+
+def highlight_cache_key(search_words: Set[str], stemming: bool = False, max_distance: int = 0) -> str:
+    """
+    Cache key of the highlighted images of a search.
+    
+    Derived from the words and match options only (unlike hash(), which is
+    randomized per process), so images cached by pre-warm workers or before
+    a restart are found again. Stem searches include the stemmer version, so
+    images cached before stem matching changed are not reused.
+    
+    Args:
+        search_words: Set of words to highlight
+        stemming: Match on Hebrew stems
+        max_distance: Edit distance of fuzzy matches
+        
+    Returns:
+        Hex digest identifying the search
+    """
+    key = json.dumps([sorted(search_words), STEMMER_VERSION if stemming else False, max_distance], ensure_ascii=False)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
 def highlight_page_on_demand(unique_id: str, page_number: int, search_words: Set[str], 
-                           images_folder: str) -> Tuple[bool, str, int]:
+                           images_folder: str, result_path: str = None,
+                           stemming: bool = False, max_distance: int = 0) -> Tuple[bool, str, int]:
     """
     Create a highlighted version of a specific page on demand.
     
@@ -200,6 +382,9 @@ def highlight_page_on_demand(unique_id: str, page_number: int, search_words: Set
         page_number: Page number to highlight
         search_words: Set of words to highlight
         images_folder: Base images folder path
+        result_path: Path to the document's results, used to cache word boxes (optional)
+        stemming: Match on Hebrew stems
+        max_distance: Also highlight words within this edit distance
         
     Returns:
         Tuple of (success, highlighted_image_path, highlight_count)
@@ -213,9 +398,8 @@ def highlight_page_on_demand(unique_id: str, page_number: int, search_words: Set
         highlighted_images_folder = os.path.join(document_images_folder, "highlighted_images")
         os.makedirs(highlighted_images_folder, exist_ok=True)
         
-        # Generate a hash from search words for caching
-        search_words_hash = hash(frozenset(search_words))
-        highlighted_image_filename = f"page_{page_number}_highlighted_{abs(search_words_hash)}.png"
+        # Name the cached image after the search, the same in every process
+        highlighted_image_filename = f"page_{page_number}_highlighted_{highlight_cache_key(search_words, stemming, max_distance)}.png"
         highlighted_image_path = os.path.join(highlighted_images_folder, highlighted_image_filename)
         
         # Check if highlighted image already exists
@@ -225,21 +409,57 @@ def highlight_page_on_demand(unique_id: str, page_number: int, search_words: Set
         
         # Check if original image exists
         if not os.path.exists(original_image_path):
-            print(f"Original image not found: {original_image_path}")
+            logger.warning("Original image not found: %s", original_image_path)
             return False, "", 0
         
-        # Create highlighted image
+        # Create highlighted image under a temporary name and publish it when complete,
+        # so a request never serves an image a pre-warm worker is still writing
+        temp_image_path = f"{highlighted_image_path}.{threading.get_ident()}.tmp"
         success, highlight_count = create_highlighted_image(
             original_image_path, 
             search_words, 
-            highlighted_image_path
+            temp_image_path,
+            words_data=get_word_boxes(original_image_path, page_number, result_path),
+            stemming=stemming,
+            max_distance=max_distance
         )
         
         if success:
+            os.replace(temp_image_path, highlighted_image_path)
             return True, highlighted_image_path, highlight_count
         else:
+            if os.path.exists(temp_image_path):
+                os.remove(temp_image_path)
             return False, "", 0
             
     except Exception as e:
-        print(f"Error in highlight_page_on_demand: {str(e)}")
-        return False, "", 0
\ No newline at end of file
+        logger.error("Error in highlight_page_on_demand of page %s: %s", page_number, e)
+        return False, "", 0
+
+
+def clear_highlight_cache(unique_id: str, page_numbers: List[int], images_folder: str) -> int:
+    """
+    Delete the cached highlighted images of some pages, e.g. after their images were replaced.
+    
+    Args:
+        unique_id: Unique identifier for the document
+        page_numbers: Page numbers whose highlighted images are deleted
+        images_folder: Base images folder path
+        
+    Returns:
+        Number of deleted images
+    """
+    highlighted_images_folder = os.path.join(images_folder, unique_id, "highlighted_images")
+    if not os.path.isdir(highlighted_images_folder):
+        return 0
+    
+    prefixes = tuple(f"page_{page_number}_highlighted_" for page_number in page_numbers)
+    deleted = 0
+    for filename in os.listdir(highlighted_images_folder):
+        if filename.startswith(prefixes):
+            try:
+                os.remove(os.path.join(highlighted_images_folder, filename))
+                deleted += 1
+            except OSError as e:
+                logger.warning("Could not delete cached highlighted image %s: %s", filename, e)
+    return deleted
@@ -0,0 +1,279 @@
+import os
+import time
+import socket
+import logging
+import argparse
+import threading
+import multiprocessing
+
+from task_queue import TaskQueue, LeaseLost, FINALIZE_TASK, DEFAULT_LEASE_SECONDS
+from results_store import ResultsWriter, load_results, update_pages, set_journal_mode
+from ocr_logging import setup_loggers, log_context, stop_logging, DEFAULT_LOG_FILE
+
+logger = logging.getLogger(__name__)
+
+# Seconds an idle worker waits before asking the queue again
+DEFAULT_POLL_INTERVAL = 2.0
+
+# Leases are renewed this often (a fraction of the lease), also while a slow page is being OCRed
+HEARTBEAT_FRACTION = 0.25
+
+
+def default_worker_id():
+    """Name a worker after its host and process, as shown in the queue."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def add_image_urls(output_path, result_id):
+    """
+    Add the URLs of the page images (and clean images of highlighted pages) to stored results.
+
+    Args:
+        output_path: Path of the results store
+        result_id: Result id the app serves the job's images under
+    """
+    page_updates = []
+    for page in load_results(output_path)['pages']:
+        if 'image_path' in page:
+            page_num = page['page_number']
+            page_update = {
+                'page_number': page_num,
+                'image_url': f'/page-images/{result_id}/{page_num}'
+            }
+
+            # For pages with highlights, add URL for the clean version too
+            if page.get('has_annotations', False) and 'clean_image_path' in page:
+                page_update['clean_image_url'] = f'/clean-page-images/{result_id}/{page_num}'
+            page_updates.append(page_update)
+
+    update_pages(output_path, page_updates)
+
+
+def keep_lease(task_queue, task, worker_id, progress, done, lost):
+    """Renew a task's lease until the task is done (runs in its own thread)."""
+    interval = task_queue.lease_seconds * HEARTBEAT_FRACTION
+    while not done.wait(interval):
+        if not task_queue.heartbeat(task['task_id'], worker_id, progress['pages_done']):
+            lost.set()
+            return
+
+
+def run_page_task(task_queue, task, worker_id):
+    """
+    OCR a task's page range with process_pdf into its own results file.
+
+    Raises:
+        LeaseLost: If the task's lease expired while it was running
+        RuntimeError: If process_pdf failed
+    """
+    # Imported here: the OCR pipeline pulls in fitz, cv2, numpy and the Tesseract wrapper
+    from pdf_ocr_processor import process_pdf
+    from memory_budget import MemoryBudget
+
+    part_path = task_queue.part_path_for(task['job_id'], task['task_id'], task['attempts'])
+    progress = {'pages_done': 0, 'error': None}
+    done = threading.Event()
+    lost = threading.Event()
+
+    def progress_callback(current_page, total_pages, status, message=None, error=None, timing=None):
+        if lost.is_set():
+            raise LeaseLost(f"Lease on task {task['task_id']} expired")
+        if error:
+            progress['error'] = error
+        if status in ('processing', 'completed') and current_page != progress['pages_done']:
+            progress['pages_done'] = current_page
+            if not task_queue.heartbeat(task['task_id'], worker_id, current_page):
+                lost.set()
+                raise LeaseLost(f"Lease on task {task['task_id']} expired")
+
+    heartbeat_thread = threading.Thread(target=keep_lease, args=(task_queue, task, worker_id, progress, done, lost),
+                                        daemon=True)
+    heartbeat_thread.start()
+    try:
+        options = dict(task['options'])
+        memory_budget_mb = options.pop('memory_budget_mb', None)
+        success = process_pdf(task['pdf_path'], part_path, task['page_numbers'],
+                              image_output_dir=task['images_folder'], progress_callback=progress_callback,
+                              memory_budget=MemoryBudget.from_megabytes(memory_budget_mb) if memory_budget_mb else None,
+                              **options)
+    finally:
+        done.set()
+        heartbeat_thread.join()
+
+    try:
+        if lost.is_set():
+            raise LeaseLost(f"Lease on task {task['task_id']} expired")
+        if not success:
+            raise RuntimeError(progress['error'] or f"Processing pages {task['page_numbers'][0]}-"
+                                                    f"{task['page_numbers'][-1]} failed")
+        task_queue.complete(task['task_id'], worker_id, part_path)
+    except Exception:
+        # Another attempt writes its own file
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+
+def finalize_job(task_queue, task, worker_id):
+    """
+    Merge the results of a job's page ranges into its results store, in page order.
+
+    Document-level fields are combined from the parts; the timing summary is
+    computed over all pages, with the time since the job's first lease as
+    wall-clock time. The parts are deleted afterwards, and so is the job's
+    PDF if the queue holds it.
+    """
+    from pdf_ocr_processor import summarize_timings
+
+    page_tasks = task_queue.page_tasks(task['job_id'])
+    writer = ResultsWriter(task['output_path'])
+    page_timings = []
+    parts = []
+    try:
+        for page_task in page_tasks:
+            part = load_results(page_task['result_path'])
+            for page in part.pop('pages', []):
+                page_timings.append({'timings': page.get('timings')})
+                writer.add_page(page)
+            parts.append(part)
+
+        timing_summary = summarize_timings(page_timings, time.time() - task['started_at'])
+        highlight_pass_seconds = [part['timing_summary']['highlight_pass_seconds'] for part in parts
+                                  if 'highlight_pass_seconds' in part.get('timing_summary', {})]
+        if highlight_pass_seconds:
+            timing_summary['highlight_pass_seconds'] = round(sum(highlight_pass_seconds), 4)
+
+        metadata = {
+            'document_name': task['document_name'],
+            'total_pages_in_document': parts[0]['total_pages_in_document'] if parts else 0,
+            'pages_processed': sum(part.get('pages_processed', 0) for part in parts),
+            'page_numbers_processed': [page for page_task in page_tasks for page in page_task['page_numbers']],
+            'language': parts[0].get('language') if parts else 'Hebrew and English',
+            'blank_pages_skipped': sum(part.get('blank_pages_skipped', 0) for part in parts),
+            'blank_page_numbers': [page for part in parts for page in part.get('blank_page_numbers', [])],
+            'timing_summary': timing_summary,
+            'page_tasks': len(page_tasks)
+        }
+    except Exception:
+        writer.abort()
+        raise
+    if not writer.close(metadata):
+        raise RuntimeError(f"Could not save the results to {task['output_path']}")
+
+    if task['images_folder']:
+        add_image_urls(task['output_path'], task['job_id'])
+    task_queue.complete(task['task_id'], worker_id)
+
+    for page_task in page_tasks:
+        if os.path.exists(page_task['result_path']):
+            os.remove(page_task['result_path'])
+    if os.path.dirname(os.path.abspath(task['pdf_path'])) == os.path.join(os.path.abspath(task_queue.folder), 'pdfs'):
+        if os.path.exists(task['pdf_path']):
+            os.remove(task['pdf_path'])
+
+
+def run_task(task_queue, task, worker_id):
+    """Run one leased task, giving it back to the queue if it fails."""
+    description = (f"finalize job {task['job_id']}" if task['kind'] == FINALIZE_TASK else
+                   f"pages {task['page_numbers'][0]}-{task['page_numbers'][-1]} of job {task['job_id']}")
+    with log_context(job_id=task['job_id']):
+        logger.info(f"{worker_id}: {description} (attempt {task['attempts']})")
+        start = time.perf_counter()
+        try:
+            if task['kind'] == FINALIZE_TASK:
+                finalize_job(task_queue, task, worker_id)
+            else:
+                run_page_task(task_queue, task, worker_id)
+            logger.info(f"{worker_id}: {description} done in {time.perf_counter() - start:.1f}s")
+        except LeaseLost as e:
+            # The queue gave the task to another worker, which finishes it
+            logger.warning(f"{worker_id}: {description} abandoned: {str(e)}")
+        except Exception as e:
+            logger.error(f"{worker_id}: {description} failed: {str(e)}")
+            task_queue.fail(task['task_id'], worker_id, str(e))
+
+
+def work(queue_folder, worker_id=None, poll_interval=DEFAULT_POLL_INTERVAL, lease_seconds=DEFAULT_LEASE_SECONDS,
+         once=False, stop=None):
+    """
+    Take tasks from the queue and run them until stopped.
+
+    Args:
+        queue_folder: Queue folder on shared storage
+        worker_id: Name of the worker (host:pid by default)
+        poll_interval: Seconds to wait when the queue is empty
+        lease_seconds: Seconds a lease lasts without a heartbeat
+        once: Return as soon as the queue is empty
+        stop: Optional event ending the loop after the current task
+    """
+    task_queue = TaskQueue(queue_folder, lease_seconds=lease_seconds)
+    # Parts and results stores are on the shared storage too, where WAL does not work across machines
+    set_journal_mode('DELETE')
+    worker_id = worker_id or default_worker_id()
+    stop = stop or threading.Event()
+    logger.info(f"{worker_id}: working on {task_queue.path}")
+
+    while not stop.is_set():
+        task = task_queue.lease(worker_id)
+        if task is None:
+            if once:
+                return
+            stop.wait(poll_interval)
+            continue
+
+        try:
+            run_task(task_queue, task, worker_id)
+        except KeyboardInterrupt:
+            # Let the next worker start the task right away instead of after the lease
+            task_queue.release(task['task_id'], worker_id)
+            raise
+
+
+def work_process(*work_args):
+    """Run work in a worker process, writing its queued log records before the process exits."""
+    try:
+        work(*work_args)
+    finally:
+        # Child processes exit without running atexit handlers
+        stop_logging()
+
+
+def main():
+    """Run OCR workers on the shared task queue."""
+    parser = argparse.ArgumentParser(description='OCR worker processing queued jobs from shared storage')
+    parser.add_argument('--queue-folder', default=os.path.join('results', 'ocr_queue'),
+                        help='Queue folder on storage shared with the app (default: results/ocr_queue)')
+    parser.add_argument('--processes', type=int, default=1, help='Worker processes to run (default: 1)')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f'Seconds between checks of an empty queue (default: {DEFAULT_POLL_INTERVAL})')
+    parser.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                        help=f'Seconds before a silent worker\'s task is given to another (default: {DEFAULT_LEASE_SECONDS})')
+    parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+    parser.add_argument('--log-file', default=DEFAULT_LOG_FILE,
+                        help=f'Log file; each process writes <name>.<host>-<pid>.log next to it (default: {DEFAULT_LOG_FILE})')
+    parser.add_argument('--log-levels', default=os.environ.get('MCA_LOG_LEVELS'),
+                        help="Per-module log levels, e.g. 'pdf_ocr_processor=DEBUG' (default: MCA_LOG_LEVELS)")
+    parser.add_argument('--log-format', choices=('text', 'json'), default=os.environ.get('MCA_LOG_FORMAT', 'text'),
+                        help='Log line format (default: MCA_LOG_FORMAT or text)')
+    args = parser.parse_args()
+
+    # Each worker process writes its own file next to --log-file, which the app may be writing too
+    setup_loggers(args.log_file, names=(logger.name, 'pdf_ocr_processor'), levels=args.log_levels,
+                  json_format=args.log_format == 'json', per_process=True)
+
+    work_args = (args.queue_folder, None, args.poll_interval, args.lease_seconds, args.once)
+    try:
+        if args.processes <= 1:
+            work(*work_args)
+            return
+        processes = [multiprocessing.Process(target=work_process, args=work_args) for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()